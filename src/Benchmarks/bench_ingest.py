@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from Benchmarks.generate_cdr import generate_cdr
+from Config.dependencies import get_call_registry
+from Connectors import CallsRegistryCSVConnector, CallsSegmentLog
+
+
+def encode_batches(calls: pd.DataFrame, batch_size: int, content_type: str) -> list:
+    """
+    Splits the calls in request bodies of `batch_size` calls, as CSV or NDJSON.
+    """
+    bodies = []
+    for position in range(0, len(calls), batch_size):
+        batch = calls.iloc[position:position + batch_size]
+        if content_type == "text/csv":
+            bodies.append(batch.to_csv(index=False).encode())
+        else:
+            bodies.append(batch.to_json(orient="records", lines=True).encode())
+    return bodies
+
+
+def run(base_rows: int, rows: int, batch_size: int, subscribers: int, seed: int, compact_rows: int) -> list:
+    """
+    Measures the sustained ingestion throughput of POST /calls/ingest/ (validation, fsynced log append and
+    merge into the live registry) on top of a registry of `base_rows` calls, for CSV and NDJSON batches.
+    """
+    from main import app
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        base_path = os.path.join(directory, "base.csv")
+        generate_cdr(base_path, base_rows, subscribers, seed)
+        batches_path = os.path.join(directory, "batches.csv")
+        generate_cdr(batches_path, rows, subscribers, seed + 1)
+        calls = pd.read_csv(batches_path, dtype=str)
+
+        for content_type in ("text/csv", "application/x-ndjson"):
+            log_path = os.path.join(directory, f"log-{content_type.split('/')[1]}")
+            registry = CallsRegistryCSVConnector(os.path.relpath(base_path), ingest_log=CallsSegmentLog(log_path), compact_rows=compact_rows)
+            app.dependency_overrides[get_call_registry] = lambda: registry
+            bodies = encode_batches(calls, batch_size, content_type)
+            latencies = []
+            # Without the lifespan, which would load the configured registry
+            client = TestClient(app)
+            started = time.perf_counter()
+            for body in bodies:
+                request_started = time.perf_counter()
+                response = client.post("/calls/ingest/", content=body, headers={"content-type": content_type})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - request_started)
+            elapsed = time.perf_counter() - started
+            app.dependency_overrides.clear()
+
+            latencies = np.array(latencies) * 1000
+            results.append({
+                "benchmark": "ingest", "content_type": content_type, "base_rows": base_rows, "rows": rows,
+                "batch_size": batch_size, "compact_rows": compact_rows, "seconds": elapsed, "rows_per_second": rows / elapsed,
+                "p50_batch_ms": float(np.percentile(latencies, 50)), "p99_batch_ms": float(np.percentile(latencies, 99)),
+                "row_count": registry.row_count,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the sustained rows per second of the calls ingestion endpoint")
+    parser.add_argument("--base-rows", type=int, default=1000000, help="Calls loaded before ingesting")
+    parser.add_argument("--rows", type=int, default=200000, help="Calls ingested")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Calls per request")
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compact-rows", type=int, default=100000, help="Delta size that triggers a compaction")
+    args = parser.parse_args()
+    for result in run(args.base_rows, args.rows, args.batch_size, args.subscribers, args.seed, args.compact_rows):
+        print(json.dumps(result))
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from Benchmarks.generate_cdr import generate_cdr
+from Connectors import CallsRegistryCSVConnector
+
+
+def encoded_bytes(connector: CallsRegistryCSVConnector) -> int:
+    """
+    Returns the bytes held by the encoded calls and rollups of a CSV connector.
+    """
+    columns = sum(getattr(connector.client, name).nbytes for name in connector.client.COLUMNS)
+    return columns + int(connector._rollups.memory_usage(deep=True).sum())
+
+
+def run(rows: int, subscribers: int, seed: int) -> list:
+    """
+    Measures the memory per call of the parsed CSV (object strings and dates, the previous layout of the
+    CSV connector) against the encoded layout, on a synthetic CDR file.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "cdr.csv")
+        generate_cdr(csv_path, rows, subscribers, seed)
+
+        frame = pd.read_csv(csv_path, dtype=CallsRegistryCSVConnector.column_types)
+        frame["fecha"] = pd.to_datetime(frame["fecha"], utc=True)
+        frame_bytes = int(frame.memory_usage(deep=True).sum())
+        del frame
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        connector = CallsRegistryCSVConnector(os.path.relpath(csv_path))
+        load_seconds = time.perf_counter() - started
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return [
+        {"benchmark": "registry_memory", "layout": "dataframe", "rows": rows, "bytes": frame_bytes, "bytes_per_row": frame_bytes / rows},
+        {
+            "benchmark": "registry_memory", "layout": "encoded", "rows": rows, "bytes": encoded_bytes(connector),
+            "bytes_per_row": encoded_bytes(connector) / rows, "retained_bytes_per_row": retained / rows,
+            "load_peak_bytes_per_row": peak / rows, "load_seconds": load_seconds,
+            "phones": len(connector.client.phones), "rollups": len(connector._rollups),
+        },
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the memory per call of the encoded call registry against a parsed DataFrame")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for result in run(args.rows, args.subscribers, args.seed):
+        print(json.dumps(result))
@@ -0,0 +1,170 @@
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from Benchmarks.generate_cdr import generate_cdr, subscriber_numbers, subscriber_weights
+from Benchmarks.stub_users_server import start_stub_users_server, users_api_url
+from Commands.bill_run import run_bill
+from Config import dependencies
+from Dto.Models import PhoneInvoiceRequest
+
+DATE_FROM = datetime(2025, 1, 1, tzinfo=timezone.utc)
+DATE_TO = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """
+    Returns the peak resident set size of this process (or of its finished children) in MB.
+    """
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def bench_load() -> dict:
+    """
+    Measures how long the configured call registry takes to load.
+    """
+    dependencies.get_call_registry.cache_clear()
+    started = time.perf_counter()
+    dependencies.get_call_registry()
+    return {"benchmark": "registry_load", "seconds": time.perf_counter() - started, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_invoice_latency(subscribers: int, skew: float, invoices: int, seed: int) -> dict:
+    """
+    Measures the latency of single invoices (users from the stub users server, no invoice cache),
+    for subscribers drawn with the same skew as the calls. Failed invoices (HTTPException) are counted
+    in "errors" and left out of the percentiles.
+    """
+    generator = np.random.default_rng(seed)
+    phones = subscriber_numbers(generator.choice(subscribers, size=invoices, p=subscriber_weights(subscribers, skew))).tolist()
+    service = dependencies.PhoneInvoiceService(
+        dependencies.get_call_registry(),
+        dependencies.get_user_connector(),
+        dependencies.get_pricing_engine(),
+        dependencies.get_vectorized_call_processor(),
+    )
+    latencies = []
+    errors = 0
+    for phone in phones:
+        request = PhoneInvoiceRequest(phone_number=phone, date_from=DATE_FROM, date_to=DATE_TO)
+        started = time.perf_counter()
+        try:
+            service.get_phone_invoice(request).to_response()
+        except HTTPException:
+            # Unknown users and numbers without calls fail fast, they would skew the percentiles
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+
+    latencies = np.array(latencies) * 1000
+    percentiles = {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    if len(latencies):
+        percentiles = {
+            "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99)), "max_ms": float(latencies.max()),
+        }
+    return {"benchmark": "invoice_latency", "invoices": invoices, "errors": errors, **percentiles, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_bill_run(workers: int, chunk_size: int) -> dict:
+    """
+    Measures the throughput of a bill run over the whole generated period.
+    """
+    started = time.perf_counter()
+    summary = run_bill(DATE_FROM, DATE_TO, io.StringIO(), workers=workers, chunk_size=chunk_size, progress=io.StringIO())
+    elapsed = time.perf_counter() - started
+    return {
+        "benchmark": "bill_run", "workers": workers, **summary, "seconds": elapsed,
+        "subscribers_per_second": summary["subscribers"] / elapsed,
+        "peak_rss_mb": peak_rss_mb(), "workers_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def run(rows: int, subscribers: int, skew: float, seed: int, invoices: int, workers: int, chunk_size: int, connector: str, csv_path: str = None) -> dict:
+    """
+    Generates a CDR file (unless csv_path is given), serves the users from the stub users server and runs the
+    load, invoice latency and bill run benchmarks with the given registry connector.
+
+    Returns:
+        dict: The environment, the parameters and the results, JSON serializable.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        friends = None
+        if csv_path is None:
+            csv_path = os.path.join(directory, "cdr.csv")
+            started = time.perf_counter()
+            friends = generate_cdr(csv_path, rows, subscribers, seed, skew)
+            generation_seconds = time.perf_counter() - started
+        server = start_stub_users_server(friends=friends)
+
+        os.environ.update({
+            "USERS_API_URL": users_api_url(server),
+            "USERS_CACHE_TTL": "0",
+            "USERS_CACHE_NOT_FOUND_TTL": "0",
+            "CALLS_REGISTRY_CONNECTOR": connector,
+            "CSV_FILE_PATH": os.path.relpath(csv_path),
+        })
+        if connector == "snapshot":
+            from Commands.compile_snapshot import compile_snapshot
+            os.environ["SNAPSHOT_PATH"] = os.path.relpath(os.path.join(directory, "cdr.snapshot"))
+            compile_snapshot(csv_path, os.environ["SNAPSHOT_PATH"])
+        elif connector == "sqlite":
+            from Commands.import_sqlite import import_sqlite
+            os.environ["SQLITE_PATH"] = os.path.relpath(os.path.join(directory, "cdr.sqlite"))
+            import_sqlite(csv_path, os.environ["SQLITE_PATH"])
+        dependencies.get_user_connector.cache_clear()
+
+        results = [bench_load()]
+        if friends is not None:
+            results.insert(0, {"benchmark": "generate_cdr", "seconds": generation_seconds})
+        results.append(bench_invoice_latency(subscribers, skew, invoices, seed))
+        results.append(bench_bill_run(workers, chunk_size))
+        server.shutdown()
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+        },
+        "parameters": {
+            "rows": rows, "subscribers": subscribers, "skew": skew, "seed": seed, "invoices": invoices,
+            "workers": workers, "chunk_size": chunk_size, "connector": connector,
+            "pricing_engine": os.environ.get("PRICING_ENGINE", "strategies"),
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the registry load, invoice latency and bill run on a synthetic CDR file")
+    parser.add_argument("--rows", type=int, default=100000, help="Calls to generate (10^5 to 10^8)")
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of the calls per subscriber, 0 is uniform")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--invoices", type=int, default=500, help="Single invoices timed for the latency percentiles")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Bill run worker processes")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Bill run subscribers per task")
+    parser.add_argument("--connector", choices=["csv", "snapshot", "sqlite"], default="csv", help="Call registry connector")
+    parser.add_argument("--csv", help="Benchmark this CDR file instead of a generated one")
+    parser.add_argument("--env-file", help="Load the configuration (tariffs, pricing engine) from this .env file")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.env_file:
+        from dotenv import load_dotenv
+        load_dotenv(args.env_file)
+    report = run(args.rows, args.subscribers, args.skew, args.seed, args.invoices, args.workers, args.chunk_size, args.connector, args.csv)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,68 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from Dto.Models import UserResponse
+from Dto.Records import CallLine, InvoiceRecord
+
+
+def build_invoice(calls: int, seed: int) -> InvoiceRecord:
+    """
+    Builds an invoice of `calls` priced calls with random destinations, durations and dates.
+    """
+    generator = np.random.default_rng(seed)
+    durations = generator.integers(1, 3600, calls)
+    dates = pd.Timestamp("2025-01-01", tz="UTC") + pd.to_timedelta(np.sort(generator.integers(0, 365 * 86400, calls)), unit="s")
+    amounts = durations * 0.75
+    lines = [
+        CallLine(f"+54{number:011d}", int(duration), date, float(amount))
+        for number, duration, date, amount in zip(generator.integers(10 ** 10, 10 ** 11, calls), durations, dates, amounts)
+    ]
+    user = UserResponse(address="Av. Siempreviva 742", name="Homero", phone_number="+5491167930920", friends=[])
+    return InvoiceRecord(
+        user=user, calls=lines, total_international_seconds=int(durations.sum()), total_national_seconds=0,
+        total_friends_seconds=0, gross_total=float(amounts.sum()), friends_discount=0.0, total=float(amounts.sum()),
+    )
+
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(sizes: list, repeat: int, seed: int) -> list:
+    """
+    Measures the serialization of invoices of every size through the Pydantic models and jsonable_encoder
+    (the previous path of the endpoints) against InvoiceRecord.to_json, checking both give the same bytes.
+    """
+    results = []
+    for size in sizes:
+        invoice = build_invoice(size, seed)
+        standard = lambda: JSONResponse(jsonable_encoder(invoice.to_response())).body
+        assert standard() == invoice.to_json(), "to_json differs from the FastAPI encoding"
+        standard_seconds = best_of(standard, repeat)
+        fast_seconds = best_of(invoice.to_json, repeat)
+        results.append({
+            "benchmark": "serialization", "calls": size, "bytes": len(invoice.to_json()),
+            "standard_ms": standard_seconds * 1000, "to_json_ms": fast_seconds * 1000, "speedup": standard_seconds / fast_seconds,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the JSON serialization of invoices")
+    parser.add_argument("--calls", type=int, nargs="+", default=[10, 1000, 100000], help="Calls per invoice")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for result in run(args.calls, args.repeat, args.seed):
+        print(json.dumps(result))
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import time
+
+from Benchmarks.stub_users_server import start_stub_users_server, users_api_url
+from Services import UsersConnectorService
+
+
+def run(users: int, latency: float, concurrencies: list) -> list:
+    """
+    Measures how many users per second UsersConnectorService resolves against the stub Users API,
+    one by one with get_user and in batch with get_users at several concurrency levels.
+    """
+    server = start_stub_users_server(latency=latency, not_found_ratio=0.05)
+    os.environ["USERS_API_URL"] = users_api_url(server)
+    os.environ["USERS_CACHE_TTL"] = "0"
+    os.environ["USERS_CACHE_NOT_FOUND_TTL"] = "0"
+    # Every number twice, to exercise the dedup
+    phones = [f"+5491100{number:06d}" for number in range(users)] * 2
+    results = []
+
+    connector = UsersConnectorService()
+    started = time.perf_counter()
+    for phone in phones[:users]:
+        try:
+            connector.get_user(phone)
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - started
+    results.append({"benchmark": "users_get_user_sequential", "users": users, "seconds": elapsed, "users_per_second": users / elapsed})
+
+    for concurrency in concurrencies:
+        os.environ["USERS_API_CONCURRENCY"] = str(concurrency)
+        os.environ["USERS_API_POOL_SIZE"] = str(concurrency)
+        connector = UsersConnectorService()
+        started = time.perf_counter()
+        resolved = connector.get_users(phones)
+        elapsed = time.perf_counter() - started
+        results.append({
+            "benchmark": "users_get_users_batch", "users": users, "concurrency": concurrency,
+            "resolved": len(resolved), "seconds": elapsed, "users_per_second": users / elapsed,
+        })
+    server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the batch users prefetch against a local stub Users API")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated Users API latency")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+    for result in run(args.users, args.latency_ms / 1000, args.concurrency):
+        print(json.dumps(result))
@@ -0,0 +1,115 @@
+import argparse
+import json
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+
+
+def subscriber_numbers(ids: np.ndarray) -> np.ndarray:
+    """
+    Returns the phone numbers of the given subscriber ids (national, "+54911" plus 8 digits).
+    """
+    return np.char.add("+54911", np.char.zfill(ids.astype(str), 8))
+
+
+def friend_numbers(ids: np.ndarray, friends_per_user: int) -> np.ndarray:
+    """
+    Returns the friends of the given subscriber ids, one row per subscriber: even friends are national
+    numbers ("+54922" plus 8 digits) and odd ones international ("+1" plus 10 digits).
+    """
+    slots = np.arange(friends_per_user)
+    seeds = (ids[:, None] * 7919 + slots[None, :] * 104729) % 10**8
+    national = np.char.add("+54922", np.char.zfill(seeds.astype(str), 8))
+    international = np.char.add("+1", np.char.zfill(seeds.astype(str), 10))
+    return np.where(slots[None, :] % 2 == 0, national, international)
+
+
+def subscriber_weights(subscribers: int, skew: float) -> np.ndarray:
+    """
+    Returns the probability that a call belongs to each subscriber: a Zipf-like distribution where
+    subscriber i makes calls in proportion to 1 / (i + 1) ** skew (0 is uniform).
+    """
+    weights = 1.0 / np.arange(1, subscribers + 1) ** skew
+    return weights / weights.sum()
+
+
+def generate_cdr(path: str, rows: int, subscribers: int = 10000, seed: int = 42, skew: float = 1.0,
+                 international_ratio: float = 0.2, friends_ratio: float = 0.1, friends_per_user: int = 4,
+                 date_from: datetime = datetime(2025, 1, 1, tzinfo=timezone.utc),
+                 date_to: datetime = datetime(2026, 1, 1, tzinfo=timezone.utc),
+                 chunk_size: int = 1000000) -> Dict[str, List[str]]:
+    """
+    Writes a synthetic CDR CSV file with the columns of the registry (numero_origen, numero_destino, duracion, fecha).
+
+    The output only depends on the arguments (seeded), and it is generated in chunks of `chunk_size` rows so
+    files of 10^8 rows do not need to fit in memory. Calls are not sorted, like the original file.
+
+    Args:
+        path (str): The CSV file to write.
+        rows (int): Number of calls.
+        subscribers (int): Number of origin numbers.
+        seed (int): Seed of the random generator.
+        skew (float): Skew of the calls per subscriber distribution, see subscriber_weights.
+        international_ratio (float): Share of the calls to numbers that are neither friends nor national.
+        friends_ratio (float): Share of the calls to one of the subscriber's friends.
+        friends_per_user (int): Friends of every subscriber.
+        date_from (datetime): Dates are uniformly distributed from this date...
+        date_to (datetime): ...to this one.
+        chunk_size (int): Rows generated and written at a time.
+
+    Returns:
+        Dict[str, List[str]]: The friends of every subscriber, in the format of the stub users server --friends-file.
+    """
+    generator = np.random.default_rng(seed)
+    weights = subscriber_weights(subscribers, skew)
+    first, last = int(date_from.timestamp()), int(date_to.timestamp())
+
+    with open(path, "w") as output:
+        output.write("numero_origen,numero_destino,duracion,fecha\n")
+        for position in range(0, rows, chunk_size):
+            size = min(chunk_size, rows - position)
+            ids = generator.choice(subscribers, size=size, p=weights)
+            kind = generator.random(size)
+            friends = friend_numbers(ids, friends_per_user)[np.arange(size), generator.integers(0, friends_per_user, size)]
+            others = generator.integers(0, 10**8, size)
+            destinations = np.where(
+                kind < friends_ratio,
+                friends,
+                np.where(
+                    kind < friends_ratio + international_ratio,
+                    np.char.add("+34", np.char.zfill(others.astype(str), 9)),
+                    np.char.add("+54933", np.char.zfill(others.astype(str), 8)),
+                ),
+            )
+            durations = np.clip(generator.exponential(180, size).astype(np.int64), 1, 7200)
+            dates = np.char.add(np.datetime_as_string(generator.integers(first, last, size).astype("datetime64[s]")), "Z")
+            lines = np.char.add(np.char.add(np.char.add(subscriber_numbers(ids), ","), destinations), ",")
+            lines = np.char.add(np.char.add(np.char.add(lines, durations.astype(str)), ","), dates)
+            output.write("\n".join(lines.tolist()) + "\n")
+
+    ids = np.arange(subscribers)
+    return dict(zip(subscriber_numbers(ids).tolist(), friend_numbers(ids, friends_per_user).tolist()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic CDR CSV file for benchmarks")
+    parser.add_argument("path", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of the calls per subscriber, 0 is uniform")
+    parser.add_argument("--international-ratio", type=float, default=0.2)
+    parser.add_argument("--friends-ratio", type=float, default=0.1)
+    parser.add_argument("--friends-per-user", type=int, default=4)
+    parser.add_argument("--friends-file", help="Write the friends of every subscriber to this JSON file (stub users server --friends-file)")
+    args = parser.parse_args()
+
+    friends = generate_cdr(
+        args.path, args.rows, args.subscribers, args.seed, args.skew,
+        args.international_ratio, args.friends_ratio, args.friends_per_user,
+    )
+    if args.friends_file:
+        with open(args.friends_file, "w") as friends_file:
+            json.dump(friends, friends_file)
+    print(f"{args.rows} calls of {args.subscribers} subscribers written to {args.path}")
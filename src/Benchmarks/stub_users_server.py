@@ -0,0 +1,95 @@
+import argparse
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import unquote
+
+
+class StubUsersHandler(BaseHTTPRequestHandler):
+    """
+    Answers `GET /users/<phone>` like the Users API, with deterministic fake users.
+    Keep-alive is supported so clients can reuse their pooled connections.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if not self.path.startswith("/users/"):
+            return self._reply(404, {})
+        phone = unquote(self.path[len("/users/"):])
+        seed = zlib.crc32(phone.encode())
+        if seed % 1000 < server.not_found_ratio * 1000:
+            return self._reply(404, {})
+        self._reply(200, {
+            "address": f"{seed % 9999} Stub Street",
+            "friends": server.friends.get(phone, []),
+            "name": f"Stub User {seed}",
+            "phone_number": phone,
+        })
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_users_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                            not_found_ratio: float = 0.0, friends: Dict[str, List[str]] = None) -> ThreadingHTTPServer:
+    """
+    Starts the stub Users API in a daemon thread.
+
+    Args:
+        host (str): Interface to listen on.
+        port (int): Port to listen on, 0 picks a free one (see `server.server_port`).
+        latency (float): Seconds every answer is delayed, to simulate the remote API.
+        not_found_ratio (float): Share of phone numbers answered with a 404.
+        friends (Dict[str, List[str]]): Friends list of each phone number, empty by default.
+
+    Returns:
+        ThreadingHTTPServer: The running server, USERS_API_URL is `http://<host>:<port>/users/:phoneNumber`.
+    """
+    server = ThreadingHTTPServer((host, port), StubUsersHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.not_found_ratio = not_found_ratio
+    server.friends = friends or {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def users_api_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/users/:phoneNumber"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the Users API, for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay of every answer in milliseconds")
+    parser.add_argument("--not-found-ratio", type=float, default=0.0, help="Share of phone numbers answered with a 404")
+    parser.add_argument("--friends-file", help="JSON file with the friends list of each phone number")
+    args = parser.parse_args()
+
+    friends = None
+    if args.friends_file:
+        with open(args.friends_file) as friends_file:
+            friends = json.load(friends_file)
+    server = start_stub_users_server(args.host, args.port, args.latency_ms / 1000, args.not_found_ratio, friends)
+    print(f"USERS_API_URL={users_api_url(server)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,124 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, TextIO
+
+from fastapi import HTTPException
+
+from Config.dependencies import get_call_registry, get_pricing_engine, get_user_connector, get_vectorized_call_processor
+from Dto.Models import PhoneInvoiceRequest
+from Services import PhoneInvoiceService
+
+CSV_COLUMNS = [
+    "phone_number", "name", "address", "calls", "total_international_seconds", "total_national_seconds",
+    "total_friends_seconds", "gross_total", "friends_discount", "total", "error",
+]
+
+
+def invoice_chunk(phone_numbers: List[str], date_from: datetime, date_to: datetime) -> List[dict]:
+    """
+    Invoices a chunk of subscribers with the PhoneInvoiceService logic, in a worker process.
+    The users of the chunk are prefetched in one batch. Subscribers that can not be invoiced
+    (unknown user, no calls, users API failure) produce an error record instead.
+    """
+    users = get_user_connector().get_users(phone_numbers)
+    # The pricing engine keeps the per-invoice state in an accumulator, one service serves the whole chunk
+    service = PhoneInvoiceService(get_call_registry(), get_user_connector(), get_pricing_engine(), get_vectorized_call_processor())
+    records = []
+    for phone_number in phone_numbers:
+        if phone_number not in users:
+            records.append({"phone_number": phone_number, "error": "Users API error"})
+            continue
+        if users[phone_number] is None:
+            records.append({"phone_number": phone_number, "error": "User not found"})
+            continue
+        request = PhoneInvoiceRequest(phone_number=phone_number, date_from=date_from, date_to=date_to)
+        try:
+            records.append(service.get_user_phone_invoice(request, users[phone_number]).to_response().model_dump(mode="json", warnings=False))
+        except HTTPException as error:
+            records.append({"phone_number": phone_number, "error": error.detail})
+    return records
+
+
+def write_jsonl(output: TextIO, records: List[dict]):
+    for record in records:
+        output.write(json.dumps(record) + "\n")
+
+
+def write_csv(output: TextIO, records: List[dict]):
+    writer = csv.DictWriter(output, fieldnames=CSV_COLUMNS)
+    for record in records:
+        if "error" in record:
+            writer.writerow({"phone_number": record["phone_number"], "error": record["error"]})
+        else:
+            writer.writerow({
+                **{column: record[column] for column in CSV_COLUMNS[4:-1]},
+                **record["user"],
+                "calls": len(record["calls"]),
+            })
+
+
+def run_bill(date_from: datetime, date_to: datetime, output: TextIO, output_format: str = "jsonl",
+             workers: int = None, chunk_size: int = 100, progress: TextIO = sys.stderr) -> dict:
+    """
+    Invoices every subscriber with calls between two dates.
+
+    The registry is partitioned by numero_origen in chunks of `chunk_size` subscribers that are priced across a
+    pool of `workers` processes (one per core by default). Invoices are written to `output` as soon as their
+    chunk finishes, so the output order is not deterministic.
+
+    Returns:
+        dict: The number of subscribers, invoices written and errors.
+    """
+    started = time.perf_counter()
+    phone_numbers = get_call_registry().get_origin_numbers(date_from, date_to)
+    chunks = [phone_numbers[position:position + chunk_size] for position in range(0, len(phone_numbers), chunk_size)]
+    write = write_csv if output_format == "csv" else write_jsonl
+    if output_format == "csv":
+        csv.DictWriter(output, fieldnames=CSV_COLUMNS).writeheader()
+
+    summary = {"subscribers": len(phone_numbers), "invoices": 0, "errors": 0}
+    # Workers forked after the registry was loaded share it copy-on-write instead of loading it again. Fork is
+    # requested explicitly as it is not the default start method everywhere (spawn on macOS, forkserver on Linux
+    # from Python 3.14), where every worker would load the registry again; platforms without it (Windows) do so
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as executor:
+        futures = [executor.submit(invoice_chunk, chunk, date_from, date_to) for chunk in chunks]
+        for future in as_completed(futures):
+            records = future.result()
+            write(output, records)
+            errors = sum(1 for record in records if "error" in record)
+            summary["errors"] += errors
+            summary["invoices"] += len(records) - errors
+            done = summary["invoices"] + summary["errors"]
+            elapsed = time.perf_counter() - started
+            progress.write(f"\r{done}/{summary['subscribers']} subscribers ({done / elapsed:.0f}/s)")
+            progress.flush()
+    progress.write("\n")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Invoices every subscriber with calls in a billing period")
+    parser.add_argument("date_from", type=datetime.fromisoformat, help="Billing period start (ISO date)")
+    parser.add_argument("date_to", type=datetime.fromisoformat, help="Billing period end (ISO date)")
+    parser.add_argument("output", help="Output file, .jsonl or .csv")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format, inferred from the output extension by default")
+    parser.add_argument("--workers", type=int, help="Worker processes, one per core by default")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Subscribers priced per task")
+    parser.add_argument("--env-file", help="Load the configuration from this .env file")
+    args = parser.parse_args()
+
+    if args.env_file:
+        from dotenv import load_dotenv
+        load_dotenv(args.env_file)
+    output_format = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    with open(args.output, "w", newline="") as output:
+        summary = run_bill(args.date_from, args.date_to, output, output_format, args.workers, args.chunk_size)
+    print(json.dumps(summary))
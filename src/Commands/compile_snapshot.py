@@ -0,0 +1,25 @@
+import argparse
+
+import pandas as pd
+
+from Connectors import CallsRegistryCSVConnector, CallsRegistrySnapshot
+
+
+def compile_snapshot(csv_path: str, snapshot_path: str) -> CallsRegistrySnapshot:
+    """
+    Parses a CDR CSV file and writes it as a memory-mappable call registry snapshot.
+    """
+    frame = pd.read_csv(csv_path, dtype=CallsRegistryCSVConnector.column_types)
+    frame["fecha"] = pd.to_datetime(frame["fecha"], utc=True)
+    snapshot = CallsRegistrySnapshot.from_frame(frame)
+    snapshot.save(snapshot_path)
+    return snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compiles a CDR CSV file into a memory-mappable call registry snapshot")
+    parser.add_argument("csv_path", help="CDR CSV file to compile")
+    parser.add_argument("snapshot_path", help="Directory where the snapshot is written")
+    args = parser.parse_args()
+    snapshot = compile_snapshot(args.csv_path, args.snapshot_path)
+    print(f"{len(snapshot)} calls, {len(snapshot.index_origin)} origin numbers written to {args.snapshot_path}")
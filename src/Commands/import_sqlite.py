@@ -0,0 +1,54 @@
+import argparse
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from Connectors import CallsRegistryCSVConnector, CallsRegistrySQLiteConnector
+
+
+def import_sqlite(csv_path: str, database_path: str, batch_size: int = 100000) -> int:
+    """
+    Appends the calls of a CDR CSV file to a SQLite call registry database, creating it if needed.
+
+    The file is read in chunks of batch_size rows and every chunk is inserted in its own transaction,
+    so memory does not depend on the size of the file. When the table is empty, the (numero_origen, fecha)
+    index is dropped during the import and rebuilt once at the end, which is faster than updating it row by
+    row. On a table that already has calls the index is kept, so workers reading the database meanwhile
+    never fall back to full table scans.
+
+    Returns:
+        int: The number of imported calls.
+    """
+    connection = sqlite3.connect(database_path)
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute(CallsRegistrySQLiteConnector.TABLE_SCHEMA)
+        if connection.execute("SELECT NOT EXISTS (SELECT 1 FROM calls)").fetchone()[0]:
+            connection.execute("DROP INDEX IF EXISTS calls_origin_fecha")
+
+        imported = 0
+        for chunk in pd.read_csv(csv_path, dtype=CallsRegistryCSVConnector.column_types, chunksize=batch_size):
+            timestamps = pd.to_datetime(chunk["fecha"], utc=True).dt.tz_convert(None).to_numpy(dtype="datetime64[s]").astype(np.int64)
+            rows = zip(chunk["numero_origen"].tolist(), chunk["numero_destino"].tolist(), chunk["duracion"].tolist(), timestamps.tolist())
+            with connection:
+                connection.executemany("INSERT INTO calls (numero_origen, numero_destino, duracion, fecha) VALUES (?, ?, ?, ?)", rows)
+            imported += len(chunk)
+
+        with connection:
+            connection.execute(CallsRegistrySQLiteConnector.INDEX_SCHEMA)
+        connection.execute("ANALYZE")
+        return imported
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Imports a CDR CSV file into a SQLite call registry database")
+    parser.add_argument("csv_path", help="CDR CSV file to import")
+    parser.add_argument("database_path", help="SQLite database, created if it does not exist")
+    parser.add_argument("--batch-size", type=int, default=100000, help="Rows inserted per transaction")
+    args = parser.parse_args()
+    imported = import_sqlite(args.csv_path, args.database_path, args.batch_size)
+    print(f"{imported} calls imported into {args.database_path}")
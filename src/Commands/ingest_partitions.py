@@ -0,0 +1,93 @@
+import argparse
+import json
+import math
+import os
+import shutil
+
+import pandas as pd
+
+from Connectors import CallsRegistryCSVConnector, CallsRegistryHashPartitionedConnector, CallsRegistrySnapshot
+
+# Estimated memory of one parsed call (two phone number strings, a duration and a date) in a DataFrame,
+# doubled while a partition is encoded
+ROW_BYTES = 256
+SAMPLE_BYTES = 1 << 20
+
+
+def plan_ingestion(csv_path: str, memory_budget_mb: int) -> tuple[int, int]:
+    """
+    Returns the (chunk rows, partition count) that keep the ingestion of a CSV file within a memory budget.
+    The row count is estimated from the size of the file and the mean length of its first lines.
+    """
+    budget = memory_budget_mb * (1 << 20)
+    with open(csv_path, "rb") as csv_file:
+        sample = csv_file.read(SAMPLE_BYTES)
+    line_bytes = len(sample) / max(sample.count(b"\n"), 1)
+    rows = os.path.getsize(csv_path) / line_bytes
+    return max(budget // ROW_BYTES, 1), max(math.ceil(rows * ROW_BYTES * 2 / budget), 1)
+
+
+def ingest_partitions(csv_path: str, partitions_path: str, memory_budget_mb: int = 512, partitions: int = None, chunk_rows: int = None) -> int:
+    """
+    Ingests a CDR CSV file of any size into hash partitions (see CallsRegistryHashPartitionedConnector).
+
+    The file is streamed in chunks of `chunk_rows` rows and every chunk is split by the hash of the origin
+    number into one spill file per partition. Each spill file is then encoded on its own as a snapshot sorted
+    by origin and date, so the peak memory is bounded by the chunk size and the partition size instead of
+    the file size. Partitions are written next to `partitions_path` and renamed into place at the end.
+
+    Args:
+        memory_budget_mb (int): Memory the ingestion may use, in MB. Sets the defaults of partitions and chunk_rows.
+        partitions (int): Number of hash partitions.
+        chunk_rows (int): Rows read from the CSV file at a time.
+
+    Returns:
+        int: The number of ingested calls.
+    """
+    planned_chunk_rows, planned_partitions = plan_ingestion(csv_path, memory_budget_mb)
+    partitions = partitions or planned_partitions
+    chunk_rows = chunk_rows or planned_chunk_rows
+
+    tmp_path = f"{partitions_path.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    spill_path = os.path.join(tmp_path, "spill")
+    os.makedirs(spill_path)
+
+    # Pass 1: split the chunks by partition into raw CSV spill files
+    rows = 0
+    spilled = set()
+    for chunk in pd.read_csv(csv_path, dtype=CallsRegistryCSVConnector.column_types, chunksize=chunk_rows):
+        origins = chunk["numero_origen"].unique()
+        hashes = {origin: CallsRegistryHashPartitionedConnector.partition_of(origin, partitions) for origin in origins}
+        for index, part in chunk.groupby(chunk["numero_origen"].map(hashes), sort=False):
+            part.to_csv(os.path.join(spill_path, f"{index}.csv"), mode="a", header=index not in spilled, index=False)
+            spilled.add(index)
+        rows += len(chunk)
+
+    # Pass 2: encode every partition as a snapshot sorted by origin and date
+    for index in spilled:
+        spill_file = os.path.join(spill_path, f"{index}.csv")
+        frame = pd.read_csv(spill_file, dtype=CallsRegistryCSVConnector.column_types)
+        frame["fecha"] = pd.to_datetime(frame["fecha"], utc=True)
+        CallsRegistrySnapshot.from_frame(frame).save(os.path.join(tmp_path, CallsRegistryHashPartitionedConnector.partition_name(index)))
+        del frame
+        os.remove(spill_file)
+    os.rmdir(spill_path)
+
+    with open(os.path.join(tmp_path, CallsRegistryHashPartitionedConnector.MANIFEST_FILE_NAME), "w") as manifest_file:
+        json.dump({"hash": "crc32", "partitions": partitions, "rows": rows, "written": sorted(int(index) for index in spilled)}, manifest_file, indent=2)
+    shutil.rmtree(partitions_path, ignore_errors=True)
+    os.replace(tmp_path, partitions_path)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingests a CDR CSV file larger than the memory into partitions by origin number hash")
+    parser.add_argument("csv_path", help="CDR CSV file to ingest")
+    parser.add_argument("partitions_path", help="Directory where the partitions are written")
+    parser.add_argument("--memory-budget", type=int, default=512, help="Memory the ingestion may use, in MB")
+    parser.add_argument("--partitions", type=int, help="Number of hash partitions, derived from the file size and the budget by default")
+    parser.add_argument("--chunk-rows", type=int, help="Rows read at a time, derived from the budget by default")
+    args = parser.parse_args()
+    rows = ingest_partitions(args.csv_path, args.partitions_path, args.memory_budget, args.partitions, args.chunk_rows)
+    print(f"{rows} calls written to {args.partitions_path}")
@@ -0,0 +1,49 @@
+import argparse
+import os
+import shutil
+import time
+
+from Commands.compile_snapshot import compile_snapshot
+from Connectors import CallsRegistrySharedConnector
+
+
+def publish_registry(csv_path: str, shared_path: str, keep: int = 2) -> str:
+    """
+    Publishes a CDR CSV file as a new generation of the shared registry (see CallsRegistrySharedConnector).
+
+    The snapshot is compiled into a new generation directory and the `current` symlink is then replaced
+    atomically (a new symlink renamed over the old one), so workers either see the previous generation
+    or the complete new one. Only the newest `keep` generations are kept: workers still reading an older
+    one keep its pages mapped until they attach to the new generation.
+
+    Returns:
+        str: The name of the published generation.
+    """
+    os.makedirs(shared_path, exist_ok=True)
+    generation = f"generation-{time.time_ns()}"
+    compile_snapshot(csv_path, os.path.relpath(os.path.join(shared_path, generation)))
+
+    link = os.path.join(shared_path, CallsRegistrySharedConnector.CURRENT_LINK)
+    tmp_link = f"{link}.tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(generation, tmp_link)
+    os.replace(tmp_link, link)
+
+    generations = sorted(name for name in os.listdir(shared_path) if name.startswith("generation-") and not name.endswith(".tmp"))
+    for name in generations[:-keep]:
+        shutil.rmtree(os.path.join(shared_path, name), ignore_errors=True)
+    return generation
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publishes a CDR CSV file as a new generation of the shared memory call registry")
+    parser.add_argument("csv_path", help="CDR CSV file to publish")
+    parser.add_argument("--shared-path", default=os.environ.get("SHARED_REGISTRY_PATH", "/dev/shm/call-registry"),
+                        help="Directory of the generations (absolute path, in shared memory)")
+    parser.add_argument("--keep", type=int, default=2, help="Generations kept, the newest ones")
+    args = parser.parse_args()
+    if args.keep < 1:
+        parser.error("--keep must be at least 1, the published generation")
+    generation = publish_registry(args.csv_path, args.shared_path, args.keep)
+    print(f"{generation} published in {args.shared_path}")
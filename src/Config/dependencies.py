@@ -1,47 +1,172 @@
+import os
+from functools import lru_cache
 from fastapi import Depends
-from Connectors import CallsRegistryBaseConnector, CallsRegistryCSVConnector
-from Services import PhoneInvoiceService, UsersConnectorService
-from Services.CallProcessor import NationalCallProcessorStrategy, FriendsCallProcessorStrategy, InternationalCallProcessorStrategy, CallProcessorContext
+from Connectors import AsyncCallsRegistryAdapter, AsyncCallsRegistryBaseConnector, CallsRegistryBaseConnector, CallsRegistryCSVConnector, CallsRegistryHashPartitionedConnector, CallsRegistryPartitionedConnector, CallsRegistrySharedConnector, CallsRegistrySnapshotConnector, CallsRegistrySQLiteConnector, CallsSegmentLog
+from Metrics import RequestProfiler
+from Services.Cache import AsyncSingleFlight, InvoiceCache, SingleFlight
+from Services import AsyncPhoneInvoiceService, AsyncUsersConnectorService, CallsIngestionService, PhoneInvoiceService, UsersConnectorService
+from Services.CallProcessor import NationalCallProcessorStrategy, FriendsCallProcessorStrategy, InternationalCallProcessorStrategy, CallProcessorContext, PricingEngine, RatePlan, VectorizedCallProcessor
 
+@lru_cache
 def get_call_registry()->CallsRegistryBaseConnector:
     """
     Returns the Call registry connector service
     This Class can be change for any other connector who implements the CallsRegistryBaseConnector interface
+    The registry is built once per process (on application startup) and shared by every request.
+    The implementation is selected with the CALLS_REGISTRY_CONNECTOR environment variable:
+    - csv (default): CallsRegistryCSVConnector, parses CSV_FILE_PATH (and accepts new calls logged at INGEST_LOG_PATH, if set).
+    - snapshot: CallsRegistrySnapshotConnector, memory-maps the snapshot at SNAPSHOT_PATH.
+    - partitioned: CallsRegistryPartitionedConnector, date-partitioned CSV files at CSV_PARTITIONS_PATH.
+    - hashed: CallsRegistryHashPartitionedConnector, partitions by origin number hash at HASH_PARTITIONS_PATH.
+    - sqlite: CallsRegistrySQLiteConnector, indexed SQLite database at SQLITE_PATH.
+    - shared: CallsRegistrySharedConnector, snapshot published in shared memory at SHARED_REGISTRY_PATH.
     """
-    return CallsRegistryCSVConnector()
+    connector = os.environ.get("CALLS_REGISTRY_CONNECTOR", "csv")
+    if connector == "snapshot":
+        return CallsRegistrySnapshotConnector()
+    if connector == "partitioned":
+        return CallsRegistryPartitionedConnector()
+    if connector == "hashed":
+        return CallsRegistryHashPartitionedConnector()
+    if connector == "sqlite":
+        return CallsRegistrySQLiteConnector()
+    if connector == "shared":
+        return CallsRegistrySharedConnector()
+    return CallsRegistryCSVConnector(ingest_log=CallsSegmentLog.from_env())
 
+@lru_cache
 def get_user_connector():
     """
     Returns the UsersConnectorService instance.
     This service is responsible for managing user-related operations.
+    It is shared by every request so its connection pool and users cache are reused.
     """
     return UsersConnectorService()
 
+@lru_cache
+def get_rate_plan():
+    """
+    Returns the shared RatePlan of the tariff table at RATE_PLAN_PATH, or None for a flat international price.
+    """
+    return RatePlan.from_env()
+
+@lru_cache
+def get_pricing_engine():
+    """
+    Returns the PricingEngine shared by every request and batch worker, built once from the tariffs
+    (NATIONAL_PRICE_PER_CALL, INTERNATIONAL_PRICE_PER_SECOND, FRIENDS_CALLS and the rate plan).
+    """
+    return PricingEngine.from_env(get_rate_plan())
+
 def get_price_calculator_strategies():
     """
-    Returns a CallProcessorContext instance with configured call processing strategies.
+    Returns a CallProcessorContext instance with configured call processing strategies, for a single invoice.
+    The strategies are the reference implementation of the pricing rules; the services price with get_pricing_engine.
     - Adds the FriendsCallProcessorStrategy, which combines national and international strategies.
     - Adds the NationalCallProcessorStrategy for handling national calls.
-    - Adds the InternationalCallProcessorStrategy for handling international calls.
+    - Adds the InternationalCallProcessorStrategy for handling international calls (priced with the rate plan, if any).
     """
     national_strategy_instance = NationalCallProcessorStrategy()
-    international_strategy_instance = InternationalCallProcessorStrategy()
+    international_strategy_instance = InternationalCallProcessorStrategy(get_rate_plan())
     strategy_context = CallProcessorContext()
     strategy_context.add_strategy(FriendsCallProcessorStrategy([national_strategy_instance, international_strategy_instance]))
     strategy_context.add_strategy(national_strategy_instance)
     strategy_context.add_strategy(international_strategy_instance)
     return strategy_context
 
+@lru_cache
+def get_vectorized_call_processor():
+    """
+    Returns the shared VectorizedCallProcessor when the PRICING_ENGINE environment variable is "vectorized",
+    or None to price the calls through the strategies (PRICING_ENGINE=strategies, the default).
+    """
+    if os.environ.get("PRICING_ENGINE", "strategies") == "vectorized":
+        return VectorizedCallProcessor.from_env(get_rate_plan())
+    return None
+
+@lru_cache
+def get_invoice_cache():
+    """
+    Returns the InvoiceCache shared by every request (INVOICE_CACHE_SIZE and INVOICE_CACHE_TTL, 0 disables it),
+    keyed by the tariffs of the engine that prices the invoices.
+    """
+    return InvoiceCache.from_env((get_vectorized_call_processor() or get_pricing_engine()).fingerprint)
+
+@lru_cache
+def get_invoice_single_flight():
+    """
+    Returns the SingleFlight shared by every request, so concurrent identical invoice requests share one
+    computation, or None when the INVOICE_SINGLE_FLIGHT environment variable is 0 (default 1).
+    """
+    if os.environ.get("INVOICE_SINGLE_FLIGHT", "1") == "0":
+        return None
+    return SingleFlight("invoice")
+
+@lru_cache
+def get_async_invoice_single_flight():
+    """
+    Returns the AsyncSingleFlight of the async invoice path, see get_invoice_single_flight.
+    """
+    if os.environ.get("INVOICE_SINGLE_FLIGHT", "1") == "0":
+        return None
+    return AsyncSingleFlight("invoice")
+
+@lru_cache
+def get_request_profiler():
+    """
+    Returns the RequestProfiler, or None when profiling is disabled (see RequestProfiler.from_env).
+    """
+    return RequestProfiler.from_env()
+
 def get_service(
         call_registry: CallsRegistryBaseConnector = Depends(get_call_registry),
         user_connector: UsersConnectorService = Depends(get_user_connector),
-        price_calculator: CallProcessorContext = Depends(get_price_calculator_strategies)
+        price_calculator: PricingEngine = Depends(get_pricing_engine),
+        vectorized_price_calculator: VectorizedCallProcessor = Depends(get_vectorized_call_processor),
+        invoice_cache: InvoiceCache = Depends(get_invoice_cache),
+        in_flight: SingleFlight = Depends(get_invoice_single_flight)
     ):
     """
     Returns an instance of PhoneInvoiceService.
     - call_registry: Dependency injection for the call registry connector.
     - user_connector: Dependency injection for the user connector service.
-    - price_calculator: Dependency injection for the call processing strategies.
+    - price_calculator: Dependency injection for the shared call by call pricing engine.
+    - vectorized_price_calculator: Dependency injection for the batch pricing engine (None to use the strategies).
+    - invoice_cache: Dependency injection for the shared cache of computed invoices.
+    - in_flight: Dependency injection for the invoice computations in flight (None disables coalescing).
     This service handles the generation of phone invoices.
     """
-    return PhoneInvoiceService(call_registry, user_connector, price_calculator)
\ No newline at end of file
+    return PhoneInvoiceService(call_registry, user_connector, price_calculator, vectorized_price_calculator, invoice_cache, in_flight)
+
+def get_calls_ingestion_service(call_registry: CallsRegistryBaseConnector = Depends(get_call_registry)):
+    """
+    Returns the CallsIngestionService that appends new calls to the shared call registry.
+    """
+    return CallsIngestionService(call_registry)
+
+@lru_cache
+def get_async_call_registry()->AsyncCallsRegistryBaseConnector:
+    """
+    Returns the shared call registry (see get_call_registry) behind the async connector interface.
+    """
+    return AsyncCallsRegistryAdapter(get_call_registry())
+
+@lru_cache
+def get_async_user_connector():
+    """
+    Returns the shared AsyncUsersConnectorService instance, used by the async invoice path.
+    """
+    return AsyncUsersConnectorService()
+
+def get_async_service(
+        call_registry: AsyncCallsRegistryBaseConnector = Depends(get_async_call_registry),
+        user_connector: AsyncUsersConnectorService = Depends(get_async_user_connector),
+        price_calculator: PricingEngine = Depends(get_pricing_engine),
+        vectorized_price_calculator: VectorizedCallProcessor = Depends(get_vectorized_call_processor),
+        invoice_cache: InvoiceCache = Depends(get_invoice_cache),
+        in_flight: AsyncSingleFlight = Depends(get_async_invoice_single_flight)
+    ):
+    """
+    Returns an instance of AsyncPhoneInvoiceService, the async version of get_service.
+    """
+    return AsyncPhoneInvoiceService(call_registry, user_connector, price_calculator, vectorized_price_calculator, invoice_cache, in_flight)
@@ -0,0 +1,58 @@
+from abc import ABC, abstractmethod
+import asyncio
+import datetime
+from typing import Iterator, List
+import pandas as pd
+
+from src.Dto.Records import CallRecord, RangeRollups
+from .CallsRegistryBaseConnector import CallsRegistryBaseConnector
+
+class AsyncCallsRegistryBaseConnector(ABC):
+    """
+    Async counterpart of CallsRegistryBaseConnector, for the async invoice path.
+    """
+    data_version: str = None  # See CallsRegistryBaseConnector.data_version
+    @abstractmethod
+    async def get_list_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        pass
+
+    @abstractmethod
+    async def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        pass
+
+    @abstractmethod
+    async def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        pass
+
+    async def get_range_rollups(self, phone_number: str, from_date: datetime, to_date: datetime) -> RangeRollups | None:
+        """
+        See CallsRegistryBaseConnector.get_range_rollups.
+        """
+        return None
+
+
+class AsyncCallsRegistryAdapter(AsyncCallsRegistryBaseConnector):
+    """
+    Exposes a sync CallsRegistryBaseConnector through the async interface. Queries run in a worker thread,
+    so a large slice of the registry does not block the event loop.
+    """
+    _connector: CallsRegistryBaseConnector
+
+    def __init__(self, connector: CallsRegistryBaseConnector):
+        self._connector = connector
+
+    @property
+    def data_version(self) -> str:
+        return self._connector.data_version
+
+    async def get_list_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        return await asyncio.to_thread(self._connector.get_list_calls, phone_number, from_date, to_date)
+
+    async def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        return await asyncio.to_thread(self._connector.get_calls_frame, phone_number, from_date, to_date)
+
+    async def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        return await asyncio.to_thread(self._connector.iter_calls, phone_number, from_date, to_date)
+
+    async def get_range_rollups(self, phone_number: str, from_date: datetime, to_date: datetime) -> RangeRollups | None:
+        return await asyncio.to_thread(self._connector.get_range_rollups, phone_number, from_date, to_date)
@@ -1,10 +1,92 @@
 from abc import ABC, abstractmethod
+from fastapi import HTTPException
 import datetime
-from typing import List
+from typing import Iterator, List
+import uuid
+import pandas as pd
 
-from src.Dto.Models import CallResponse
+from src.Dto.Records import CallRecord, RangeRollups
 
 class CallsRegistryBaseConnector(ABC):
+    @property
+    def data_version(self) -> str:
+        """
+        Stamp of the data served by the registry, it changes whenever the calls may have changed (invoice caches
+        are keyed by it). By default it is unique per connector, so reloading the registry changes it;
+        connectors whose data can change while they are open override it.
+        """
+        if "_data_version" not in self.__dict__:
+            self._data_version = uuid.uuid4().hex
+        return self._data_version
+
+    @property
+    def row_count(self) -> int | None:
+        """
+        Number of calls held by the registry, None when it can not be known without reading every call.
+        """
+        return None
+
+    @abstractmethod
+    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        pass
+
+    def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        """
+        Returns the calls as a DataFrame with the CallRecord columns, sorted by date.
+        Connectors that already hold the calls in columnar form override it to skip building CallRecord objects.
+        """
+        return pd.DataFrame([call.as_dict() for call in self.get_list_calls(phone_number, from_date, to_date)])
+
+    def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        """
+        Returns an iterator over the calls, sorted by date, raising the "no calls" error eagerly (before iterating).
+        Connectors override it to build the CallRecord objects lazily, so streaming an invoice does not
+        materialize every call at once.
+        """
+        return iter(self.get_list_calls(phone_number, from_date, to_date))
+
+    @staticmethod
+    def iter_records(records: pd.DataFrame, chunk_size: int = 1000) -> Iterator[CallRecord]:
+        """
+        Lazily converts calls rows to CallRecord objects, `chunk_size` rows at a time.
+        """
+        for position in range(0, len(records), chunk_size):
+            yield from CallsRegistryBaseConnector.to_records(records.iloc[position:position + chunk_size])
+
+    @staticmethod
+    def to_records(records: pd.DataFrame) -> List[CallRecord]:
+        """
+        Converts calls rows to CallRecord objects, column by column (no per-row dicts nor validation).
+        """
+        return list(map(
+            CallRecord,
+            records["numero_origen"].tolist(),
+            records["numero_destino"].tolist(),
+            records["duracion"].tolist(),
+            records["fecha"].tolist(),
+        ))
+
+    def append_calls(self, calls: pd.DataFrame) -> int:
+        """
+        Durably appends validated calls (CallRecord columns, UTC fecha) to the registry and makes them visible
+        to the following queries. Returns the number of calls held by the registry afterwards.
+        Raises a 501 error for registries that do not accept new calls.
+        """
+        raise HTTPException(status_code=501, detail="The call registry does not accept new calls")
+
+    def get_range_rollups(self, phone_number: str, from_date: datetime, to_date: datetime) -> RangeRollups | None:
+        """
+        Splits a date range in the months (UTC) whose calls are all inside it, returned as monthly rollups per
+        destination, and the calls of the partial months at its edges, see RangeRollups.
+        Returns None when the connector has no rollups or no month is whole, then the invoice totals are
+        computed from the calls.
+        """
+        return None
+
     @abstractmethod
-    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallResponse]:
-        pass
\ No newline at end of file
+    def get_origin_numbers(self, from_date: datetime, to_date: datetime) -> List[str]:
+        """
+        Returns the origin numbers with at least one call between two dates (both inclusive).
+        Used by batch jobs to partition the registry by numero_origen.
+        """
+        pass
@@ -1,14 +1,41 @@
 from .CallsRegistryBaseConnector import CallsRegistryBaseConnector
+from .CallsRegistrySnapshot import CallsRegistrySnapshot
+from .CallsSegmentLog import CallsSegmentLog
 from datetime import datetime
 from fastapi import HTTPException
-from typing import List
+from typing import Iterator, List, Tuple
+import numpy as np
 import pandas as pd
 import os
+import threading
+import uuid
 
-from src.Dto.Models import CallResponse
+from src.Dto.Records import CallRecord, RangeRollups
 
 class CallsRegistryCSVConnector(CallsRegistryBaseConnector):
-    client = None
+    """
+    Call registry backed by a CSV file.
+
+    The file is parsed once and encoded (see CallsRegistrySnapshot): phone numbers are interned into
+    int32 codes of a shared dictionary, durations are int32 and dates int64 epoch seconds, sorted by
+    origin code and date with every origin code indexed to its contiguous block of rows. A query encodes
+    the phone number, binary searches its date range on the integer columns and only decodes the rows found.
+
+    Monthly rollups (call count, seconds and first call per origin, month and destination) are built
+    at load time from the encoded columns and kept encoded too, so totals of whole months do not
+    re-aggregate the calls.
+
+    Calls ingested after the load (see append_calls) are written to the segment log first and kept in a
+    small encoded delta, queried together with the file calls. When the delta reaches `compact_rows`
+    calls it is merged into the file calls and the rollups are rebuilt. On startup the log is replayed.
+
+    Attributes:
+        _live (tuple): The file calls (CallsRegistrySnapshot, sorted by origin code and date), their encoded
+                       monthly rollups (origin, month ordinal, destination, calls, seconds, first_call epoch
+                       seconds, sorted by origin, month and destination) and the delta (CallsRegistrySnapshot
+                       or None). Replaced as a whole, so a query never sees half of a compaction.
+    """
+    _live: tuple = (None, None, None)
     # Define the expected column types
     column_types = {
         "numero_origen": str,  # Phone numbers as strings
@@ -17,34 +44,217 @@ class CallsRegistryCSVConnector(CallsRegistryBaseConnector):
         "fecha": str,  # Dates as strings
     }
 
-    def __init__(self):
-        file_path = os.environ.get("CSV_FILE_PATH")
+    def __init__(self, file_path: str = None, ingest_log: CallsSegmentLog = None, compact_rows: int = None):
+        """
+        Args:
+            file_path (str): The CSV file, defaults to the CSV_FILE_PATH environment variable.
+            ingest_log (CallsSegmentLog): Log of the ingested calls, replayed on load. None disables ingestion.
+            compact_rows (int): Delta size that triggers a compaction, defaults to the
+                                INGEST_COMPACT_ROWS environment variable (or 100000).
+        """
+        file_path = file_path or os.environ.get("CSV_FILE_PATH")
+        self._ingest_log = ingest_log
+        self._compact_rows = compact_rows or int(os.environ.get("INGEST_COMPACT_ROWS", 100000))
+        self._ingest_lock = threading.Lock()
         try:
-            self.client = pd.read_csv(f"./{file_path}", dtype=self.column_types)
+            frame = pd.read_csv(f"./{file_path}", dtype=self.column_types)
             # Convert Dates to datetime
-            self.client["fecha"] = pd.to_datetime(self.client["fecha"], utc=True)
+            frame["fecha"] = pd.to_datetime(frame["fecha"], utc=True)
+            client = CallsRegistrySnapshot.from_frame(frame)
+            del frame
+            self._live = (client, self._build_rollups(client), None)
         except FileNotFoundError:
              raise HTTPException(status_code=500, detail="CSV file not found")
-        except ValueError as e:
-            print({"error": str(e)})
+        except (ValueError, KeyError) as error:
+            raise HTTPException(status_code=500, detail=f"Malformed CSV file: {error}")
+        if ingest_log is not None:
+            batches = list(ingest_log.replay())
+            if batches:
+                self._merge(CallsRegistrySnapshot.from_frame(pd.concat(batches, ignore_index=True)))
+
+    @property
+    def client(self) -> CallsRegistrySnapshot:
+        """
+        The encoded calls of the file (and of the compacted deltas).
+        """
+        return self._live[0]
+
+    @property
+    def row_count(self) -> int:
+        client, _, delta = self._live
+        return len(client) + (len(delta) if delta is not None else 0)
+
+    def append_calls(self, calls: pd.DataFrame) -> int:
+        if self._ingest_log is None:
+            return super().append_calls(calls)
+        with self._ingest_lock:
+            self._ingest_log.append(calls)
+            self._merge(CallsRegistrySnapshot.from_frame(calls))
+            # Invoices cached before this batch are stale
+            self._data_version = uuid.uuid4().hex
+            return self.row_count
+
+    def _merge(self, batch: CallsRegistrySnapshot):
+        """
+        Merges encoded calls into the delta, compacting the delta into the file calls when it is large enough.
+        """
+        client, rollups, delta = self._live
+        delta = batch if delta is None else delta.merge(batch)
+        if len(delta) >= self._compact_rows:
+            client = client.merge(delta)
+            self._live = (client, self._build_rollups(client), None)
+        else:
+            self._live = (client, rollups, delta)
+
+    @staticmethod
+    def _build_rollups(client: CallsRegistrySnapshot) -> pd.DataFrame:
+        """
+        Aggregates the encoded calls by origin code, month (UTC) and destination code.
+        """
+        months = client.timestamp.astype("datetime64[s]").astype("datetime64[M]").astype(np.int32)
+        return (
+            pd.DataFrame({
+                "origin": client.origin, "month": months, "destination": client.destination,
+                "duration": client.duration, "timestamp": client.timestamp,
+            })
+            .groupby(["origin", "month", "destination"], sort=True)
+            .agg(calls=("duration", "size"), seconds=("duration", "sum"), first_call=("timestamp", "min"))
+            .reset_index()
+            .astype({"calls": np.int32, "seconds": np.int32})
+        )
+
+    def _find(self, phone_number: str, from_date: datetime, to_date: datetime) -> Tuple[CallsRegistrySnapshot, int, int, pd.DataFrame | None]:
+        """
+        Returns the file calls snapshot and the row range of the calls made by a phone number between two dates
+        (both inclusive), and the matching delta calls (None when the delta has none).
+        """
+        client, _, delta = self._live
+        first, last = client.find(phone_number, from_date, to_date)
+        if delta is not None:
+            delta_first, delta_last = delta.find(phone_number, from_date, to_date)
+            if delta_first < delta_last:
+                return client, first, last, delta.to_frame(delta_first, delta_last)
+        return client, first, last, None
 
-    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallResponse]:
-        # Filter the DataFrame for the given phone number
+    def find_records(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        """
+        Returns the rows of the calls made by a phone number between two dates (both inclusive), sorted by date.
+        """
+        client, first, last, delta_records = self._find(phone_number, from_date, to_date)
+        records = client.to_frame(first, last)
+        if delta_records is None:
+            return records
+        # Ingested calls go after the file calls of the same date
+        return pd.concat([records, delta_records], ignore_index=True).sort_values(by="fecha", kind="mergesort", ignore_index=True)
 
-        # Convert from_date and to_date to UTC timezone
-        from_date = from_date.astimezone(pd.Timestamp.utcnow().tz)
-        to_date = to_date.astimezone(pd.Timestamp.utcnow().tz)
+    def count_records(self, phone_number: str, from_date: datetime, to_date: datetime) -> int:
+        """
+        Returns the number of calls made by a phone number between two dates (both inclusive), without decoding them.
+        """
+        client, _, delta = self._live
+        first, last = client.find(phone_number, from_date, to_date)
+        if delta is not None:
+            delta_first, delta_last = delta.find(phone_number, from_date, to_date)
+            return last - first + delta_last - delta_first
+        return last - first
 
-        records = self.client[
-            (self.client["numero_origen"] == phone_number) &
-            (self.client["fecha"] >= from_date) &
-            (self.client["fecha"] <= to_date)
-        ]
+    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        client, first, last, delta_records = self._find(phone_number, from_date, to_date)
+        if delta_records is not None:
+            return self.to_records(self.find_records(phone_number, from_date, to_date))
         # Check if a record was found
-        if not records.empty:
+        if first < last:
 
-            # Convert the filtered records to a list of CallResponse objects
-            return [CallResponse(**record) for record in records.sort_values(by="fecha", ascending=True).to_dict(orient="records")]
+            # Decode the found rows to a list of CallRecord objects
+            return client.to_calls(first, last)
         else:
             raise HTTPException(status_code=404, detail="No calls found for the given phone number")
-        
\ No newline at end of file
+
+    def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        records = self.find_records(phone_number, from_date, to_date)
+        if records.empty:
+            raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+        return records
+
+    def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        client, first, last, delta_records = self._find(phone_number, from_date, to_date)
+        if delta_records is not None:
+            return self.iter_records(self.find_records(phone_number, from_date, to_date))
+        if first < last:
+            return client.iter_calls(first, last)
+        raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+
+    def get_monthly_rollups(self, phone_number: str, first_month: pd.Period, last_month: pd.Period) -> pd.DataFrame:
+        """
+        Returns the rollups of a phone number from first_month to last_month (both included), sorted by month:
+        columns numero_origen, month, numero_destino, calls (count), seconds and first_call (date).
+        """
+        client, rollups, delta = self._live
+        origins = rollups["origin"].to_numpy()
+        code = client.encode(phone_number)
+        start, stop = np.searchsorted(origins, code, side="left"), np.searchsorted(origins, code, side="right")
+        months = rollups["month"].to_numpy()[start:stop]
+        first = start + np.searchsorted(months, first_month.ordinal, side="left")
+        last = start + np.searchsorted(months, last_month.ordinal, side="right")
+        rollups = rollups.iloc[first:last]
+        rollups = pd.DataFrame({
+            "numero_origen": np.char.decode(client.phones[rollups["origin"].to_numpy()]),
+            "month": pd.PeriodIndex.from_ordinals(rollups["month"].to_numpy(dtype=np.int64), freq="M"),
+            "numero_destino": np.char.decode(client.phones[rollups["destination"].to_numpy()]),
+            "calls": rollups["calls"].to_numpy(),
+            "seconds": rollups["seconds"].to_numpy(),
+            "first_call": pd.to_datetime(rollups["first_call"].to_numpy(), unit="s", utc=True),
+        })
+        if delta is None:
+            return rollups
+
+        # Aggregate the delta calls of the months on the fly and add them to the file rollups
+        delta_calls = delta.to_frame(*delta.find(phone_number, self._month_start(first_month), self._month_start(last_month + 1) - pd.Timedelta(1, "ns")))
+        if delta_calls.empty:
+            return rollups
+        delta_rollups = (
+            delta_calls.assign(month=delta_calls["fecha"].dt.tz_convert(None).dt.to_period("M"))
+            .groupby(["numero_origen", "month", "numero_destino"], sort=True)
+            .agg(calls=("duracion", "size"), seconds=("duracion", "sum"), first_call=("fecha", "min"))
+            .reset_index()
+        )
+        return (
+            pd.concat([rollups, delta_rollups], ignore_index=True)
+            .groupby(["numero_origen", "month", "numero_destino"], sort=True)
+            .agg(calls=("calls", "sum"), seconds=("seconds", "sum"), first_call=("first_call", "min"))
+            .reset_index()
+        )
+
+    def get_range_rollups(self, phone_number: str, from_date: datetime, to_date: datetime) -> RangeRollups | None:
+        from_date = pd.Timestamp(from_date.astimezone(pd.Timestamp.now(tz="UTC").tz))
+        to_date = pd.Timestamp(to_date.astimezone(pd.Timestamp.now(tz="UTC").tz))
+
+        # The months at the edges count as whole when the range covers all their calls
+        first_month = from_date.tz_convert(None).to_period("M")
+        if self.count_records(phone_number, self._month_start(first_month), from_date - pd.Timedelta(1, "ns")):
+            first_month += 1
+        last_month = to_date.tz_convert(None).to_period("M")
+        if self.count_records(phone_number, to_date + pd.Timedelta(1, "ns"), self._month_start(last_month + 1) - pd.Timedelta(1, "ns")):
+            last_month -= 1
+        if first_month > last_month:
+            return None
+
+        range_rollups = RangeRollups(
+            head = self.find_records(phone_number, from_date, self._month_start(first_month) - pd.Timedelta(1, "ns")),
+            rollups = self.get_monthly_rollups(phone_number, first_month, last_month),
+            tail = self.find_records(phone_number, self._month_start(last_month + 1), to_date),
+            load_month = lambda month: self.find_records(phone_number, self._month_start(month), self._month_start(month + 1) - pd.Timedelta(1, "ns")),
+        )
+        if range_rollups.head.empty and range_rollups.rollups.empty and range_rollups.tail.empty:
+            raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+        return range_rollups
+
+    @staticmethod
+    def _month_start(month: pd.Period) -> pd.Timestamp:
+        return month.start_time.tz_localize("UTC")
+
+    def get_origin_numbers(self, from_date: datetime, to_date: datetime) -> List[str]:
+        client, _, delta = self._live
+        if delta is None:
+            return client.origin_numbers(from_date, to_date)
+        return sorted(set(client.origin_numbers(from_date, to_date)).union(delta.origin_numbers(from_date, to_date)))
@@ -0,0 +1,85 @@
+from .CallsRegistryBaseConnector import CallsRegistryBaseConnector
+from .CallsRegistrySnapshotConnector import CallsRegistrySnapshotConnector
+from datetime import datetime
+from fastapi import HTTPException
+from functools import lru_cache
+from typing import Iterator, List
+import heapq
+import json
+import os
+import zlib
+import pandas as pd
+
+from src.Dto.Records import CallRecord
+
+class CallsRegistryHashPartitionedConnector(CallsRegistryBaseConnector):
+    """
+    Call registry split into partitions by a hash of the origin number, for CDR files larger than the memory
+    (`python -m Commands.ingest_partitions <csv> <partitions> --memory-budget 512`).
+
+    Every partition is a snapshot (see CallsRegistrySnapshot) holding all the calls of its origin numbers,
+    sorted by date, so the invoice of a phone number only opens one partition. Partitions are memory-mapped
+    when first queried and at most `cache_size` of them are kept open.
+
+    Attributes:
+        partitions (int): Number of hash partitions.
+    """
+    MANIFEST_FILE_NAME = "manifest.json"
+    partitions: int = None
+
+    def __init__(self, partitions_path: str = None, cache_size: int = None):
+        """
+        Args:
+            partitions_path (str): Directory written by ingest_partitions, defaults to the
+                                   HASH_PARTITIONS_PATH environment variable.
+            cache_size (int): Maximum number of open partitions, defaults to the
+                              HASH_PARTITIONS_CACHE_SIZE environment variable (or 16).
+        """
+        self._path = f"./{partitions_path or os.environ.get('HASH_PARTITIONS_PATH')}"
+        cache_size = cache_size or int(os.environ.get("HASH_PARTITIONS_CACHE_SIZE", 16))
+        try:
+            with open(os.path.join(self._path, self.MANIFEST_FILE_NAME)) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            raise HTTPException(status_code=500, detail="Hash partitions not found")
+        self.partitions = manifest["partitions"]
+        self._rows = manifest["rows"]
+        self._written = set(manifest["written"])
+        self._open_partition = lru_cache(maxsize=cache_size)(self._load_partition)
+
+    @staticmethod
+    def partition_name(index: int) -> str:
+        return f"part-{index:05d}"
+
+    @staticmethod
+    def partition_of(phone_number: str, partitions: int) -> int:
+        """
+        Returns the partition of an origin number (CRC-32 of the number modulo the partition count).
+        """
+        return zlib.crc32(phone_number.encode()) % partitions
+
+    @property
+    def row_count(self) -> int:
+        return self._rows
+
+    def _load_partition(self, index: int) -> CallsRegistrySnapshotConnector:
+        return CallsRegistrySnapshotConnector(os.path.join(self._path, self.partition_name(index)))
+
+    def _partition(self, phone_number: str) -> CallsRegistrySnapshotConnector:
+        index = self.partition_of(phone_number, self.partitions)
+        if index not in self._written:
+            raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+        return self._open_partition(index)
+
+    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        return self._partition(phone_number).get_list_calls(phone_number, from_date, to_date)
+
+    def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        return self._partition(phone_number).get_calls_frame(phone_number, from_date, to_date)
+
+    def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        return self._partition(phone_number).iter_calls(phone_number, from_date, to_date)
+
+    def get_origin_numbers(self, from_date: datetime, to_date: datetime) -> List[str]:
+        # Origin numbers do not repeat across partitions, merge the sorted lists of every partition
+        return list(heapq.merge(*(self._open_partition(index).get_origin_numbers(from_date, to_date) for index in sorted(self._written))))
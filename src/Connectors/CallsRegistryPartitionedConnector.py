@@ -0,0 +1,124 @@
+from .CallsRegistryBaseConnector import CallsRegistryBaseConnector
+from .CallsRegistryCSVConnector import CallsRegistryCSVConnector
+from datetime import datetime
+from fastapi import HTTPException
+from functools import lru_cache
+from typing import Dict, Iterator, List
+import glob
+import json
+import os
+import pandas as pd
+
+from src.Dto.Records import CallRecord
+
+class CallsRegistryPartitionedConnector(CallsRegistryBaseConnector):
+    """
+    Call registry backed by date-partitioned CSV files (for example one file per day or month).
+
+    A manifest keeps the min and max `fecha` of every file, so a query only opens the partitions whose
+    range overlaps the requested dates. Opened partitions are indexed like CallsRegistryCSVConnector
+    and kept in a bounded LRU cache.
+
+    The manifest is persisted next to the partitions (MANIFEST_FILE_NAME) and an entry is only
+    recomputed when the size or modification time of its file changes.
+
+    Attributes:
+        _manifest (Dict[str, dict]): Partition path -> {"size", "mtime", "min", "max"} (min/max as ISO dates).
+    """
+    MANIFEST_FILE_NAME = ".manifest.json"
+    _manifest: Dict[str, dict] = None
+
+    def __init__(self, partitions_path: str = None, cache_size: int = None):
+        """
+        Args:
+            partitions_path (str): Directory or glob pattern of the partition files,
+                                   defaults to the CSV_PARTITIONS_PATH environment variable.
+            cache_size (int): Maximum number of open partitions, defaults to the
+                              CSV_PARTITIONS_CACHE_SIZE environment variable (or 32).
+        """
+        partitions_path = f"./{partitions_path or os.environ.get('CSV_PARTITIONS_PATH')}"
+        cache_size = cache_size or int(os.environ.get("CSV_PARTITIONS_CACHE_SIZE", 32))
+        pattern = os.path.join(partitions_path, "*.csv") if os.path.isdir(partitions_path) else partitions_path
+        files = sorted(glob.glob(pattern))
+        if not files:
+            raise HTTPException(status_code=500, detail="CSV partitions not found")
+        self._manifest_path = os.path.join(os.path.dirname(pattern), self.MANIFEST_FILE_NAME)
+        self._manifest = self._build_manifest(files)
+        self._open_partition = lru_cache(maxsize=cache_size)(CallsRegistryCSVConnector)
+
+    def _build_manifest(self, files: List[str]) -> Dict[str, dict]:
+        """
+        Returns the manifest of the given files, reusing the persisted entries that are still valid
+        and scanning only the `fecha` column of new or modified files.
+        """
+        try:
+            with open(self._manifest_path) as manifest_file:
+                persisted = json.load(manifest_file)
+        except (OSError, ValueError):
+            persisted = {}
+
+        manifest = {}
+        for file_path in files:
+            stat = os.stat(file_path)
+            entry = persisted.get(file_path)
+            if entry is None or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+                dates = pd.to_datetime(pd.read_csv(file_path, usecols=["fecha"], dtype=str)["fecha"], utc=True)
+                if dates.empty:
+                    continue
+                entry = {"size": stat.st_size, "mtime": stat.st_mtime, "min": dates.min().isoformat(), "max": dates.max().isoformat()}
+            manifest[file_path] = entry
+
+        if manifest != persisted:
+            try:
+                with open(self._manifest_path, "w") as manifest_file:
+                    json.dump(manifest, manifest_file, indent=2)
+            except OSError:
+                pass  # Read-only location, the manifest is rebuilt on the next start
+        return manifest
+
+    def get_partitions(self, from_date: datetime, to_date: datetime) -> List[str]:
+        """
+        Returns the partitions whose date range overlaps [from_date, to_date], ordered by their min date.
+        """
+        from_date = pd.Timestamp(from_date.astimezone(pd.Timestamp.now(tz="UTC").tz))
+        to_date = pd.Timestamp(to_date.astimezone(pd.Timestamp.now(tz="UTC").tz))
+        overlapping = [
+            (pd.Timestamp(entry["min"]), file_path)
+            for file_path, entry in self._manifest.items()
+            if pd.Timestamp(entry["min"]) <= to_date and pd.Timestamp(entry["max"]) >= from_date
+        ]
+        return [file_path for _, file_path in sorted(overlapping)]
+
+    def find_records(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        """
+        Returns the rows of the calls made by a phone number between two dates (both inclusive), sorted by date.
+        """
+        frames = [
+            self._open_partition(file_path).find_records(phone_number, from_date, to_date)
+            for file_path in self.get_partitions(from_date, to_date)
+        ]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=list(CallsRegistryCSVConnector.column_types))
+
+        # Partitions may overlap in time, keep the calls in date order
+        return pd.concat(frames).sort_values(by="fecha", kind="mergesort") if len(frames) > 1 else frames[0]
+
+    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        records = self.get_calls_frame(phone_number, from_date, to_date)
+        return self.to_records(records)
+
+    def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        records = self.find_records(phone_number, from_date, to_date)
+        if records.empty:
+            raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+        return records
+
+    def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        return self.iter_records(self.get_calls_frame(phone_number, from_date, to_date))
+
+    def get_origin_numbers(self, from_date: datetime, to_date: datetime) -> List[str]:
+        phone_numbers = set()
+        for file_path in self.get_partitions(from_date, to_date):
+            phone_numbers.update(self._open_partition(file_path).get_origin_numbers(from_date, to_date))
+        return sorted(phone_numbers)
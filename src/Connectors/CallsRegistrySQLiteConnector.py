@@ -0,0 +1,142 @@
+from .CallsRegistryBaseConnector import CallsRegistryBaseConnector
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from typing import Iterator, List, Tuple
+import math
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+from src.Dto.Records import CallRecord
+
+class CallsRegistrySQLiteConnector(CallsRegistryBaseConnector):
+    """
+    Call registry backed by a SQLite database, built from the CDR CSV files with
+    `python -m Commands.import_sqlite <csv> <database>`.
+
+    The calls table has a composite index on (numero_origen, fecha), so a query is an index range scan and
+    only the rows of the requested phone number and dates are read from disk: the registry does not need
+    to fit in memory and one database file can be shared by every worker of a host.
+
+    Dates are stored as epoch seconds (UTC). Rows with the same origin number and date keep the order of
+    the imported files (rowid).
+
+    SQLite connections can not be shared between threads, so every thread opens its own read-only connection
+    on first use, and iter_calls iterators read through a connection of their own. Queries are constant SQL strings with parameters, prepared once per connection by the
+    sqlite3 statement cache.
+
+    Attributes:
+        database_path (str): The path of the SQLite database.
+    """
+    TABLE_SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS calls ("
+        "numero_origen TEXT NOT NULL, numero_destino TEXT NOT NULL, duracion INTEGER NOT NULL, fecha INTEGER NOT NULL)"
+    )
+    INDEX_SCHEMA = "CREATE INDEX IF NOT EXISTS calls_origin_fecha ON calls (numero_origen, fecha)"
+    CALLS_QUERY = (
+        "SELECT numero_origen, numero_destino, duracion, fecha FROM calls "
+        "WHERE numero_origen = ? AND fecha BETWEEN ? AND ? ORDER BY fecha, rowid"
+    )
+    ORIGIN_NUMBERS_QUERY = "SELECT DISTINCT numero_origen FROM calls WHERE fecha BETWEEN ? AND ? ORDER BY numero_origen"
+    database_path: str = None
+
+    def __init__(self, database_path: str = None, fetch_size: int = 1000):
+        """
+        Args:
+            database_path (str): The SQLite database, defaults to the SQLITE_PATH environment variable.
+            fetch_size (int): Number of rows fetched at a time when iterating over the calls.
+        """
+        self.database_path = f"./{database_path or os.environ.get('SQLITE_PATH')}"
+        if not os.path.isfile(self.database_path):
+            raise HTTPException(status_code=500, detail="SQLite database not found")
+        self._fetch_size = fetch_size
+        self._local = threading.local()
+
+    @property
+    def data_version(self) -> str:
+        """
+        Changes when the database is written, for example by a new import (database and write-ahead log sizes and modification times).
+        """
+        stamps = []
+        for path in (self.database_path, f"{self.database_path}-wal"):
+            try:
+                stat = os.stat(path)
+                stamps.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+            except FileNotFoundError:
+                stamps.append("-")
+        return "/".join(stamps)
+
+    @property
+    def row_count(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM calls").fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns the read-only connection of the current thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{os.path.abspath(self.database_path)}?mode=ro", uri=True, check_same_thread=check_same_thread)
+
+    def find_rows(self, phone_number: str, from_date: datetime, to_date: datetime) -> sqlite3.Cursor:
+        """
+        Returns a cursor over the rows of the calls made by a phone number between two dates (both inclusive), sorted by date.
+        """
+        return self._connection().execute(self.CALLS_QUERY, (phone_number, *self._epoch_range(from_date, to_date)))
+
+    @staticmethod
+    def _epoch_range(from_date: datetime, to_date: datetime) -> Tuple[int, int]:
+        return math.ceil(from_date.timestamp()), math.floor(to_date.timestamp())
+
+    @staticmethod
+    def to_call(row: tuple) -> CallRecord:
+        return CallRecord(row[0], row[1], row[2], datetime.fromtimestamp(row[3], tz=timezone.utc))
+
+    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        rows = self.find_rows(phone_number, from_date, to_date).fetchall()
+        if not rows:
+            raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+        return list(map(self.to_call, rows))
+
+    def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        rows = self.find_rows(phone_number, from_date, to_date).fetchall()
+        if not rows:
+            raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+        frame = pd.DataFrame(rows, columns=["numero_origen", "numero_destino", "duracion", "fecha"])
+        frame["fecha"] = pd.to_datetime(frame["fecha"], unit="s", utc=True)
+        return frame
+
+    def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        """
+        The iterator reads through its own connection, closed when it is exhausted or dropped: it is usually
+        consumed in a different thread (the async adapter queries in a worker thread, the stream is sent from another one).
+        """
+        connection = self._connect(check_same_thread=False)
+        try:
+            cursor = connection.execute(self.CALLS_QUERY, (phone_number, *self._epoch_range(from_date, to_date)))
+            rows = cursor.fetchmany(self._fetch_size)
+        except BaseException:
+            connection.close()
+            raise
+        if not rows:
+            connection.close()
+            raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+        return self._iter_rows(connection, cursor, rows)
+
+    def _iter_rows(self, connection: sqlite3.Connection, cursor: sqlite3.Cursor, rows: List[tuple]) -> Iterator[CallRecord]:
+        try:
+            while rows:
+                yield from map(self.to_call, rows)
+                rows = cursor.fetchmany(self._fetch_size)
+        finally:
+            connection.close()
+
+    def get_origin_numbers(self, from_date: datetime, to_date: datetime) -> List[str]:
+        rows = self._connection().execute(self.ORIGIN_NUMBERS_QUERY, self._epoch_range(from_date, to_date))
+        return [row[0] for row in rows]
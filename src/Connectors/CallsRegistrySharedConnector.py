@@ -0,0 +1,100 @@
+from .CallsRegistryBaseConnector import CallsRegistryBaseConnector
+from .CallsRegistrySnapshotConnector import CallsRegistrySnapshotConnector
+from datetime import datetime
+from fastapi import HTTPException
+from typing import Iterator, List
+import os
+import threading
+import time
+import pandas as pd
+
+from src.Dto.Records import CallRecord
+
+class CallsRegistrySharedConnector(CallsRegistryBaseConnector):
+    """
+    Call registry shared by every worker of a host through shared memory.
+
+    A loader publishes the registry as a snapshot generation in a shared memory directory
+    (`python -m Commands.publish_registry <csv>`, /dev/shm by default) and points the CURRENT_LINK symlink
+    to it. Workers memory-map the snapshot of the current generation read-only, so the calls are held once
+    in memory whatever the number of workers.
+
+    Publishing a new generation swaps the symlink atomically. Workers notice it within `check_interval`
+    seconds and attach to the new generation; queries already running keep the one they started with
+    (its pages stay mapped even after the loader removes its files).
+
+    Attributes:
+        shared_path (str): The directory of the generations.
+    """
+    CURRENT_LINK = "current"
+    shared_path: str = None
+
+    def __init__(self, shared_path: str = None, check_interval: float = None):
+        """
+        Args:
+            shared_path (str): The directory of the generations (an absolute path), defaults to the
+                               SHARED_REGISTRY_PATH environment variable or /dev/shm/call-registry.
+            check_interval (float): Seconds between checks of the current generation, defaults to the
+                                    SHARED_REGISTRY_CHECK_INTERVAL environment variable (or 1).
+        """
+        self.shared_path = shared_path or os.environ.get("SHARED_REGISTRY_PATH", "/dev/shm/call-registry")
+        if check_interval is None:
+            check_interval = float(os.environ.get("SHARED_REGISTRY_CHECK_INTERVAL", 1))
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._generation = None
+        self._connector = None
+        self._checked_at = 0.0
+        if self._attach() is None:
+            raise HTTPException(status_code=500, detail="Shared registry not published")
+
+    @property
+    def generation(self) -> str:
+        """
+        The name of the generation in use.
+        """
+        self._attach()
+        return self._generation
+
+    @property
+    def data_version(self) -> str:
+        return self.generation
+
+    @property
+    def row_count(self) -> int:
+        return self._attach().row_count
+
+    def _attach(self) -> CallsRegistrySnapshotConnector | None:
+        """
+        Returns the connector of the current generation, attaching to a new one when the symlink changed
+        (checked at most every `check_interval` seconds). A generation that can no longer be opened is skipped.
+        """
+        connector = self._connector
+        if connector is not None and time.monotonic() - self._checked_at < self._check_interval:
+            return connector
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                generation = os.readlink(os.path.join(self.shared_path, self.CURRENT_LINK))
+            except OSError:
+                return self._connector
+            if generation != self._generation:
+                try:
+                    self._connector = CallsRegistrySnapshotConnector(os.path.relpath(os.path.join(self.shared_path, generation)))
+                except (FileNotFoundError, HTTPException):
+                    # The generation was removed by a later publish before attaching: keep the current one until the next check
+                    return self._connector
+                self._generation = generation
+            return self._connector
+
+    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        return self._attach().get_list_calls(phone_number, from_date, to_date)
+
+    def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        return self._attach().get_calls_frame(phone_number, from_date, to_date)
+
+    def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        return self._attach().iter_calls(phone_number, from_date, to_date)
+
+    def get_origin_numbers(self, from_date: datetime, to_date: datetime) -> List[str]:
+        return self._attach().get_origin_numbers(from_date, to_date)
@@ -0,0 +1,171 @@
+import math
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.Dto.Records import CallRecord
+
+
+class CallsRegistrySnapshot:
+    """
+    Columnar, encoded representation of the call registry.
+
+    Phone numbers are interned into int32 codes (positions in the sorted `phones` dictionary),
+    durations are int32 and dates are int64 epoch seconds. Rows are sorted by origin code and date,
+    and the origin index maps every origin code to its contiguous block of rows.
+
+    A snapshot can be saved as a directory of `.npy` files and loaded back memory-mapped, so
+    starting a process costs a few `mmap` calls instead of a CSV parse, and the OS page cache
+    shares the pages between every process that maps the same snapshot.
+
+    Attributes:
+        phones (np.ndarray): Sorted unique phone numbers (ASCII bytes), the code dictionary.
+        origin (np.ndarray): Origin phone code of each call.
+        destination (np.ndarray): Destination phone code of each call.
+        duration (np.ndarray): Duration of each call in seconds.
+        timestamp (np.ndarray): Date of each call in epoch seconds (UTC).
+        index_origin (np.ndarray): Sorted origin codes present in the registry.
+        index_start (np.ndarray): First row of each indexed origin code.
+        index_stop (np.ndarray): Row after the last one of each indexed origin code.
+    """
+    COLUMNS = ("phones", "origin", "destination", "duration", "timestamp", "index_origin", "index_start", "index_stop")
+
+    def __init__(self, **columns: np.ndarray):
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self) -> int:
+        return len(self.origin)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "CallsRegistrySnapshot":
+        """
+        Encodes a calls DataFrame (numero_origen, numero_destino, duracion and UTC fecha columns).
+        """
+        origin = frame["numero_origen"].to_numpy(dtype="S")
+        destination = frame["numero_destino"].to_numpy(dtype="S")
+        phones, codes = np.unique(np.concatenate([origin, destination]), return_inverse=True)
+        timestamp = frame["fecha"].dt.tz_convert(None).to_numpy(dtype="datetime64[s]").astype(np.int64)
+        return cls.from_columns(phones, codes[:len(origin)], codes[len(origin):], frame["duracion"].to_numpy(), timestamp)
+
+    @classmethod
+    def from_columns(cls, phones: np.ndarray, origin: np.ndarray, destination: np.ndarray, duration: np.ndarray, timestamp: np.ndarray) -> "CallsRegistrySnapshot":
+        """
+        Sorts encoded calls by origin code and date (stable, ties keep the given order) and indexes the origin codes.
+        """
+        origin_codes = origin.astype(np.int32)
+        order = np.lexsort((timestamp, origin_codes))
+        origin_codes = origin_codes[order]
+        starts = np.flatnonzero(np.r_[True, origin_codes[1:] != origin_codes[:-1]]) if len(order) else np.array([], dtype=np.int64)
+        return cls(
+            phones=phones,
+            origin=origin_codes,
+            destination=destination.astype(np.int32)[order],
+            duration=duration.astype(np.int32)[order],
+            timestamp=timestamp.astype(np.int64)[order],
+            index_origin=origin_codes[starts],
+            index_start=starts.astype(np.int64),
+            index_stop=np.r_[starts[1:], len(order)].astype(np.int64),
+        )
+
+    def merge(self, other: "CallsRegistrySnapshot") -> "CallsRegistrySnapshot":
+        """
+        Returns a snapshot with the calls of both snapshots, re-encoded on the union of their dictionaries.
+        Calls of the same origin and date keep this snapshot's calls first, like appending `other` to the file.
+        """
+        phones = np.union1d(self.phones, other.phones)
+        own_codes, other_codes = np.searchsorted(phones, self.phones), np.searchsorted(phones, other.phones)
+        return self.from_columns(
+            phones,
+            np.concatenate([own_codes[self.origin], other_codes[other.origin]]),
+            np.concatenate([own_codes[self.destination], other_codes[other.destination]]),
+            np.concatenate([self.duration, other.duration]),
+            np.concatenate([self.timestamp, other.timestamp]),
+        )
+
+    def save(self, path: str):
+        """
+        Writes the snapshot as one `.npy` file per column. The files are written to a temporary
+        directory first and then renamed, so readers never see a half written snapshot.
+        """
+        tmp_path = f"{path.rstrip(os.sep)}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in self.COLUMNS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CallsRegistrySnapshot":
+        """
+        Loads a snapshot written by `save`, memory-mapped read-only unless `mmap` is False.
+        """
+        mmap_mode = "r" if mmap else None
+        return cls(**{name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in cls.COLUMNS})
+
+    def encode(self, phone_number: str) -> int:
+        """
+        Returns the code of a phone number, or -1 if it is not in the dictionary.
+        """
+        value = phone_number.encode()
+        position = int(np.searchsorted(self.phones, value))
+        if position < len(self.phones) and self.phones[position] == value:
+            return position
+        return -1
+
+    def find(self, phone_number: str, from_date: datetime, to_date: datetime) -> Tuple[int, int]:
+        """
+        Returns the (first, last) row range of the calls made by a phone number between two dates
+        (both inclusive). The range is empty when there are no calls.
+        """
+        code = self.encode(phone_number)
+        position = int(np.searchsorted(self.index_origin, code))
+        if code < 0 or position >= len(self.index_origin) or self.index_origin[position] != code:
+            return 0, 0
+        start, stop = int(self.index_start[position]), int(self.index_stop[position])
+        timestamps = self.timestamp[start:stop]
+        first = start + int(np.searchsorted(timestamps, math.ceil(from_date.timestamp()), side="left"))
+        last = start + int(np.searchsorted(timestamps, math.floor(to_date.timestamp()), side="right"))
+        return first, last
+
+    def origin_numbers(self, from_date: datetime, to_date: datetime) -> List[str]:
+        """
+        Returns the origin numbers with at least one call between two dates (both inclusive), in one pass over the dates.
+        """
+        in_range = (self.timestamp >= math.ceil(from_date.timestamp())) & (self.timestamp <= math.floor(to_date.timestamp()))
+        return np.char.decode(self.phones[np.unique(self.origin[in_range])]).tolist()
+
+    def to_calls(self, first: int, last: int) -> List[CallRecord]:
+        """
+        Decodes a range of rows into CallRecord objects.
+        """
+        return list(map(
+            CallRecord,
+            np.char.decode(self.phones[self.origin[first:last]]).tolist(),
+            np.char.decode(self.phones[self.destination[first:last]]).tolist(),
+            self.duration[first:last].tolist(),
+            [datetime.fromtimestamp(timestamp, tz=timezone.utc) for timestamp in self.timestamp[first:last].tolist()],
+        ))
+
+    def iter_calls(self, first: int, last: int, chunk_size: int = 1000) -> Iterator[CallRecord]:
+        """
+        Lazily decodes a range of rows into CallRecord objects, `chunk_size` rows at a time.
+        """
+        for position in range(first, last, chunk_size):
+            yield from self.to_calls(position, min(position + chunk_size, last))
+
+    def to_frame(self, first: int, last: int) -> pd.DataFrame:
+        """
+        Decodes a range of rows into a DataFrame with the CallRecord columns.
+        """
+        return pd.DataFrame({
+            "numero_origen": np.char.decode(self.phones[self.origin[first:last]]),
+            "numero_destino": np.char.decode(self.phones[self.destination[first:last]]),
+            "duracion": self.duration[first:last],
+            "fecha": pd.to_datetime(self.timestamp[first:last], unit="s", utc=True),
+        })
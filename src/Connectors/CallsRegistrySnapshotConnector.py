@@ -0,0 +1,54 @@
+from .CallsRegistryBaseConnector import CallsRegistryBaseConnector
+from .CallsRegistrySnapshot import CallsRegistrySnapshot
+from datetime import datetime
+from fastapi import HTTPException
+from typing import Iterator, List
+import os
+import pandas as pd
+
+from src.Dto.Records import CallRecord
+
+class CallsRegistrySnapshotConnector(CallsRegistryBaseConnector):
+    """
+    Call registry backed by a snapshot compiled from the CDR CSV file
+    (`python -m Commands.compile_snapshot <csv> <snapshot>`).
+
+    The snapshot columns are memory-mapped, so starting a worker does not parse anything and all the
+    workers of a host share the same pages through the OS page cache.
+
+    Attributes:
+        client (CallsRegistrySnapshot): The memory-mapped snapshot.
+    """
+    client: CallsRegistrySnapshot = None
+
+    def __init__(self, snapshot_path: str = None):
+        snapshot_path = snapshot_path or os.environ.get("SNAPSHOT_PATH")
+        try:
+            self.client = CallsRegistrySnapshot.load(f"./{snapshot_path}")
+        except FileNotFoundError:
+            raise HTTPException(status_code=500, detail="Snapshot not found")
+
+    @property
+    def row_count(self) -> int:
+        return len(self.client)
+
+    def get_list_calls(self, phone_number: int, from_date: datetime, to_date: datetime) -> List[CallRecord]:
+        first, last = self.client.find(phone_number, from_date, to_date)
+        if first < last:
+            return self.client.to_calls(first, last)
+        raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+
+    def get_calls_frame(self, phone_number: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        first, last = self.client.find(phone_number, from_date, to_date)
+        if first < last:
+            return self.client.to_frame(first, last)
+        raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+
+    def iter_calls(self, phone_number: str, from_date: datetime, to_date: datetime) -> Iterator[CallRecord]:
+        first, last = self.client.find(phone_number, from_date, to_date)
+        if first < last:
+            return self.client.iter_calls(first, last)
+        raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+
+    def get_origin_numbers(self, from_date: datetime, to_date: datetime) -> List[str]:
+        return self.client.origin_numbers(from_date, to_date)
@@ -0,0 +1,100 @@
+import glob
+import io
+import os
+import zlib
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+
+class CallsSegmentLog:
+    """
+    Durable append-only log of ingested calls, split in segment files of at most `segment_bytes` bytes.
+
+    Every batch is one record: a `#<rows> <bytes> <crc32>` header line followed by its calls as CSV lines
+    (numero_origen, numero_destino, duracion and fecha as epoch seconds). A record is written and fsynced
+    before the batch is acknowledged, so replaying the segments on startup restores every acknowledged
+    call. A record cut by a crash (missing rows or a wrong checksum) is dropped and truncated on replay.
+    """
+    SEGMENT_PATTERN = "segment-*.log"
+    COLUMNS = ["numero_origen", "numero_destino", "duracion", "fecha"]
+
+    def __init__(self, path: str, segment_bytes: int = 64 << 20):
+        """
+        Args:
+            path (str): Directory of the segment files, created if needed.
+            segment_bytes (int): Size after which a new segment file is started.
+        """
+        self._path = path
+        self._segment_bytes = segment_bytes
+        os.makedirs(path, exist_ok=True)
+        segments = self.segments()
+        self._segment = len(segments) and int(os.path.basename(segments[-1])[8:-4])
+
+    @classmethod
+    def from_env(cls) -> "CallsSegmentLog | None":
+        """
+        Opens the log at the INGEST_LOG_PATH environment variable (segments of INGEST_SEGMENT_MB MB).
+        Returns None when INGEST_LOG_PATH is not set: ingestion is disabled.
+        """
+        path = os.environ.get("INGEST_LOG_PATH")
+        if not path:
+            return None
+        return cls(f"./{path}", int(os.environ.get("INGEST_SEGMENT_MB", 64)) << 20)
+
+    def segments(self) -> list:
+        return sorted(glob.glob(os.path.join(self._path, self.SEGMENT_PATTERN)))
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self._path, f"segment-{segment:06d}.log")
+
+    def append(self, calls: pd.DataFrame):
+        """
+        Appends a batch of validated calls (UTC fecha) as one record and fsyncs it.
+        """
+        payload = calls.assign(fecha=calls["fecha"].dt.tz_convert(None).to_numpy(dtype="datetime64[s]").astype(np.int64))[self.COLUMNS] \
+            .to_csv(header=False, index=False).encode()
+        record = f"#{len(calls)} {len(payload)} {zlib.crc32(payload):08x}\n".encode() + payload
+
+        path = self._segment_path(self._segment)
+        if not self._segment or os.path.getsize(path) >= self._segment_bytes:
+            self._segment += 1
+            path = self._segment_path(self._segment)
+        with open(path, "ab") as segment:
+            segment.write(record)
+            segment.flush()
+            os.fsync(segment.fileno())
+
+    def replay(self) -> Iterator[pd.DataFrame]:
+        """
+        Yields the batches of every segment in the order they were appended.
+        """
+        for path in self.segments():
+            with open(path, "rb") as segment:
+                data = segment.read()
+            position = 0
+            while position < len(data):
+                header_end = data.find(b"\n", position)
+                if header_end < 0:
+                    break
+                try:
+                    _, size, checksum = data[position + 1:header_end].split()
+                    size, checksum = int(size), int(checksum, 16)
+                except ValueError:
+                    break
+                payload_end = header_end + 1 + size
+                payload = data[header_end + 1:payload_end]
+                if len(payload) != size or zlib.crc32(payload) != checksum:
+                    break
+                yield self._decode(payload)
+                position = payload_end
+            if position < len(data):
+                # Torn record from a crash, it was never acknowledged
+                with open(path, "r+b") as segment:
+                    segment.truncate(position)
+
+    def _decode(self, payload: bytes) -> pd.DataFrame:
+        calls = pd.read_csv(io.BytesIO(payload), names=self.COLUMNS, dtype={"numero_origen": str, "numero_destino": str, "duracion": int, "fecha": np.int64})
+        calls["fecha"] = pd.to_datetime(calls["fecha"], unit="s", utc=True)
+        return calls
@@ -1,2 +1,10 @@
 from .CallsRegistryBaseConnector import CallsRegistryBaseConnector
-from .CallsRegistryCSVConnector import CallsRegistryCSVConnector
\ No newline at end of file
+from .CallsSegmentLog import CallsSegmentLog
+from .CallsRegistryCSVConnector import CallsRegistryCSVConnector
+from .CallsRegistrySnapshot import CallsRegistrySnapshot
+from .CallsRegistrySnapshotConnector import CallsRegistrySnapshotConnector
+from .CallsRegistryPartitionedConnector import CallsRegistryPartitionedConnector
+from .CallsRegistryHashPartitionedConnector import CallsRegistryHashPartitionedConnector
+from .CallsRegistrySQLiteConnector import CallsRegistrySQLiteConnector
+from .CallsRegistrySharedConnector import CallsRegistrySharedConnector
+from .AsyncCallsRegistryBaseConnector import AsyncCallsRegistryBaseConnector, AsyncCallsRegistryAdapter
@@ -28,6 +28,15 @@ class PhoneInvoiceResponse(BaseModel):
     friends_discount: float  # Friends call discount
     total: float  # Total to pay
 
+class PhoneInvoiceSummaryResponse(BaseModel):
+    user: UserDetail  # User details
+    total_international_seconds: int  # Total international seconds
+    total_national_seconds: int  # Total national seconds
+    total_friends_seconds: int  # Total friends seconds
+    gross_total: float  # Invoice total
+    friends_discount: float  # Friends call discount
+    total: float  # Total to pay
+
 class UserResponse(BaseModel):
     address: str  # User's address
     friends: List[str]  # List of friends' phone numbers
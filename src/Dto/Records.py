@@ -0,0 +1,202 @@
+from datetime import datetime
+from typing import Callable, List
+import json
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from .Models import CallDetail, PhoneInvoiceResponse, PhoneInvoiceSummaryResponse, UserDetail, UserResponse
+
+
+def format_timestamp(timestamp: datetime) -> str:
+    """
+    Formats a date like the API models serialize it (ISO 8601, "Z" for UTC).
+    """
+    value = timestamp.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def format_timestamps(timestamps: List[datetime]) -> List[str]:
+    """
+    Formats many dates like format_timestamp does one, at once when they are all UTC.
+    """
+    try:
+        index = pd.DatetimeIndex(timestamps)
+    except (TypeError, ValueError):
+        index = None
+    if index is None or str(index.tz) != "UTC" or index.nanosecond.any():
+        return [format_timestamp(timestamp) for timestamp in timestamps]
+    values = index.tz_convert(None).to_numpy()
+    formatted = np.datetime_as_string(values, unit="s")
+    fractional = index.microsecond.to_numpy() != 0
+    if fractional.any():
+        formatted = np.where(fractional, np.datetime_as_string(values, unit="us"), formatted)
+    return np.char.add(formatted, "Z").tolist()
+
+
+def orjson_compatible(values: List[float]) -> bool:
+    """
+    Tells whether orjson writes the floats exactly like json.dumps: finite and in the range json.dumps writes
+    without an exponent (orjson writes 1e-05 as 0.00001 and 1e+16 as 1e16).
+    """
+    values = np.abs(np.asarray(values, dtype=np.float64))
+    return bool(np.isfinite(values).all() and ((values == 0) | ((values >= 1e-4) & (values < 1e16))).all())
+
+
+class SlotsRecord:
+    """
+    Base class of the internal records: plain `__slots__` objects, typed by whoever builds them and never validated.
+    Pydantic models are only built from them at the API boundary.
+    """
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+class CallRecord(SlotsRecord):
+    """
+    A call read from the registry, with the same attributes as CallResponse.
+    """
+    __slots__ = ("numero_origen", "numero_destino", "duracion", "fecha")
+    numero_origen: str  # Origin phone number
+    numero_destino: str  # Destination phone number
+    duracion: int  # Call duration in seconds
+    fecha: datetime  # Call date and time
+
+
+class RangeRollups(SlotsRecord):
+    """
+    The calls of a date range as returned by CallsRegistryBaseConnector.get_range_rollups: the whole months
+    as monthly rollups and the partial months at the edges as calls.
+    """
+    __slots__ = ("head", "rollups", "tail", "load_month")
+    head: pd.DataFrame  # Calls before the first whole month, sorted by date
+    rollups: pd.DataFrame  # Rollups of the whole months per destination, sorted by month
+    tail: pd.DataFrame  # Calls after the last whole month, sorted by date
+    load_month: Callable[[pd.Period], pd.DataFrame]  # Returns the calls of one of the whole months, sorted by date
+
+
+class CallLine(SlotsRecord):
+    """
+    A priced call of an invoice, with the same attributes as CallDetail.
+    """
+    __slots__ = ("phone_number", "duration", "timestamp", "amount")
+    phone_number: str  # Destination number
+    duration: int  # Call duration in seconds
+    timestamp: datetime  # Call date and time
+    amount: float  # Call cost
+
+    def to_json_dict(self) -> dict:
+        """
+        Returns the line as CallDetail serializes it to JSON.
+        """
+        return {"phone_number": self.phone_number, "duration": self.duration, "timestamp": format_timestamp(self.timestamp), "amount": self.amount}
+
+
+class InvoiceRecord(SlotsRecord):
+    """
+    An invoice as computed by PhoneInvoiceService, with the same attributes as PhoneInvoiceResponse
+    (the user is the UserResponse of the Users API). Summaries (totals only) have no calls (None).
+    """
+    __slots__ = (
+        "user", "calls", "total_international_seconds", "total_national_seconds", "total_friends_seconds",
+        "gross_total", "friends_discount", "total",
+    )
+    user: UserResponse  # User details
+    calls: List[CallLine] | None  # List of call details
+    total_international_seconds: float  # Total international seconds
+    total_national_seconds: float  # Total national seconds
+    total_friends_seconds: float  # Total friends seconds
+    gross_total: float  # Invoice total
+    friends_discount: float  # Friends call discount
+    total: float  # Total to pay
+
+    def to_response(self) -> PhoneInvoiceResponse:
+        """
+        Builds the API model of the invoice. The values are already typed, so the models are constructed
+        without validating them again.
+        """
+        return PhoneInvoiceResponse.model_construct(
+            user = UserDetail.model_construct(
+                address = self.user.address,
+                name = self.user.name,
+                phone_number = self.user.phone_number,
+            ),
+            calls = [CallDetail.model_construct(**line.as_dict()) for line in self.calls],
+            total_international_seconds = self.total_international_seconds,
+            total_national_seconds = self.total_national_seconds,
+            total_friends_seconds = self.total_friends_seconds,
+            gross_total = self.gross_total,
+            friends_discount = self.friends_discount,
+            total = self.total
+        )
+
+    def to_json(self) -> bytes:
+        """
+        Serializes the invoice (or the summary, without calls) straight from the record with orjson, byte for byte
+        like FastAPI's JSONResponse of to_response (or to_summary_response): same field order, compact separators,
+        UTF-8, floats like 462.0 and ISO 8601 dates with "Z". Invoices with floats orjson writes differently
+        (exponents, non-finite) fall back to the standard encoder.
+        """
+        totals = {name: getattr(self, name) for name in self.__slots__[2:]}
+        user = {"address": self.user.address, "name": self.user.name, "phone_number": self.user.phone_number}
+        if self.calls is None:
+            if orjson_compatible(list(totals.values())):
+                try:
+                    return orjson.dumps({"user": user, **totals})
+                except TypeError:
+                    pass  # Values orjson does not know (numpy scalars)
+            return self._standard_json(self.to_summary_response())
+
+        amounts = [line.amount for line in self.calls]
+        if orjson_compatible(amounts + list(totals.values())):
+            timestamps = format_timestamps([line.timestamp for line in self.calls])
+            calls = [
+                {"phone_number": line.phone_number, "duration": line.duration, "timestamp": timestamp, "amount": amount}
+                for line, timestamp, amount in zip(self.calls, timestamps, amounts)
+            ]
+            try:
+                return orjson.dumps({"user": user, "calls": calls, **totals})
+            except TypeError:
+                pass  # Values orjson does not know (numpy scalars)
+        return self._standard_json(self.to_response())
+
+    @staticmethod
+    def _standard_json(response) -> bytes:
+        """
+        Serializes an API model like FastAPI's JSONResponse.
+        """
+        return json.dumps(jsonable_encoder(response), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    def to_summary_response(self) -> PhoneInvoiceSummaryResponse:
+        """
+        Builds the API model of the invoice totals, without validating them again.
+        """
+        return PhoneInvoiceSummaryResponse.model_construct(
+            user = UserDetail.model_construct(
+                address = self.user.address,
+                name = self.user.name,
+                phone_number = self.user.phone_number,
+            ),
+            total_international_seconds = self.total_international_seconds,
+            total_national_seconds = self.total_national_seconds,
+            total_friends_seconds = self.total_friends_seconds,
+            gross_total = self.gross_total,
+            friends_discount = self.friends_discount,
+            total = self.total
+        )
@@ -0,0 +1,135 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Iterable, Iterator, TypeVar
+
+import numpy as np
+import pandas as pd
+from prometheus_client import Counter, Gauge, Histogram
+
+from Dto.Enums import CallType
+from Dto.Models import UserResponse
+
+T = TypeVar("T")
+
+INVOICE_STAGE_SECONDS = Histogram(
+    "invoice_stage_seconds", "Time spent in each stage of an invoice", ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PRICED_CALLS = Counter("invoice_priced_calls_total", "Calls priced, by the strategy that prices them", ["call_type"])
+CALL_REGISTRY_ROWS = Gauge("call_registry_rows", "Calls held by the call registry")
+CALL_REGISTRY_LOAD_SECONDS = Gauge("call_registry_load_seconds", "Time the call registry took to load")
+USERS_API_RESPONSES = Counter("users_api_responses_total", "Users API responses by status code (error when no response)", ["status"])
+COALESCED_REQUESTS = Counter("coalesced_requests_total", "Calls answered by an identical call already in flight", ["operation"])
+
+# Stage durations of the current request, for the Server-Timing header (None outside a request)
+_server_timings: ContextVar[Dict[str, float] | None] = ContextVar("server_timings", default=None)
+
+
+def start_server_timing() -> Dict[str, float]:
+    """
+    Starts collecting the stage durations of the current request. Tasks and threads started from the request
+    (asyncio.gather, asyncio.to_thread) copy the context, so they report to the same dict.
+    """
+    timings = {}
+    _server_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """
+    Formats stage durations as a Server-Timing header value (durations in milliseconds).
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Records the duration of a stage in the stage histogram and in the Server-Timing of the current request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def observe_stage(stage: str, seconds: float):
+    """
+    Records a stage duration measured by the caller, like time_stage.
+    """
+    INVOICE_STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _server_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+async def timed(stage: str, awaitable: Awaitable[T]) -> T:
+    """
+    Awaits an awaitable recording its duration as a stage, see time_stage.
+    """
+    with time_stage(stage):
+        return await awaitable
+
+
+def timed_iterator(stage: str, items: Iterable[T]) -> Iterator[T]:
+    """
+    Yields the items of an iterable recording the time spent producing them (not the time the consumer spends
+    between items) as one duration of the stage, observed when the iterable is exhausted or closed.
+    """
+    items = iter(items)
+    elapsed = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        observe_stage(stage, elapsed)
+
+
+def count_priced_calls(destinations: Iterable[str] | pd.Series, user: UserResponse, calls: Iterable[int] | pd.Series = None):
+    """
+    Counts priced calls by the strategy that prices them: calls to friends first, then national or international.
+
+    Args:
+        destinations (Iterable[str] | pd.Series): The destination number of every call, or of every group of calls.
+        user (UserResponse): The user the calls belong to.
+        calls (Iterable[int] | pd.Series): The number of calls of every destination (monthly rollups), one each by default.
+    """
+    if not isinstance(destinations, pd.Series):
+        destinations = pd.Series(list(destinations), dtype=object)
+    friends = destinations.isin(user.friends).to_numpy(dtype=bool)
+    national = (destinations.str[:3] == user.phone_number[:3]).to_numpy(dtype=bool) & ~friends
+    weights = np.ones(len(destinations), dtype=np.int64) if calls is None else np.asarray(calls, dtype=np.int64)
+    for call_type, count in (
+        (CallType.FRIENDS, weights[friends].sum()),
+        (CallType.NATIONAL, weights[national].sum()),
+        (CallType.INTERNATIONAL, weights[~(friends | national)].sum()),
+    ):
+        if count:
+            PRICED_CALLS.labels(call_type.value).inc(int(count))
+
+
+def counting_priced_calls(calls: Iterable[T], user: UserResponse, batch_size: int = 1000) -> Iterator[T]:
+    """
+    Yields the calls (records with a numero_destino) counting them as priced calls in batches of batch_size,
+    so a stream of calls is counted without keeping it in memory. Only the calls consumed are counted.
+    """
+    destinations = []
+    try:
+        for call in calls:
+            destinations.append(call.numero_destino)
+            if len(destinations) >= batch_size:
+                count_priced_calls(destinations, user)
+                destinations = []
+            yield call
+    finally:
+        if destinations:
+            count_priced_calls(destinations, user)
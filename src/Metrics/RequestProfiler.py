@@ -0,0 +1,86 @@
+import cProfile
+import hmac
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile hook for single requests, to find out why some invoices are slow in production.
+
+    A request is profiled when it carries the PROFILE_HEADER header with the configured token, or randomly
+    with the configured sample rate. The profile is written to `directory` as
+    `<date>-<phone number>-<call count>calls.prof`, readable with pstats or snakeviz.
+
+    The profiler is only built when profiling is enabled (see from_env), so disabled profiling costs nothing.
+    """
+    PROFILE_HEADER = "X-Profile"
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, token: str = None):
+        """
+        Args:
+            directory (str): Directory where the profiles are written, created if needed.
+            sample_rate (float): Share of the requests profiled at random (0 to 1).
+            token (str): Value of the PROFILE_HEADER header that forces a profile, None to ignore the header.
+        """
+        self._directory = directory
+        self._sample_rate = sample_rate
+        self._token = token
+        # cProfile can not run two profiles at the same time in a process
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler | None":
+        """
+        Builds the profiler from the PROFILING_DIR, PROFILING_SAMPLE_RATE and PROFILING_TOKEN environment variables.
+        Returns None (profiling disabled) unless a sample rate or a token is configured.
+        """
+        sample_rate = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+        token = os.environ.get("PROFILING_TOKEN") or None
+        if sample_rate <= 0 and token is None:
+            return None
+        return cls(f"./{os.environ.get('PROFILING_DIR', '/.data/profiles')}", sample_rate, token)
+
+    def should_profile(self, header: str | None) -> bool:
+        """
+        Decides whether a request is profiled, given the value of its PROFILE_HEADER header.
+        The token is compared as bytes: compare_digest rejects non-ASCII strings.
+        """
+        if header is not None and self._token is not None and hmac.compare_digest(header.encode(), self._token.encode()):
+            return True
+        return self._sample_rate > 0 and random.random() < self._sample_rate
+
+    def profile(self, phone_number: str, function: Callable[[], Tuple[T, int]]) -> T:
+        """
+        Runs a function under cProfile and writes its profile, tagged with the phone number and the call count.
+        Only the calling thread is profiled, so the function must do all its work in it.
+
+        Args:
+            phone_number (str): The phone number of the invoice.
+            function (Callable[[], Tuple[T, int]]): Returns the result and the number of calls of the invoice.
+
+        Returns:
+            T: The result of the function. Failed requests are written too, tagged "error", and the error is raised.
+        """
+        with self._lock:
+            profiler = cProfile.Profile()
+            calls = "error"
+            try:
+                result, count = profiler.runcall(function)
+                calls = f"{count}calls"
+                return result
+            finally:
+                profiler.dump_stats(os.path.join(self._directory, self._file_name(phone_number, calls)))
+
+    @staticmethod
+    def _file_name(phone_number: str, calls: str) -> str:
+        now = time.time()
+        date = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"{int(now * 1000) % 1000:03d}"
+        return f"{date}-{re.sub(r'[^0-9A-Za-z+]', '_', phone_number)}-{calls}.prof"
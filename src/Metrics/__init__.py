@@ -0,0 +1,5 @@
+from .InvoiceMetrics import (
+    CALL_REGISTRY_LOAD_SECONDS, CALL_REGISTRY_ROWS, COALESCED_REQUESTS, INVOICE_STAGE_SECONDS, PRICED_CALLS, USERS_API_RESPONSES,
+    count_priced_calls, counting_priced_calls, observe_stage, server_timing, start_server_timing, time_stage, timed, timed_iterator,
+)
+from .RequestProfiler import RequestProfiler
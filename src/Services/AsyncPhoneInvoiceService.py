@@ -0,0 +1,143 @@
+import asyncio
+from typing import Iterator
+from Connectors import AsyncCallsRegistryBaseConnector
+from Dto.Models import PhoneInvoiceRequest
+from Dto.Records import InvoiceRecord
+from Services.CallProcessor import CallProcessorContext, PricingEngine, VectorizedCallProcessor
+from Services.Cache import AsyncSingleFlight, InvoiceCache
+from Metrics import time_stage, timed, timed_iterator
+from .PhoneInvoiceService import PhoneInvoiceService
+from .AsyncUsersConnectorService import AsyncUsersConnectorService
+
+class AsyncPhoneInvoiceService(PhoneInvoiceService):
+    """
+    Async version of PhoneInvoiceService. The user lookup and the calls query are independent, so they run
+    concurrently and the Users API latency is no longer added to the registry query. Only when the invoice
+    cache holds an invoice for the request the query waits for the lookup, so cache hits skip it.
+    Pricing is the same as PhoneInvoiceService and runs in a worker thread to keep the event loop free.
+    """
+    _call_registry_service: AsyncCallsRegistryBaseConnector
+    _user_service: AsyncUsersConnectorService
+    _in_flight: AsyncSingleFlight
+
+    def __init__(self, call_registry_service: AsyncCallsRegistryBaseConnector, user_service: AsyncUsersConnectorService, call_processor: PricingEngine | CallProcessorContext, vectorized_call_processor: VectorizedCallProcessor = None, invoice_cache: InvoiceCache = None, in_flight: AsyncSingleFlight = None):
+        super().__init__(call_registry_service, user_service, call_processor, vectorized_call_processor, invoice_cache, in_flight)
+
+    async def get_phone_invoice(self, phone_invoice_request: PhoneInvoiceRequest) -> InvoiceRecord:
+        # Read before the registry is queried: calls appended meanwhile only make the invoice newer than its key
+        data_version = None
+        if self._invoice_cache is not None or self._in_flight is not None:
+            data_version = self._call_registry_service.data_version
+        if self._in_flight is None:
+            return await self.compute_phone_invoice(phone_invoice_request, data_version)
+        return await self._in_flight.do(
+            self.in_flight_key(phone_invoice_request, data_version),
+            lambda: self.compute_phone_invoice(phone_invoice_request, data_version)
+        )
+
+    async def compute_phone_invoice(self, phone_invoice_request: PhoneInvoiceRequest, data_version: str) -> InvoiceRecord:
+        query = self._call_registry_service.get_list_calls
+        process = self.process_calls
+        if self._vectorized_call_processor is not None:
+            query = self._call_registry_service.get_calls_frame
+            process = self.process_calls_frame
+
+        key = None
+        if self._invoice_cache is not None:
+            key = self._invoice_cache.key(phone_invoice_request, data_version)
+        if key is not None and key in self._invoice_cache:
+            # Probably cached: the query waits for the user, a hit must not pay for it (a query running
+            # in a worker thread can not be cancelled)
+            user = await timed("users_api", self._user_service.get_user(phone_invoice_request.phone_number))
+            invoice = self._invoice_cache.get(key, user)
+            if invoice is not None:
+                return invoice
+            calls = await self._query_calls(query, phone_invoice_request)
+        else:
+            # Not cached: the calls query starts right away and runs while the user is looked up; it is
+            # dropped when the user is unknown (same error precedence as the sync service)
+            calls = asyncio.ensure_future(self._query_calls(query, phone_invoice_request))
+            try:
+                user = await timed("users_api", self._user_service.get_user(phone_invoice_request.phone_number))
+            except BaseException:
+                self._discard(calls)
+                raise
+            invoice = self._invoice_cache.get(key, user) if key is not None else None
+            if invoice is not None:
+                # Cached by a concurrent request meanwhile
+                self._discard(calls)
+                return invoice
+            calls = await calls
+
+        with time_stage("pricing"):
+            invoice = await asyncio.to_thread(process, calls, user)
+        if key is not None:
+            self._invoice_cache.set(key, user, invoice)
+        return invoice
+
+    async def _query_calls(self, query, phone_invoice_request: PhoneInvoiceRequest):
+        """
+        Runs the calls query of an invoice. The query coroutine is only created once this one runs, so a task
+        cancelled before it starts does not leave it never awaited.
+        """
+        return await timed(
+            "registry_query",
+            query(phone_invoice_request.phone_number, phone_invoice_request.date_from, phone_invoice_request.date_to)
+        )
+
+    @staticmethod
+    def _discard(task: asyncio.Future):
+        """
+        Cancels a task whose result is not needed anymore, retrieving its error if it already failed.
+        """
+        if not task.cancel() and not task.cancelled():
+            task.exception()
+
+    async def get_phone_invoice_summary(self, phone_invoice_request: PhoneInvoiceRequest) -> InvoiceRecord:
+        """
+        Async version of PhoneInvoiceService.get_phone_invoice_summary.
+        """
+        user, calls = await asyncio.gather(
+            timed("users_api", self._user_service.get_user(phone_invoice_request.phone_number)),
+            timed("registry_query", self._query_summary_calls(phone_invoice_request)),
+            return_exceptions=True
+        )
+        for result in (user, calls):
+            if isinstance(result, BaseException):
+                raise result
+
+        range_rollups, calls = calls
+        with time_stage("pricing"):
+            if range_rollups is not None:
+                return await asyncio.to_thread(self.summarize_range_rollups, range_rollups, user)
+            return await asyncio.to_thread(self.summarize_calls, calls, user)
+
+    async def _query_summary_calls(self, phone_invoice_request: PhoneInvoiceRequest) -> tuple:
+        """
+        Reads what get_phone_invoice_summary needs from the registry: (monthly rollups, None) when the registry
+        has rollups for the range, otherwise (None, calls).
+        """
+        arguments = (phone_invoice_request.phone_number, phone_invoice_request.date_from, phone_invoice_request.date_to)
+        if self._vectorized_call_processor is None:
+            return None, await self._call_registry_service.iter_calls(*arguments)
+
+        range_rollups = await self._call_registry_service.get_range_rollups(*arguments)
+        if range_rollups is not None:
+            return range_rollups, None
+        return None, await self._call_registry_service.get_calls_frame(*arguments)
+
+    async def stream_phone_invoice(self, phone_invoice_request: PhoneInvoiceRequest) -> Iterator[dict]:
+        """
+        Async version of PhoneInvoiceService.stream_phone_invoice. The returned iterator is sync: pricing and
+        reading the registry happen while it is consumed.
+        """
+        user, calls = await asyncio.gather(
+            timed("users_api", self._user_service.get_user(phone_invoice_request.phone_number)),
+            timed("registry_query", self._call_registry_service.iter_calls(phone_invoice_request.phone_number, phone_invoice_request.date_from, phone_invoice_request.date_to)),
+            return_exceptions=True
+        )
+        for result in (user, calls):
+            if isinstance(result, BaseException):
+                raise result
+
+        return timed_iterator("pricing", self.stream_calls(calls, user))
@@ -0,0 +1,130 @@
+from fastapi import HTTPException
+from typing import AsyncIterator
+import asyncio
+import httpx
+import os
+
+from src.Dto.Models import UserResponse
+from Services.Cache import AsyncSingleFlight, TTLCache
+from Metrics import USERS_API_RESPONSES
+
+class AsyncUsersConnectorService:
+    """
+    Async counterpart of UsersConnectorService, built on a pooled httpx.AsyncClient so waiting for the
+    Users API does not hold a threadpool worker. It reads the same configuration and caches users the same way
+    (TTL/LRU cache, cached 404s and stale-while-revalidate), and concurrent lookups of the same uncached user
+    share one request (AsyncSingleFlight). Transient failures are retried like in UsersConnectorService.get_user, a few
+    times right away as a request is waiting for the user: connection errors by the transport, 429 and 5xx answers here.
+
+    Attributes:
+        _url (str): The base URL for the Users API, fetched from the environment variable `USERS_API_URL`.
+        _client (httpx.AsyncClient): Pooled client, bound to the event loop it was created in and closed with it.
+        _cache (TTLCache): Users by phone number, None for unknown users.
+        _in_flight (AsyncSingleFlight): Users API requests in flight by phone number.
+        _retries (int): Retries of a failed request (`USERS_API_INTERACTIVE_RETRIES`).
+    """
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    _url = None
+    _client: httpx.AsyncClient = None
+
+    def __init__(self):
+        self._url = os.environ.get("USERS_API_URL")
+        self._timeout = float(os.environ.get("USERS_API_TIMEOUT", 5))
+        pool_size = int(os.environ.get("USERS_API_POOL_SIZE", 10))
+        self._limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._retries = int(os.environ.get("USERS_API_INTERACTIVE_RETRIES", 1))
+        self._cache = TTLCache(
+            maxsize=int(os.environ.get("USERS_CACHE_SIZE", 1024)),
+            ttl=float(os.environ.get("USERS_CACHE_TTL", 0)),
+            stale_ttl=float(os.environ.get("USERS_CACHE_STALE_TTL", 0)),
+        )
+        self._not_found_ttl = float(os.environ.get("USERS_CACHE_NOT_FOUND_TTL", 0))
+        self._client_loop = None
+        self._client_lifetime = None
+        self._in_flight = AsyncSingleFlight("users_api")
+        self._refreshing = set()
+        self._refresh_tasks = set()  # The event loop only keeps weak references to the tasks
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """
+        Returns the pooled client of the running event loop, creating it on first use
+        (connections can not be shared between event loops).
+
+        A client can only be closed by its own event loop, so it is held by an async generator started in that loop:
+        the loop closes its pending async generators before it is closed itself (asyncio.run, the uvicorn and anyio runners),
+        which closes the client there even if the service has moved to another loop by then.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            transport = httpx.AsyncHTTPTransport(limits=self._limits, retries=self._retries)
+            self._client = httpx.AsyncClient(timeout=self._timeout, transport=transport)
+            self._client_loop = loop
+            self._client_lifetime = self._hold_client(self._client)
+            await anext(self._client_lifetime)
+        return self._client
+
+    @staticmethod
+    async def _hold_client(client: httpx.AsyncClient) -> AsyncIterator[None]:
+        try:
+            yield
+        finally:
+            await client.aclose()
+
+    async def get_user(self, phone: str) -> UserResponse:
+        """
+        Fetches user details from the Users API using the provided phone number, or from the cache.
+
+        Raises:
+            HTTPException: If the user is not found (HTTP 404).
+        """
+        found, user, stale = self._cache.get(phone)
+        if not found:
+            user = await self._in_flight.do(phone, lambda: self._fetch_user(phone))
+        elif stale and phone not in self._refreshing:
+            self._refreshing.add(phone)
+            task = asyncio.get_running_loop().create_task(self._refresh(phone))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    async def _fetch_user(self, phone: str) -> UserResponse | None:
+        """
+        Requests a user to the Users API and caches the answer. Returns None if the user does not exist.
+
+        Connection errors are retried by the transport; 429 and 5xx answers are requested again up to `_retries` times.
+        """
+        try:
+            client = await self._get_client()
+            url = self._url.replace(":phoneNumber", phone)
+            response = await client.get(url)
+            for _ in range(self._retries):
+                if response.status_code not in self.RETRY_STATUSES:
+                    break
+                response = await client.get(url)
+        except httpx.HTTPError:
+            USERS_API_RESPONSES.labels("error").inc()
+            raise
+        USERS_API_RESPONSES.labels(str(response.status_code)).inc()
+        if response.status_code == 404:
+            self._cache.set(phone, None, ttl=self._not_found_ttl)
+            return None
+        user = UserResponse(**response.json())
+        self._cache.set(phone, user)
+        return user
+
+    async def _refresh(self, phone: str):
+        try:
+            await self._fetch_user(phone)
+        except (httpx.HTTPError, ValueError):
+            pass  # Keep serving the stale user until it expires
+        finally:
+            self._refreshing.discard(phone)
+
+    async def close(self):
+        if self._client is not None:
+            # The client of another loop is closed by that loop
+            if self._client_loop is asyncio.get_running_loop():
+                await self._client_lifetime.aclose()
+            self._client = None
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from Metrics import COALESCED_REQUESTS
+
+T = TypeVar("T")
+
+
+class AsyncSingleFlight:
+    """
+    Async counterpart of SingleFlight: concurrent identical calls of the event loop share one task.
+
+    The shared work runs in its own task and every caller awaits it shielded, so a caller that is cancelled
+    (a client that disconnects) does not cancel the work the other callers are waiting for.
+
+    Attributes:
+        shared (int): Calls that got the result of an in-flight call instead of running their own.
+    """
+    shared = 0
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Name of the coalesced operation, the label of the coalesced_requests_total metric.
+        """
+        self._name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Awaits `function()`, unless a call with the same key is in flight, in which case awaits its result.
+        """
+        task = self._tasks.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.shared += 1
+            COALESCED_REQUESTS.labels(self._name).inc()
+        else:
+            task = self._tasks[key] = asyncio.ensure_future(function())
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, even if every caller was cancelled
@@ -0,0 +1,107 @@
+import copy
+import hashlib
+import os
+import threading
+from typing import Hashable
+
+from Dto.Models import PhoneInvoiceRequest, UserResponse
+from Dto.Records import InvoiceRecord
+from .TTLCache import TTLCache
+
+
+class InvoiceCache:
+    """
+    Bounded LRU cache of computed invoices, for the invoices of closed periods that are requested again and again.
+
+    An invoice depends on the phone number and date range, the tariffs (the fingerprint of the pricing engine
+    the invoices are priced with), the data version of the call registry and the user's friends. The key covers
+    all but the friends, so it is known before the user is looked up: a request whose key is not in the cache
+    is a certain miss and can query the registry right away. A hash of the friends is stored with the invoice
+    and `get` only returns the invoice when it matches. When the registry reports a new data version every entry
+    is dropped, the previous ones can not be hit anymore.
+
+    Cached invoices are shared between requests and must not be modified.
+
+    Attributes:
+        hits (int): Lookups that returned an invoice.
+        misses (int): Lookups without an invoice for the key and the user's friends.
+    """
+    hits = 0
+    misses = 0
+
+    def __init__(self, maxsize: int, ttl: float, tariffs: str = None):
+        """
+        Args:
+            maxsize (int): Maximum number of invoices, 0 disables the cache.
+            ttl (float): Seconds an invoice is kept, 0 disables the cache.
+            tariffs (str): Fingerprint of the tariffs of the cached invoices (PricingEngine.fingerprint).
+        """
+        self._cache = TTLCache(maxsize, ttl)
+        self._tariffs = tariffs
+        self._data_version = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, tariffs: str = None) -> "InvoiceCache":
+        """
+        Builds the cache from the INVOICE_CACHE_SIZE (default 1000) and INVOICE_CACHE_TTL (default 3600)
+        environment variables.
+        """
+        return cls(int(os.environ.get("INVOICE_CACHE_SIZE", 1000)), float(os.environ.get("INVOICE_CACHE_TTL", 3600)), tariffs)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Tells whether an invoice is cached for the key, for any friends. Does not count as a lookup.
+        """
+        return key in self._cache
+
+    def key(self, phone_invoice_request: PhoneInvoiceRequest, data_version: str) -> Hashable:
+        """
+        Returns the cache key of an invoice, and drops every entry when the registry data version changed.
+        """
+        with self._lock:
+            if data_version != self._data_version:
+                self._cache.clear()
+                self._data_version = data_version
+
+        return (
+            phone_invoice_request.phone_number,
+            phone_invoice_request.date_from.isoformat(),
+            phone_invoice_request.date_to.isoformat(),
+            self._tariffs,
+            data_version,
+        )
+
+    @staticmethod
+    def _friends_hash(user: UserResponse) -> str:
+        return hashlib.sha1("\n".join(sorted(user.friends)).encode()).hexdigest()
+
+    def get(self, key: Hashable, user: UserResponse) -> InvoiceRecord | None:
+        """
+        Returns the invoice cached for the key when it was computed with the same friends as the user's.
+        The totals only depend on the friends, so when other details of the user changed (name, address)
+        a copy of the invoice with the given user is returned.
+        """
+        found, entry, _ = self._cache.get(key)
+        hit = found and entry[0] == self._friends_hash(user)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            return None
+        invoice = entry[1]
+        if invoice.user != user:
+            invoice = copy.copy(invoice)
+            invoice.user = user
+        return invoice
+
+    def set(self, key: Hashable, user: UserResponse, invoice: InvoiceRecord):
+        self._cache.set(key, (self._friends_hash(user), invoice))
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,70 @@
+import threading
+from typing import Callable, Dict, Hashable, TypeVar
+
+from Metrics import COALESCED_REQUESTS
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls across threads: while a call with a key is in flight, the other
+    callers with the same key wait for it and get its result (or its exception) instead of repeating it.
+    Nothing is kept once the call finishes, later callers start a new one.
+
+    Results are shared between the callers and must not be modified.
+
+    Attributes:
+        shared (int): Calls that got the result of an in-flight call instead of running their own.
+    """
+    shared = 0
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Name of the coalesced operation, the label of the coalesced_requests_total metric.
+        """
+        self._name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        """
+        Runs `function`, unless a call with the same key is in flight, in which case waits for its result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            COALESCED_REQUESTS.labels(self._name).inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
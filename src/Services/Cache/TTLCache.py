@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a time to live.
+
+    Expired entries are kept `stale_ttl` more seconds, during which `get` still returns them flagged as
+    stale, so the caller can serve the old value while it refreshes it (stale-while-revalidate).
+
+    Attributes:
+        hits (int): Lookups that found an entry (fresh or stale).
+        misses (int): Lookups that found nothing.
+    """
+    hits = 0
+    misses = 0
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float = 0):
+        """
+        Args:
+            maxsize (int): Maximum number of entries, the least recently used one is evicted first.
+            ttl (float): Default time to live of the entries in seconds, 0 disables the cache.
+            stale_ttl (float): Seconds an expired entry can still be served as stale.
+        """
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Tells whether a key has a value that can still be served, without counting a lookup or refreshing its recency.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() < entry[1] + self._stale_ttl
+
+    def get(self, key: Hashable) -> Tuple[bool, Any, bool]:
+        """
+        Looks up a key.
+
+        Returns:
+            Tuple[bool, Any, bool]: Whether the key was found, its value and whether the value is stale.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at + self._stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, now >= expires_at
+                del self._entries[key]
+            self.misses += 1
+            return False, None, False
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        """
+        Stores a value for `ttl` seconds (the cache default when None). Values with a ttl of 0 are not stored.
+        """
+        ttl = self._ttl if ttl is None else ttl
+        with self._lock:
+            if ttl <= 0 or self._maxsize <= 0:
+                self._entries.pop(key, None)
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
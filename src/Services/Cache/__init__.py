@@ -0,0 +1,4 @@
+from .TTLCache import TTLCache
+from .InvoiceCache import InvoiceCache
+from .SingleFlight import SingleFlight
+from .AsyncSingleFlight import AsyncSingleFlight
@@ -44,6 +44,20 @@ class CallProcessorContext:
                 return price
         return None
     
+    def start(self, user:UserResponse) -> "CallProcessorContext":
+        """
+        PricingEngine interface over the strategies, so the services can price with either of them:
+        sets the user and returns the context itself as the accumulator (a context prices one invoice).
+        """
+        self.set_user(user)
+        return self
+
+    def price(self, accumulator:"CallProcessorContext", call) -> float | None:
+        return accumulator.process(call)
+
+    def totals(self, accumulator:"CallProcessorContext") -> dict:
+        return accumulator.get_results()
+
     def get_results(self):
         """
         Retrieves the accumulated results from all strategies, including a summary
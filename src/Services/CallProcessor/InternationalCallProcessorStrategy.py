@@ -2,14 +2,23 @@ import os
 from Dto.Enums import CallType
 from Dto.Models import CallResponse
 from Services.CallProcessor import CallProcessorStrategy
+from .RatePlan import RatePlan
 
 class InternationalCallProcessorStrategy(CallProcessorStrategy):
     _price_per_second = 0.0
-    def __init__(self):
+    _rate_plan: RatePlan = None
+    def __init__(self, rate_plan: RatePlan = None):
+        """
+        International calls cost INTERNATIONAL_PRICE_PER_SECOND per second, or the price of their destination
+        prefix when a rate_plan is given.
+        """
         self._price_per_second = float(os.environ.get("INTERNATIONAL_PRICE_PER_SECOND"))
+        self._rate_plan = rate_plan
         self._identifier = CallType.INTERNATIONAL.value
 
     def calculate(self, call: CallResponse):
+        if self._rate_plan is not None:
+            return call.duracion * self._rate_plan.price(call.numero_destino)
         return call.duracion * self._price_per_second
 
     def is_applicable(self, call: CallResponse) -> bool:
@@ -0,0 +1,25 @@
+from Dto.Models import UserResponse
+
+
+class PricingAccumulator:
+    """
+    Per-invoice state of the PricingEngine: the user, the friends calls discounted so far and the
+    accumulated seconds and amounts of every call type. Built by PricingEngine.start, one per invoice.
+    """
+    __slots__ = (
+        "user", "user_prefix", "friends", "friends_calls",
+        "friends_seconds", "friends_amount", "national_seconds", "national_amount",
+        "international_seconds", "international_amount",
+    )
+
+    def __init__(self, user: UserResponse):
+        self.user = user
+        self.user_prefix = user.phone_number[:3]
+        self.friends = frozenset(user.friends)
+        self.friends_calls = 0
+        self.friends_seconds = 0.0
+        self.friends_amount = 0.0
+        self.national_seconds = 0.0
+        self.national_amount = 0.0
+        self.international_seconds = 0.0
+        self.international_amount = 0.0
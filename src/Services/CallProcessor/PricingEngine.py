@@ -0,0 +1,103 @@
+import os
+from Dto.Enums import CallType
+from Dto.Models import CallResponse, UserResponse
+from .PricingAccumulator import PricingAccumulator
+from .RatePlan import RatePlan
+
+
+class PricingEngine:
+    """
+    Call by call pricing engine built once from the tariffs and shared by every request and batch worker.
+
+    It applies the rules of the strategies (FriendsCallProcessorStrategy, then NationalCallProcessorStrategy and
+    InternationalCallProcessorStrategy), which remain the reference implementation, with the same results and
+    the same order of the floating point additions. The engine is immutable: the state of an invoice lives
+    in the PricingAccumulator returned by `start`, so concurrent invoices never share mutable state.
+
+    Usage:
+        accumulator = engine.start(user)
+        amounts = [engine.price(accumulator, call) for call in calls]
+        totals = engine.totals(accumulator)
+    """
+    __slots__ = ("_national_price_per_call", "_international_price_per_second", "_friends_calls", "_rate_plan")
+
+    def __init__(self, national_price_per_call: float, international_price_per_second: float, friends_calls: int, rate_plan: RatePlan = None):
+        """
+        When a rate_plan is given international calls cost the price of their destination prefix,
+        otherwise international_price_per_second.
+        """
+        object.__setattr__(self, "_national_price_per_call", national_price_per_call)
+        object.__setattr__(self, "_international_price_per_second", international_price_per_second)
+        object.__setattr__(self, "_friends_calls", friends_calls)
+        object.__setattr__(self, "_rate_plan", rate_plan)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PricingEngine is immutable")
+
+    @classmethod
+    def from_env(cls, rate_plan: RatePlan = None) -> "PricingEngine":
+        """
+        Builds the engine from the NATIONAL_PRICE_PER_CALL, INTERNATIONAL_PRICE_PER_SECOND and FRIENDS_CALLS
+        environment variables, the same ones read by the strategies.
+        """
+        return cls(
+            float(os.environ.get("NATIONAL_PRICE_PER_CALL")),
+            float(os.environ.get("INTERNATIONAL_PRICE_PER_SECOND")),
+            int(os.environ.get("FRIENDS_CALLS")),
+            rate_plan,
+        )
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Identifies the tariffs the engine prices with (prices, friends calls and rate plan), for cache keys.
+        """
+        return "/".join(map(str, (
+            self._national_price_per_call, self._international_price_per_second, self._friends_calls,
+            self._rate_plan.fingerprint if self._rate_plan is not None else "-",
+        )))
+
+    def start(self, user: UserResponse) -> PricingAccumulator:
+        """
+        Returns the accumulator of a new invoice of the user.
+        """
+        return PricingAccumulator(user)
+
+    def price(self, accumulator: PricingAccumulator, call: CallResponse) -> float:
+        """
+        Prices a call of the invoice (calls must come in chronological order) and adds it to the accumulator.
+
+        Returns:
+            float: The price of the call, as a positive amount (discounted friends calls included).
+        """
+        national = call.numero_destino[:3] == accumulator.user_prefix
+        if national:
+            amount = self._national_price_per_call
+            accumulator.national_seconds += call.duracion
+            accumulator.national_amount += amount if amount > 0 else 0
+        else:
+            price_per_second = self._international_price_per_second if self._rate_plan is None else self._rate_plan.price(call.numero_destino)
+            amount = call.duracion * price_per_second
+            accumulator.international_seconds += call.duracion
+            accumulator.international_amount += amount if amount > 0 else 0
+
+        if call.numero_destino in accumulator.friends:
+            accumulator.friends_seconds += call.duracion
+            if accumulator.friends_calls < self._friends_calls:
+                accumulator.friends_calls += 1
+                accumulator.friends_amount += abs(amount) * -1
+        return abs(amount)
+
+    def totals(self, accumulator: PricingAccumulator) -> dict:
+        """
+        Returns the totals per call type plus the "summarize" totals, shaped like CallProcessorContext.get_results.
+        """
+        return {
+            CallType.FRIENDS.value: {"seconds": accumulator.friends_seconds, "amount": accumulator.friends_amount},
+            CallType.NATIONAL.value: {"seconds": accumulator.national_seconds, "amount": accumulator.national_amount},
+            CallType.INTERNATIONAL.value: {"seconds": accumulator.international_seconds, "amount": accumulator.international_amount},
+            "summarize": {
+                "seconds": 0 + accumulator.friends_seconds + accumulator.national_seconds + accumulator.international_seconds,
+                "amount": 0 + accumulator.friends_amount + accumulator.national_amount + accumulator.international_amount,
+            },
+        }
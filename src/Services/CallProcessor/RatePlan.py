@@ -0,0 +1,94 @@
+import bisect
+import hashlib
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class RatePlan:
+    """
+    Price per second of international calls by destination prefix, with longest-prefix matching
+    (for example "+1" for the whole zone and "+1809" for one of its countries).
+
+    The table is compiled into one sorted array of prefixes per prefix length. A destination is looked up
+    from the longest length to the shortest with a binary search per length, so a lookup costs
+    O(lengths * log(prefixes)) instead of a scan over the whole table. Destinations matching no prefix
+    cost the default price (INTERNATIONAL_PRICE_PER_SECOND).
+
+    Only the price changes: whether a call is national or international is still decided by the country code
+    (the first three characters), like the strategies do. The instance is immutable and can be shared.
+    """
+
+    def __init__(self, prices: Dict[str, float], default_price_per_second: float):
+        """
+        Args:
+            prices (Dict[str, float]): Price per second of every destination prefix.
+            default_price_per_second (float): Price per second of the destinations without a matching prefix.
+        """
+        self._default = default_price_per_second
+        self._fingerprint = hashlib.sha1(repr((default_price_per_second, sorted(prices.items()))).encode()).hexdigest()
+        # (length, sorted prefixes, prices in the same order), longest prefixes first
+        self._tables: List[Tuple[int, np.ndarray, np.ndarray]] = []
+        for length in sorted({len(prefix) for prefix in prices}, reverse=True):
+            prefixes = sorted(prefix for prefix in prices if len(prefix) == length)
+            self._tables.append((length, np.array(prefixes, dtype=str), np.array([prices[prefix] for prefix in prefixes], dtype=np.float64)))
+        self._lists = [(length, prefixes.tolist(), rates.tolist()) for length, prefixes, rates in self._tables]
+
+    def __len__(self) -> int:
+        return sum(len(prefixes) for _, prefixes, _ in self._tables)
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Hash of the prices and the default price: two rate plans with the same fingerprint price every call alike.
+        """
+        return self._fingerprint
+
+    @classmethod
+    def load(cls, path: str, default_price_per_second: float) -> "RatePlan":
+        """
+        Loads a CSV tariff table with the columns prefix and price_per_second.
+        """
+        table = pd.read_csv(path, dtype={"prefix": str, "price_per_second": float})
+        return cls(dict(zip(table["prefix"].str.strip(), table["price_per_second"])), default_price_per_second)
+
+    @classmethod
+    def from_env(cls) -> "RatePlan | None":
+        """
+        Loads the table at the RATE_PLAN_PATH environment variable, with INTERNATIONAL_PRICE_PER_SECOND as the
+        default price. Returns None when RATE_PLAN_PATH is not set (a flat international price).
+        """
+        path = os.environ.get("RATE_PLAN_PATH")
+        if not path:
+            return None
+        return cls.load(f"./{path}", float(os.environ.get("INTERNATIONAL_PRICE_PER_SECOND")))
+
+    def price(self, destination: str) -> float:
+        """
+        Returns the price per second of a destination number.
+        """
+        for length, prefixes, rates in self._lists:
+            prefix = destination[:length]
+            position = bisect.bisect_left(prefixes, prefix)
+            if position < len(prefixes) and prefixes[position] == prefix:
+                return rates[position]
+        return self._default
+
+    def prices(self, destinations: pd.Series) -> np.ndarray:
+        """
+        Returns the price per second of a column of destination numbers.
+        """
+        result = np.full(len(destinations), self._default, dtype=np.float64)
+        unmatched = np.arange(len(destinations))
+        values = destinations.to_numpy(dtype=str)
+        for length, prefixes, rates in self._tables:
+            if not len(unmatched):
+                break
+            candidates = values[unmatched].astype(f"<U{length}")
+            positions = np.searchsorted(prefixes, candidates).clip(max=len(prefixes) - 1)
+            matched = prefixes[positions] == candidates
+            result[unmatched[matched]] = rates[positions[matched]]
+            unmatched = unmatched[~matched]
+        return result
@@ -0,0 +1,254 @@
+import os
+from typing import Callable, List, Tuple
+import numpy as np
+import pandas as pd
+from Dto.Enums import CallType
+from Dto.Models import UserResponse
+from .RatePlan import RatePlan
+
+
+class VectorizedCallProcessor:
+    """
+    Batch alternative to CallProcessorContext that prices all the calls of an invoice at once,
+    working on the call columns instead of dispatching every call through the strategies.
+
+    It applies the same rules as the strategies, which remain the reference implementation:
+    - A call is national when the first three characters of the destination match the user's number,
+      otherwise it is international.
+    - National calls cost a fixed price per call, international calls a price per second.
+    - Calls to friends are charged like any other call, and the first `friends_calls` of them (in
+      chronological order) are discounted.
+
+    Totals are accumulated sequentially in call order (cumulative sums) so they are bit for bit equal to the
+    ones accumulated by the strategies, and are returned with the same shape as CallProcessorContext.get_results.
+
+    The instance holds no per-invoice state and can be shared between requests.
+    """
+
+    def __init__(self, national_price_per_call: float, international_price_per_second: float, friends_calls: int, rate_plan: RatePlan = None):
+        """
+        When a rate_plan is given international calls cost the price of their destination prefix,
+        otherwise international_price_per_second.
+        """
+        self._national_price_per_call = national_price_per_call
+        self._international_price_per_second = international_price_per_second
+        self._friends_calls = friends_calls
+        self._rate_plan = rate_plan
+
+    @classmethod
+    def from_env(cls, rate_plan: RatePlan = None) -> "VectorizedCallProcessor":
+        """
+        Builds the processor from the NATIONAL_PRICE_PER_CALL, INTERNATIONAL_PRICE_PER_SECOND and FRIENDS_CALLS
+        environment variables, the same ones read by the strategies.
+        """
+        return cls(
+            float(os.environ.get("NATIONAL_PRICE_PER_CALL")),
+            float(os.environ.get("INTERNATIONAL_PRICE_PER_SECOND")),
+            int(os.environ.get("FRIENDS_CALLS")),
+            rate_plan,
+        )
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Identifies the tariffs the processor prices with (prices, friends calls and rate plan), for cache keys.
+        """
+        return "/".join(map(str, (
+            self._national_price_per_call, self._international_price_per_second, self._friends_calls,
+            self._rate_plan.fingerprint if self._rate_plan is not None else "-",
+        )))
+
+    def process(self, calls: pd.DataFrame, user: UserResponse) -> Tuple[np.ndarray, dict]:
+        """
+        Prices a batch of calls.
+
+        Args:
+            calls (pd.DataFrame): The calls sorted by date, with the numero_destino and duracion columns.
+            user (UserResponse): The user the calls belong to.
+
+        Returns:
+            Tuple[np.ndarray, dict]: The amount of every call, and the totals per call type plus the
+                                     "summarize" entry, as returned by CallProcessorContext.get_results.
+        """
+        destinations = calls["numero_destino"]
+        durations = calls["duracion"].to_numpy(dtype=np.float64)
+
+        national = (destinations.str[:3] == user.phone_number[:3]).to_numpy(dtype=bool)
+        friends = destinations.isin(user.friends).to_numpy(dtype=bool)
+        prices = np.where(national, self._national_price_per_call, durations * self._international_prices(destinations))
+        amounts = np.abs(prices)
+        charged = np.where(prices > 0, prices, 0)
+
+        # Only the first N calls to friends are free
+        discounted = friends & (np.cumsum(friends) <= self._friends_calls)
+
+        totals = {
+            CallType.FRIENDS.value: {
+                "seconds": self._accumulate(durations[friends]),
+                "amount": self._accumulate(-amounts[discounted]),
+            },
+            CallType.NATIONAL.value: {
+                "seconds": self._accumulate(durations[national]),
+                "amount": self._accumulate(charged[national]),
+            },
+            CallType.INTERNATIONAL.value: {
+                "seconds": self._accumulate(durations[~national]),
+                "amount": self._accumulate(charged[~national]),
+            },
+        }
+        strategies = [CallType.FRIENDS.value, CallType.NATIONAL.value, CallType.INTERNATIONAL.value]
+        totals["summarize"] = {
+            "seconds": self._accumulate_totals([totals[strategy]["seconds"] for strategy in strategies]),
+            "amount": self._accumulate_totals([totals[strategy]["amount"] for strategy in strategies]),
+        }
+        return amounts, totals
+
+    def summarize(self, calls: pd.DataFrame, user: UserResponse) -> dict:
+        """
+        Computes only the invoice totals, from aggregates per destination number: every destination is classified
+        once and priced from its call count and total seconds. Only the calls to friends need their chronological
+        order, to find the first `friends_calls` ones.
+
+        Totals are summed in a different order than `process`, so they can differ from it in the last decimals.
+
+        Args:
+            calls (pd.DataFrame): The calls sorted by date, with the numero_destino and duracion columns.
+            user (UserResponse): The user the calls belong to.
+
+        Returns:
+            dict: The totals per call type plus the "summarize" entry, as returned by CallProcessorContext.get_results.
+        """
+        friends_calls = calls[calls["numero_destino"].isin(user.friends)].head(self._friends_calls)
+        return self._summarize_destinations(self._aggregate(calls), self._price_calls(friends_calls, user), user)
+
+    def summarize_rollups(self, head: pd.DataFrame, rollups: pd.DataFrame, tail: pd.DataFrame, user: UserResponse, load_month: Callable[[pd.Period], pd.DataFrame]) -> dict:
+        """
+        Computes the invoice totals of a date range split in whole months, taken from the monthly rollups of
+        the registry, and the calls of the partial months at its edges.
+
+        The first `friends_calls` calls to friends are found walking the range in chronological order: whole
+        months are discounted from their rollups while they fit, and only the month where the limit is reached
+        needs its calls, requested with load_month (unless every friend was called once that month, then the
+        first call dates of the rollups give the order, ties broken by destination number).
+
+        Args:
+            head (pd.DataFrame): The calls before the first whole month, sorted by date.
+            rollups (pd.DataFrame): The rollups of the whole months, sorted by month (see get_monthly_rollups).
+            tail (pd.DataFrame): The calls after the last whole month, sorted by date.
+            user (UserResponse): The user the calls belong to.
+            load_month (Callable[[pd.Period], pd.DataFrame]): Returns the calls of a month, sorted by date.
+
+        Returns:
+            dict: The totals per call type plus the "summarize" entry, as returned by CallProcessorContext.get_results.
+        """
+        destinations = pd.concat([
+            self._aggregate(head),
+            rollups.groupby("numero_destino", sort=False)[["calls", "seconds"]].sum(),
+            self._aggregate(tail),
+        ]).groupby(level=0, sort=False).sum()
+
+        remaining = self._friends_calls
+        head_friends = head[head["numero_destino"].isin(user.friends)].head(remaining)
+        discount = self._price_calls(head_friends, user)
+        remaining -= len(head_friends)
+
+        friends_rollups = rollups[rollups["numero_destino"].isin(user.friends)]
+        for month, month_rollups in friends_rollups.groupby("month", sort=True):
+            if remaining <= 0:
+                break
+            if month_rollups["calls"].sum() <= remaining:
+                discount += self._price_rollups(month_rollups, user)
+                remaining -= int(month_rollups["calls"].sum())
+            elif (month_rollups["calls"] == 1).all():
+                discount += self._price_rollups(month_rollups.sort_values(["first_call", "numero_destino"], kind="mergesort").head(remaining), user)
+                remaining = 0
+            else:
+                month_calls = load_month(month)
+                month_friends = month_calls[month_calls["numero_destino"].isin(user.friends)].head(remaining)
+                discount += self._price_calls(month_friends, user)
+                remaining = 0
+
+        if remaining > 0:
+            discount += self._price_calls(tail[tail["numero_destino"].isin(user.friends)].head(remaining), user)
+
+        return self._summarize_destinations(destinations, discount, user)
+
+    def _summarize_destinations(self, destinations: pd.DataFrame, discount: float, user: UserResponse) -> dict:
+        """
+        Builds the totals from the call count and seconds per destination number and the friends discount.
+        """
+        national = (destinations.index.str[:3] == user.phone_number[:3])
+        friends = destinations.index.isin(user.friends)
+        seconds = destinations["seconds"].to_numpy(dtype=np.float64)
+        charged = np.where(
+            national,
+            destinations["calls"].to_numpy() * max(self._national_price_per_call, 0),
+            np.maximum(seconds * self._international_prices(destinations.index), 0),
+        )
+
+        totals = {
+            CallType.FRIENDS.value: {"seconds": float(seconds[friends].sum()), "amount": -discount},
+            CallType.NATIONAL.value: {"seconds": float(seconds[national].sum()), "amount": float(charged[national].sum())},
+            CallType.INTERNATIONAL.value: {"seconds": float(seconds[~national].sum()), "amount": float(charged[~national].sum())},
+        }
+        strategies = [CallType.FRIENDS.value, CallType.NATIONAL.value, CallType.INTERNATIONAL.value]
+        totals["summarize"] = {
+            "seconds": self._accumulate_totals([totals[strategy]["seconds"] for strategy in strategies]),
+            "amount": self._accumulate_totals([totals[strategy]["amount"] for strategy in strategies]),
+        }
+        return totals
+
+    @staticmethod
+    def _aggregate(calls: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the call count and total seconds per destination number.
+        """
+        return calls.groupby("numero_destino", sort=False)["duracion"].agg(calls="size", seconds="sum")
+
+    def _price_calls(self, calls: pd.DataFrame, user: UserResponse) -> float:
+        """
+        Returns the full price of some calls, as a positive amount.
+        """
+        national = (calls["numero_destino"].str[:3] == user.phone_number[:3]).to_numpy(dtype=bool)
+        return float(np.abs(np.where(
+            national,
+            self._national_price_per_call,
+            calls["duracion"].to_numpy(dtype=np.float64) * self._international_prices(calls["numero_destino"]),
+        )).sum())
+
+    def _price_rollups(self, rollups: pd.DataFrame, user: UserResponse) -> float:
+        """
+        Returns the full price of the calls of some rollups, as a positive amount.
+        """
+        national = (rollups["numero_destino"].str[:3] == user.phone_number[:3]).to_numpy(dtype=bool)
+        return float(np.where(
+            national,
+            rollups["calls"].to_numpy() * abs(self._national_price_per_call),
+            np.abs(rollups["seconds"].to_numpy(dtype=np.float64) * self._international_prices(rollups["numero_destino"])),
+        ).sum())
+
+    def _international_prices(self, destinations: pd.Series | pd.Index) -> np.ndarray | float:
+        """
+        Returns the international price per second of every destination number (the flat price without a rate plan).
+        """
+        if self._rate_plan is None:
+            return self._international_price_per_second
+        return self._rate_plan.prices(destinations)
+
+    @staticmethod
+    def _accumulate(values: np.ndarray) -> float:
+        """
+        Sums the values one after the other, like the strategies accumulators do.
+        """
+        return float(np.cumsum(values)[-1]) if len(values) else 0.0
+
+    @staticmethod
+    def _accumulate_totals(values: List[float]) -> float:
+        """
+        Adds the strategies totals in order, like CallProcessorContext.get_results does
+        (the builtin sum uses compensated summation for floats since Python 3.12).
+        """
+        total = 0
+        for value in values:
+            total += value
+        return total
@@ -1,5 +1,9 @@
 from .CallProcessorStrategy import CallProcessorStrategy
+from .RatePlan import RatePlan
 from .CallProcessorContext import CallProcessorContext
 from .FriendsCallProcessorStrategy import FriendsCallProcessorStrategy
 from .InternationalCallProcessorStrategy import InternationalCallProcessorStrategy
-from .NationalCallProcessorStrategy import NationalCallProcessorStrategy
\ No newline at end of file
+from .NationalCallProcessorStrategy import NationalCallProcessorStrategy
+from .VectorizedCallProcessor import VectorizedCallProcessor
+from .PricingAccumulator import PricingAccumulator
+from .PricingEngine import PricingEngine
@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from Connectors import CallsRegistryBaseConnector
+
+class CallsIngestionService:
+    """
+    Validates batches of new calls (CSV or NDJSON) and appends them to the call registry.
+
+    A batch is validated column by column in one vectorized pass and is accepted or rejected as a whole:
+    an invalid batch is answered with a 422 error listing its first invalid rows and nothing is appended.
+    """
+    COLUMNS = ["numero_origen", "numero_destino", "duracion", "fecha"]
+    PHONE_PATTERN = r"\+\d{6,15}"
+    MAX_ERRORS = 20
+    MAX_DURATION = np.iinfo(np.int32).max  # Durations are stored as int32 by the registry
+
+    def __init__(self, call_registry_service: CallsRegistryBaseConnector):
+        self._call_registry_service = call_registry_service
+
+    def ingest(self, body: bytes, content_type: str) -> dict:
+        """
+        Parses, validates and appends a batch of calls.
+
+        Args:
+            body (bytes): The batch, a CSV file with a header line or one JSON object per line.
+            content_type (str): The content type of the body (text/csv or application/x-ndjson).
+
+        Returns:
+            dict: The number of ingested calls and the number of calls held by the registry.
+        """
+        calls = self.validate(self.parse(body, content_type))
+        row_count = self._call_registry_service.append_calls(calls)
+        return {"ingested": len(calls), "row_count": row_count}
+
+    def parse(self, body: bytes, content_type: str) -> pd.DataFrame:
+        """
+        Parses a batch into a DataFrame of raw values.
+        """
+        content_type = (content_type or "").split(";")[0].strip()
+        try:
+            if content_type == "text/csv":
+                return pd.read_csv(io.BytesIO(body), dtype=str, keep_default_na=False)
+            if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+                return pd.read_json(io.BytesIO(body), lines=True, dtype=False, convert_dates=False)
+        except ValueError as error:
+            raise HTTPException(status_code=422, detail=f"Malformed batch: {error}")
+        raise HTTPException(status_code=415, detail="Batches must be text/csv or application/x-ndjson")
+
+    def validate(self, calls: pd.DataFrame) -> pd.DataFrame:
+        """
+        Validates and normalizes a parsed batch: phone numbers in international format, durations as
+        integers between 0 and MAX_DURATION and ISO 8601 dates (converted to UTC).
+        """
+        missing = [column for column in self.COLUMNS if column not in calls.columns]
+        if missing:
+            raise HTTPException(status_code=422, detail=f"Missing columns: {', '.join(missing)}")
+        if calls.empty:
+            raise HTTPException(status_code=422, detail="Empty batch")
+
+        origin = calls["numero_origen"].astype(str).str.strip()
+        destination = calls["numero_destino"].astype(str).str.strip()
+        duration = pd.to_numeric(calls["duracion"], errors="coerce")
+        date = pd.to_datetime(calls["fecha"].astype(str), errors="coerce", utc=True, format="ISO8601")
+        invalid = pd.DataFrame({
+            "numero_origen": ~origin.str.fullmatch(self.PHONE_PATTERN),
+            "numero_destino": ~destination.str.fullmatch(self.PHONE_PATTERN),
+            "duracion": duration.isna() | (duration < 0) | (duration > self.MAX_DURATION) | (duration % 1 != 0),
+            "fecha": date.isna(),
+        })
+        if invalid.to_numpy().any():
+            rows, columns = invalid.to_numpy().nonzero()
+            errors = [
+                {"row": int(row), "column": self.COLUMNS[column], "value": str(calls.iloc[row][self.COLUMNS[column]])}
+                for row, column in zip(rows[:self.MAX_ERRORS], columns[:self.MAX_ERRORS])
+            ]
+            raise HTTPException(status_code=422, detail={"message": f"{len(set(rows))} invalid calls", "errors": errors})
+
+        return pd.DataFrame({"numero_origen": origin, "numero_destino": destination, "duracion": duration.astype(int), "fecha": date})
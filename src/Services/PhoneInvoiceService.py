@@ -1,43 +1,206 @@
-from typing import List
+from typing import Iterable, Iterator, List
+import pandas as pd
 from Connectors import CallsRegistryBaseConnector
 from Dto.Enums import CallType
-from Dto.Models import CallDetail, CallResponse, PhoneInvoiceRequest, PhoneInvoiceResponse, UserDetail, UserResponse
-from Services.CallProcessor import CallProcessorContext
+from Dto.Models import PhoneInvoiceRequest, UserDetail, UserResponse
+from Dto.Records import CallLine, CallRecord, InvoiceRecord, RangeRollups
+from Services.CallProcessor import CallProcessorContext, PricingEngine, VectorizedCallProcessor
+from Services.Cache import InvoiceCache, SingleFlight
+from Metrics import count_priced_calls, counting_priced_calls, time_stage, timed_iterator
 from . import UsersConnectorService
 
 class PhoneInvoiceService:
+    """
+    Computes phone invoices. Calls come from the registry as CallRecord objects and invoices are returned as
+    InvoiceRecord objects; the API models are only built from them at the API boundary (InvoiceRecord.to_response).
+    """
     _call_registry_service: CallsRegistryBaseConnector
     _user_service: UsersConnectorService
-    _call_processor: CallProcessorContext
+    _call_processor: PricingEngine | CallProcessorContext
+    _vectorized_call_processor: VectorizedCallProcessor
+    _invoice_cache: InvoiceCache
+    _in_flight: SingleFlight
 
-    def __init__(self, call_registry_service: CallsRegistryBaseConnector, user_service: UsersConnectorService, call_processor: CallProcessorContext):
+    def __init__(self, call_registry_service: CallsRegistryBaseConnector, user_service: UsersConnectorService, call_processor: PricingEngine | CallProcessorContext, vectorized_call_processor: VectorizedCallProcessor = None, invoice_cache: InvoiceCache = None, in_flight: SingleFlight = None):
+        """
+        When a vectorized_call_processor is given the invoices are priced in batch with it, otherwise every call
+        goes through the call_processor: the shared PricingEngine, or a CallProcessorContext of strategies
+        (the reference implementation, built for a single invoice).
+        When an invoice_cache is given, get_phone_invoice returns the cached invoice of repeated requests.
+        When an in_flight SingleFlight is given, concurrent identical get_phone_invoice requests share one computation.
+        """
         self._call_registry_service = call_registry_service
         self._user_service = user_service
         self._call_processor = call_processor
+        self._vectorized_call_processor = vectorized_call_processor
+        self._invoice_cache = invoice_cache
+        self._in_flight = in_flight
+
+    def in_flight_key(self, phone_invoice_request: PhoneInvoiceRequest, data_version: str) -> tuple:
+        """
+        Returns the key of identical invoice requests: same phone number, date range and registry data version.
+        """
+        return (phone_invoice_request.phone_number, phone_invoice_request.date_from, phone_invoice_request.date_to, data_version)
 
     def get_phone_invoice(self, phone_invoice_request: PhoneInvoiceRequest):
-        user = self._user_service.get_user(phone_invoice_request.phone_number)
-        calls = self._call_registry_service.get_list_calls(
-            phone_invoice_request.phone_number,
-            phone_invoice_request.date_from,
-            phone_invoice_request.date_to
+        # Read before the registry is queried: calls appended meanwhile only make the invoice newer than its key
+        data_version = None
+        if self._invoice_cache is not None or self._in_flight is not None:
+            data_version = self._call_registry_service.data_version
+        if self._in_flight is None:
+            return self.compute_phone_invoice(phone_invoice_request, data_version)
+        return self._in_flight.do(
+            self.in_flight_key(phone_invoice_request, data_version),
+            lambda: self.compute_phone_invoice(phone_invoice_request, data_version)
         )
-        
-        return self.process_calls(calls, user)
+
+    def compute_phone_invoice(self, phone_invoice_request: PhoneInvoiceRequest, data_version: str):
+        with time_stage("users_api"):
+            user = self._user_service.get_user(phone_invoice_request.phone_number)
+        if self._invoice_cache is None:
+            return self.get_user_phone_invoice(phone_invoice_request, user)
+
+        key = self._invoice_cache.key(phone_invoice_request, data_version)
+        invoice = self._invoice_cache.get(key, user)
+        if invoice is None:
+            invoice = self.get_user_phone_invoice(phone_invoice_request, user)
+            self._invoice_cache.set(key, user, invoice)
+        return invoice
+
+    def get_user_phone_invoice(self, phone_invoice_request: PhoneInvoiceRequest, user: UserResponse):
+        """
+        Returns the invoice of an already resolved user, for batch jobs that prefetch the users.
+        """
+        query = self._call_registry_service.get_list_calls
+        process = self.process_calls
+        if self._vectorized_call_processor is not None:
+            query = self._call_registry_service.get_calls_frame
+            process = self.process_calls_frame
+
+        with time_stage("registry_query"):
+            calls = query(
+                phone_invoice_request.phone_number,
+                phone_invoice_request.date_from,
+                phone_invoice_request.date_to
+            )
+        with time_stage("pricing"):
+            return process(calls, user)
     
-    def process_calls(self, calls:List[CallResponse], user:UserResponse):
-        self._call_processor.set_user(user)
+    def process_calls(self, calls:List[CallRecord], user:UserResponse):
+        accumulator = self._call_processor.start(user)
+        price = self._call_processor.price
         response = self.init_response(user)
         for call in calls:
-            amount = self._call_processor.process(call)
-            response.calls.append(CallDetail(
-                phone_number = call.numero_destino,
-                duration = call.duracion,
-                timestamp = call.fecha,
-                amount = amount
-            ))
+            amount = price(accumulator, call)
+            response.calls.append(CallLine(call.numero_destino, call.duracion, call.fecha, amount))
         
-        totals = self._call_processor.get_results()
+        count_priced_calls([line.phone_number for line in response.calls], user)
+        return self.set_totals(response, self._call_processor.totals(accumulator))
+
+    def get_phone_invoice_summary(self, phone_invoice_request: PhoneInvoiceRequest) -> InvoiceRecord:
+        """
+        Returns only the totals of the invoice (an InvoiceRecord without calls), without building the call lines.
+        """
+        with time_stage("users_api"):
+            user = self._user_service.get_user(phone_invoice_request.phone_number)
+        range_rollups = None
+        with time_stage("registry_query"):
+            if self._vectorized_call_processor is not None:
+                range_rollups = self._call_registry_service.get_range_rollups(
+                    phone_invoice_request.phone_number,
+                    phone_invoice_request.date_from,
+                    phone_invoice_request.date_to
+                )
+                if range_rollups is None:
+                    calls = self._call_registry_service.get_calls_frame(
+                        phone_invoice_request.phone_number,
+                        phone_invoice_request.date_from,
+                        phone_invoice_request.date_to
+                    )
+            else:
+                calls = self._call_registry_service.iter_calls(
+                    phone_invoice_request.phone_number,
+                    phone_invoice_request.date_from,
+                    phone_invoice_request.date_to
+                )
+        with time_stage("pricing"):
+            if range_rollups is not None:
+                return self.summarize_range_rollups(range_rollups, user)
+            return self.summarize_calls(calls, user)
+
+    def summarize_calls(self, calls:pd.DataFrame | Iterable[CallRecord], user:UserResponse) -> InvoiceRecord:
+        """
+        Computes the invoice totals: from aggregates with the vectorized processor (calls as a DataFrame),
+        or through the strategies without keeping the call lines (calls as an iterable of CallRecord).
+        """
+        response = self.init_response(user)
+        response.calls = None
+        if self._vectorized_call_processor is not None:
+            count_priced_calls(calls["numero_destino"], user)
+            return self.set_totals(response, self._vectorized_call_processor.summarize(calls, user))
+
+        accumulator = self._call_processor.start(user)
+        for call in counting_priced_calls(calls, user):
+            self._call_processor.price(accumulator, call)
+        return self.set_totals(response, self._call_processor.totals(accumulator))
+
+    def summarize_range_rollups(self, range_rollups:RangeRollups, user:UserResponse) -> InvoiceRecord:
+        """
+        Computes the invoice totals with the vectorized processor from the monthly rollups of the registry,
+        reading only the calls of the partial months.
+        """
+        response = self.init_response(user)
+        response.calls = None
+        totals = self._vectorized_call_processor.summarize_rollups(
+            range_rollups.head, range_rollups.rollups, range_rollups.tail, user, range_rollups.load_month
+        )
+        count_priced_calls(range_rollups.head["numero_destino"], user)
+        count_priced_calls(range_rollups.rollups["numero_destino"], user, range_rollups.rollups["calls"])
+        count_priced_calls(range_rollups.tail["numero_destino"], user)
+        return self.set_totals(response, totals)
+
+    def stream_phone_invoice(self, phone_invoice_request: PhoneInvoiceRequest) -> Iterator[dict]:
+        """
+        Streaming version of get_phone_invoice, see stream_calls. The user lookup and the "no calls" check
+        happen before the first item is produced. The time spent producing the items (reading the registry
+        and pricing) is recorded as the pricing stage once the stream ends.
+        """
+        with time_stage("users_api"):
+            user = self._user_service.get_user(phone_invoice_request.phone_number)
+        with time_stage("registry_query"):
+            calls = self._call_registry_service.iter_calls(
+                phone_invoice_request.phone_number,
+                phone_invoice_request.date_from,
+                phone_invoice_request.date_to
+            )
+        return timed_iterator("pricing", self.stream_calls(calls, user))
+
+    def stream_calls(self, calls:Iterable[CallRecord], user:UserResponse) -> Iterator[dict]:
+        """
+        Prices the calls one by one as they are read and yields the invoice in pieces, so the memory used does
+        not depend on the number of calls: first {"user": ...}, then one {"call": ...} per call and finally
+        {"totals": ...} with the totals of PhoneInvoiceResponse. Values are JSON compatible.
+        """
+        accumulator = self._call_processor.start(user)
+        response = self.init_response(user)
+        yield {"user": UserDetail(address = user.address, name = user.name, phone_number = user.phone_number).model_dump(mode="json")}
+        for call in counting_priced_calls(calls, user):
+            amount = self._call_processor.price(accumulator, call)
+            yield {"call": CallLine(call.numero_destino, call.duracion, call.fecha, amount).to_json_dict()}
+
+        self.set_totals(response, self._call_processor.totals(accumulator))
+        yield {"totals": {name: getattr(response, name) for name in InvoiceRecord.__slots__[2:]}}
+
+    def process_calls_frame(self, calls:pd.DataFrame, user:UserResponse):
+        amounts, totals = self._vectorized_call_processor.process(calls, user)
+        count_priced_calls(calls["numero_destino"], user)
+        response = self.init_response(user)
+        response.calls = list(map(
+            CallLine, calls["numero_destino"].tolist(), calls["duracion"].tolist(), calls["fecha"].tolist(), amounts.tolist()
+        ))
+        return self.set_totals(response, totals)
+
+    def set_totals(self, response:InvoiceRecord, totals:dict):
         response.total_international_seconds = totals[CallType.INTERNATIONAL.value]["seconds"]
         response.total_national_seconds = totals[CallType.NATIONAL.value]["seconds"]
         response.total_friends_seconds = totals[CallType.FRIENDS.value]["seconds"]
@@ -47,12 +210,8 @@ class PhoneInvoiceService:
         return response
     
     def init_response(self, user:UserResponse):
-        return PhoneInvoiceResponse(
-            user = UserDetail(
-                address = user.address,
-                name = user.name,
-                phone_number = user.phone_number,
-            ),
+        return InvoiceRecord(
+            user = user,
             calls = [],
             total_international_seconds = 0,
             total_national_seconds = 0,
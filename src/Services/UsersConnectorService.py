@@ -1,27 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterable
+from urllib3.util.retry import Retry
 import requests
 import os
+import threading
 
 from src.Dto.Models import UserResponse
+from Services.Cache import SingleFlight, TTLCache
+from Metrics import USERS_API_RESPONSES
 
 class UsersConnectorService:
     """
     A service class to interact with the Users API.
 
+    Requests go through pooled keep-alive sessions with a timeout, and the answers are kept in a bounded
+    TTL cache: user profiles and friend lists rarely change, so repeated invoices of the same user skip the
+    remote round trip. Unknown users (404) are cached too, for a shorter time. When USERS_CACHE_STALE_TTL is set,
+    expired users are still served for that long while they are refreshed in the background.
+    Concurrent lookups of the same uncached user share one request (SingleFlight).
+    Transient failures (connection errors, 429 and 5xx answers) are retried: get_user answers a request that is
+    waiting for it, so it retries a few times right away, while the batch lookups retry with exponential backoff.
+
     Attributes:
         _url (str): The base URL for the Users API, fetched from the environment variable `USERS_API_URL`.
+        _timeout (float): Timeout of the Users API requests in seconds (`USERS_API_TIMEOUT`).
+        _session (requests.Session): Pooled session of get_user (`USERS_API_POOL_SIZE` connections,
+                                     `USERS_API_INTERACTIVE_RETRIES` retries without backoff nor Retry-After waits).
+        _batch_session (requests.Session): Pooled session of the batch lookups and background refreshes
+                                           (`USERS_API_RETRIES` retries with `USERS_API_RETRY_BACKOFF` backoff factor).
+        _cache (TTLCache): Users by phone number, None for unknown users (`USERS_CACHE_SIZE`, `USERS_CACHE_TTL`,
+                           `USERS_CACHE_STALE_TTL`).
+        _not_found_ttl (float): Seconds unknown users are cached (`USERS_CACHE_NOT_FOUND_TTL`).
+        _concurrency (int): Maximum concurrent requests of the batch lookups (`USERS_API_CONCURRENCY`).
+        _in_flight (SingleFlight): Users API requests in flight by phone number.
     """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
     _url = None
 
     def __init__(self):
         """
-        Initializes the UsersConnectorService by setting the base URL for the Users API.
+        Initializes the UsersConnectorService by setting the base URL for the Users API,
+        the pooled sessions and the users cache.
         """
         self._url = os.environ.get("USERS_API_URL")
+        self._timeout = float(os.environ.get("USERS_API_TIMEOUT", 5))
+        pool_size = int(os.environ.get("USERS_API_POOL_SIZE", 10))
+        self._session = self._create_session(pool_size, Retry(
+            total=int(os.environ.get("USERS_API_INTERACTIVE_RETRIES", 1)),
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        ))
+        self._batch_session = self._create_session(pool_size, Retry(
+            total=int(os.environ.get("USERS_API_RETRIES", 3)),
+            backoff_factor=float(os.environ.get("USERS_API_RETRY_BACKOFF", 0.1)),
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        ))
+        self._concurrency = int(os.environ.get("USERS_API_CONCURRENCY", pool_size))
+        self._cache = TTLCache(
+            maxsize=int(os.environ.get("USERS_CACHE_SIZE", 1024)),
+            ttl=float(os.environ.get("USERS_CACHE_TTL", 0)),
+            stale_ttl=float(os.environ.get("USERS_CACHE_STALE_TTL", 0)),
+        )
+        self._not_found_ttl = float(os.environ.get("USERS_CACHE_NOT_FOUND_TTL", 0))
+        self._in_flight = SingleFlight("users_api")
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+    @staticmethod
+    def _create_session(pool_size: int, retry: Retry) -> requests.Session:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry))
+        session.mount("http://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry))
+        return session
 
     def get_user(self, phone: str) -> UserResponse:
         """
-        Fetches user details from the Users API using the provided phone number.
+        Fetches user details from the Users API using the provided phone number, or from the cache.
 
         Args:
             phone (str): The phone number of the user to fetch.
@@ -32,7 +92,83 @@ class UsersConnectorService:
         Raises:
             HTTPException: If the user is not found (HTTP 404).
         """
-        response = requests.get(self._url.replace(":phoneNumber", phone))
-        if response.status_code == 404:
+        found, user, stale = self._cache.get(phone)
+        if not found:
+            user = self._in_flight.do(phone, lambda: self._fetch_user(phone))
+        elif stale:
+            self._refresh_in_background(phone)
+        if user is None:
             raise HTTPException(status_code=404, detail="User not found")
-        return UserResponse(**response.json())
\ No newline at end of file
+        return user
+
+    def get_users(self, phones: Iterable[str]) -> Dict[str, UserResponse | None]:
+        """
+        Resolves many users at once, for batch jobs. Repeated numbers are requested once, cached users are
+        not requested, and the rest are fetched with at most `_concurrency` requests in flight over the shared pool.
+
+        Args:
+            phones (Iterable[str]): The phone numbers of the users to fetch.
+
+        Returns:
+            Dict[str, UserResponse | None]: The user of every resolved phone number, None for unknown users.
+                                            Numbers whose lookup still failed after the retries are left out.
+        """
+        users = {}
+        pending = []
+        for phone in dict.fromkeys(phones):
+            found, user, _ = self._cache.get(phone)
+            if found:
+                users[phone] = user
+            else:
+                pending.append(phone)
+
+        def fetch(phone):
+            try:
+                return phone, self._fetch_user(phone, self._batch_session), True
+            except (requests.RequestException, ValueError):
+                return phone, None, False
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self._concurrency, len(pending) or 1))) as executor:
+            for phone, user, resolved in executor.map(fetch, pending):
+                if resolved:
+                    users[phone] = user
+        return users
+
+    def _fetch_user(self, phone: str, session: requests.Session = None) -> UserResponse | None:
+        """
+        Requests a user to the Users API (through the get_user session by default) and caches the answer.
+        Returns None if the user does not exist.
+        """
+        session = session or self._session
+        try:
+            response = session.get(self._url.replace(":phoneNumber", phone), timeout=self._timeout)
+        except requests.RequestException:
+            USERS_API_RESPONSES.labels("error").inc()
+            raise
+        USERS_API_RESPONSES.labels(str(response.status_code)).inc()
+        if response.status_code == 404:
+            self._cache.set(phone, None, ttl=self._not_found_ttl)
+            return None
+        user = UserResponse(**response.json())
+        self._cache.set(phone, user)
+        return user
+
+    def _refresh_in_background(self, phone: str):
+        """
+        Refreshes a stale cached user in a background thread, at most one refresh per phone number at a time.
+        """
+        with self._refreshing_lock:
+            if phone in self._refreshing:
+                return
+            self._refreshing.add(phone)
+
+        def refresh():
+            try:
+                self._fetch_user(phone, self._batch_session)
+            except (requests.RequestException, ValueError):
+                pass  # Keep serving the stale user until it expires
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(phone)
+
+        threading.Thread(target=refresh, daemon=True).start()
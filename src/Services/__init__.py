@@ -1,2 +1,5 @@
 from .PhoneInvoiceService import PhoneInvoiceService
-from .UsersConnectorService import UsersConnectorService
\ No newline at end of file
+from .UsersConnectorService import UsersConnectorService
+from .AsyncUsersConnectorService import AsyncUsersConnectorService
+from .AsyncPhoneInvoiceService import AsyncPhoneInvoiceService
+from .CallsIngestionService import CallsIngestionService
@@ -1,4 +1,6 @@
+from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock
+import random
 import pytest
 from Dto.Models import CallResponse, UserResponse
 from Services.CallProcessor import CallProcessorStrategy
@@ -63,4 +65,20 @@ def mock_strategy():
                 "calculate": MagicMock(),
                 "is_applicable": MagicMock()
             }
-        )()
\ No newline at end of file
+        )()
+
+@pytest.fixture
+def many_calls(user):
+    """Fixture for a chronological mix of national, international and friends calls."""
+    generator = random.Random(42)
+    destinations = user.friends + ["+54933333333", "+54944444444", "+191167980952", "+34911111111"]
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    return [
+        CallResponse(
+            numero_origen=user.phone_number,
+            numero_destino=generator.choice(destinations),
+            duracion=generator.randint(1, 3600),
+            fecha=start + timedelta(minutes=17 * position)
+        )
+        for position in range(200)
+    ]
@@ -0,0 +1,49 @@
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import httpretty
+
+from Commands.bill_run import run_bill
+
+USERS_API = "https://fn-interview-api.azurewebsites.net/users/"
+
+@httpretty.activate
+def test_bill_run_invoices_every_subscriber():
+    """Test that the bill run writes one invoice (or error) line per subscriber with calls in the period."""
+    httpretty.register_uri(
+        httpretty.GET,
+        USERS_API + "+5411111111111",
+        body='{"address": "7431 Berge Coves","friends": ["+191167980952"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json",
+        status=200
+    )
+    httpretty.register_uri(httpretty.GET, USERS_API + "+5491167980953", body='{}', content_type="application/json", status=404)
+    output = io.StringIO()
+
+    summary = run_bill(datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 2, 1, tzinfo=timezone.utc), output, workers=2, chunk_size=1, progress=io.StringIO())
+
+    assert summary == {"subscribers": 2, "invoices": 1, "errors": 1}
+    records = {record["user"]["phone_number"] if "user" in record else record["phone_number"]: record for record in map(json.loads, output.getvalue().splitlines())}
+    assert records["+5491167980953"] == {"phone_number": "+5491167980953", "error": "User not found"}
+    assert records["+5411111111111"]["total"] == 0.0
+    assert records["+5411111111111"]["gross_total"] == 346.5
+
+@httpretty.activate
+def test_bill_run_forks_its_workers(monkeypatch):
+    """Test that the workers are forked, so they share the registry loaded by the parent process."""
+    httpretty.register_uri(httpretty.GET, USERS_API + "+5411111111111", body='{}', content_type="application/json", status=404)
+    httpretty.register_uri(httpretty.GET, USERS_API + "+5491167980953", body='{}', content_type="application/json", status=404)
+    contexts = []
+
+    class RecordingExecutor(ProcessPoolExecutor):
+        def __init__(self, max_workers=None, mp_context=None, **kwargs):
+            contexts.append(mp_context)
+            super().__init__(max_workers=max_workers, mp_context=mp_context, **kwargs)
+
+    monkeypatch.setattr("Commands.bill_run.ProcessPoolExecutor", RecordingExecutor)
+    summary = run_bill(datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 2, 1, tzinfo=timezone.utc), io.StringIO(), workers=1, progress=io.StringIO())
+
+    assert summary == {"subscribers": 2, "invoices": 0, "errors": 2}
+    assert [context.get_start_method() for context in contexts] == ["fork"]
@@ -1,11 +1,20 @@
+import os
 from unittest.mock import MagicMock
 
+import pandas as pd
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from Config.dependencies import get_price_calculator_strategies, get_rate_plan
 from Dto.Enums import CallType
-from .fixtures import user, call, international_call, friends_calls, mock_strategy
+from .fixtures import user, call, international_call, friends_calls, mock_strategy, many_calls
 from Services.CallProcessor import CallProcessorContext, CallProcessorStrategy
 from Services.CallProcessor import NationalCallProcessorStrategy
 from Services.CallProcessor import InternationalCallProcessorStrategy
 from Services.CallProcessor import FriendsCallProcessorStrategy
+from Services.CallProcessor import PricingEngine, RatePlan, VectorizedCallProcessor
+from Services import PhoneInvoiceService
 
 def test_add_strategies():
     """Test that strategies are added correctly to the context."""
@@ -105,3 +114,101 @@ def test_friends_strategy(user, friends_calls, international_call, mock_strategy
     assert mock_strategy._calls_seconds_acumulated == expected_seconds
     assert mock_strategy._calls_cost_acumulated == fake_amount*2
 
+@pytest.mark.parametrize("friends_calls_limit", [0, 3, 10, 1000])
+def test_vectorized_processor_matches_strategies(user, many_calls, friends_calls_limit, monkeypatch):
+    """test VectorizedCallProcessor prices invoices exactly like the strategies"""
+    monkeypatch.setenv("FRIENDS_CALLS", str(friends_calls_limit))
+    service = PhoneInvoiceService(None, None, get_price_calculator_strategies(), VectorizedCallProcessor.from_env())
+    calls_frame = pd.DataFrame([call.model_dump() for call in many_calls])
+
+    expected = service.process_calls(many_calls, user)
+    assert service.process_calls_frame(calls_frame, user) == expected
+    assert expected.friends_discount < 0 or friends_calls_limit == 0
+
+@pytest.mark.parametrize("friends_calls_limit", [0, 3, 1000])
+def test_summary_matches_invoice_totals(user, many_calls, friends_calls_limit, monkeypatch):
+    """test the aggregated summaries (vectorized and strategies) match the totals of the full invoice"""
+    monkeypatch.setenv("FRIENDS_CALLS", str(friends_calls_limit))
+    calls_frame = pd.DataFrame([call.model_dump() for call in many_calls])
+    expected = PhoneInvoiceService(None, None, get_price_calculator_strategies()).process_calls(many_calls, user)
+
+    summaries = [
+        PhoneInvoiceService(None, None, get_price_calculator_strategies(), VectorizedCallProcessor.from_env()).summarize_calls(calls_frame, user),
+        PhoneInvoiceService(None, None, get_price_calculator_strategies()).summarize_calls(iter(many_calls), user),
+    ]
+    for summary in summaries:
+        assert summary.calls is None
+        for total in ("total_international_seconds", "total_national_seconds", "total_friends_seconds", "gross_total", "friends_discount", "total"):
+            assert getattr(summary, total) == pytest.approx(getattr(expected, total))
+
+@pytest.mark.parametrize("order", [[0, 1], [1, 0]])
+def test_rollups_discount_friends_called_at_the_same_time_by_destination(user, order, monkeypatch):
+    """test friends first called at the same time in a month are discounted in destination order, whatever the rollups order"""
+    monkeypatch.setenv("FRIENDS_CALLS", "1")
+    processor = VectorizedCallProcessor.from_env()
+    first_call = pd.Timestamp("2025-03-10T12:00:00Z")
+    rollups = pd.DataFrame({
+        "numero_origen": user.phone_number,
+        "month": pd.Period("2025-03", "M"),
+        "numero_destino": ["+54922222222", "+55933333333"],
+        "calls": [1, 1],
+        "seconds": [600, 600],
+        "first_call": [first_call, first_call],
+    }).iloc[order]
+    no_calls = pd.DataFrame({"numero_destino": pd.Series(dtype=str), "duracion": pd.Series(dtype=int)})
+
+    totals = processor.summarize_rollups(no_calls, rollups, no_calls, user, load_month=None)
+    assert totals[CallType.FRIENDS.value]["amount"] == pytest.approx(-abs(processor._national_price_per_call))
+
+def test_rate_plan_matches_the_longest_prefix():
+    """test the rate plan prices every destination with its longest matching prefix, per call and per column"""
+    rate_plan = RatePlan({"+1": 0.5, "+1911": 0.9, "+191": 0.7, "+34": 0.3}, default_price_per_second=0.75)
+    destinations = ["+191167980952", "+19212345678", "+1", "+34911111111", "+5491167930920", "+3", ""]
+    expected = [0.9, 0.5, 0.5, 0.3, 0.75, 0.75, 0.75]
+
+    assert [rate_plan.price(destination) for destination in destinations] == expected
+    assert rate_plan.prices(pd.Series(destinations)).tolist() == expected
+    assert len(rate_plan) == 4
+
+def test_vectorized_processor_matches_strategies_with_rate_plan(user, many_calls, tmp_path, monkeypatch):
+    """test the strategies and VectorizedCallProcessor price international calls with the rate plan alike"""
+    (tmp_path / "rates.csv").write_text("prefix,price_per_second\n+1,0.5\n+1911,0.9\n+34,0.3\n+559,1.1\n")
+    monkeypatch.setenv("RATE_PLAN_PATH", os.path.relpath(tmp_path / "rates.csv"))
+    get_rate_plan.cache_clear()
+    try:
+        service = PhoneInvoiceService(None, None, get_price_calculator_strategies(), VectorizedCallProcessor.from_env(get_rate_plan()))
+        calls_frame = pd.DataFrame([call.model_dump() for call in many_calls])
+
+        expected = service.process_calls(many_calls, user)
+        assert service.process_calls_frame(calls_frame, user) == expected
+        summary = service.summarize_calls(calls_frame, user)
+        assert summary.total == pytest.approx(expected.total)
+        assert all(line.amount == line.duration * 0.9 for line in expected.calls if line.phone_number.startswith("+1911"))
+    finally:
+        get_rate_plan.cache_clear()
+
+@pytest.mark.parametrize("friends_calls_limit", [0, 3, 10, 1000])
+@pytest.mark.parametrize("rate_plan", [None, RatePlan({"+1": 0.5, "+1911": 0.9, "+34": 0.3}, default_price_per_second=0.75)])
+def test_pricing_engine_matches_strategies(user, many_calls, friends_calls_limit, rate_plan, monkeypatch):
+    """test the shared PricingEngine prices invoices exactly like a new strategies context, also from parallel threads"""
+    monkeypatch.setenv("FRIENDS_CALLS", str(friends_calls_limit))
+    context = get_price_calculator_strategies()
+    if rate_plan is not None:
+        context = CallProcessorContext()
+        national, international = NationalCallProcessorStrategy(), InternationalCallProcessorStrategy(rate_plan)
+        context.add_strategy(FriendsCallProcessorStrategy([national, international]))
+        context.add_strategy(national)
+        context.add_strategy(international)
+    expected = PhoneInvoiceService(None, None, context).process_calls(many_calls, user)
+
+    service = PhoneInvoiceService(None, None, PricingEngine.from_env(rate_plan))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        invoices = list(executor.map(lambda _: service.process_calls(many_calls, user), range(8)))
+    assert all(invoice == expected for invoice in invoices)
+    assert service.summarize_calls(iter(many_calls), user).total == expected.total
+
+def test_pricing_engine_is_immutable():
+    """test the engine can not be changed once built"""
+    engine = PricingEngine(2.5, 0.75, 10)
+    with pytest.raises(AttributeError):
+        engine._friends_calls = 0
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from Config.dependencies import get_call_registry
+from Connectors import CallsRegistryCSVConnector, CallsSegmentLog
+from Services import CallsIngestionService
+from main import app
+
+client = TestClient(app)
+
+def test_ingest_calls_validates_and_appends_batches(tmp_path):
+    """Test that CSV and NDJSON batches are appended, and that invalid batches are rejected as a whole."""
+    registry = CallsRegistryCSVConnector(ingest_log=CallsSegmentLog(str(tmp_path)))
+    app.dependency_overrides[get_call_registry] = lambda: registry
+    try:
+        response = client.post("/calls/ingest/", content="numero_origen,numero_destino,duracion,fecha\n+5411111111111,+5491167930920,60,2025-01-20T10:00:00Z\n", headers={"content-type": "text/csv"})
+        assert response.json() == {"ingested": 1, "row_count": 4}
+
+        ndjson = '{"numero_origen":"+5411111111111","numero_destino":"+5491167930920","duracion":30,"fecha":"2025-01-21T10:00:00Z"}\n'
+        response = client.post("/calls/ingest/", content=ndjson, headers={"content-type": "application/x-ndjson"})
+        assert response.json() == {"ingested": 1, "row_count": 5}
+
+        invalid = ndjson + '{"numero_origen":"5411","numero_destino":"+5491167930920","duracion":-1,"fecha":"2025-01-21T10:00:00Z"}\n'
+        response = client.post("/calls/ingest/", content=invalid, headers={"content-type": "application/x-ndjson"})
+        assert response.status_code == 422
+        assert [(error["row"], error["column"]) for error in response.json()["detail"]["errors"]] == [(1, "numero_origen"), (1, "duracion")]
+        assert client.post("/calls/ingest/", content="{}", headers={"content-type": "application/json"}).status_code == 415
+    finally:
+        app.dependency_overrides.clear()
+
+    calls = registry.get_list_calls("+5411111111111", datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 2, 1, tzinfo=timezone.utc))
+    assert [call.duracion for call in calls] == [462, 60, 30]
+
+def test_ingest_calls_rejects_durations_out_of_the_registry_range(tmp_path):
+    """Test that durations the registry can not store (int32) are rejected instead of wrapping around."""
+    registry = CallsRegistryCSVConnector(ingest_log=CallsSegmentLog(str(tmp_path)))
+    service = CallsIngestionService(registry)
+    body = "numero_origen,numero_destino,duracion,fecha\n+5411111111111,+5491167930920,{},2025-01-20T10:00:00Z\n"
+
+    with pytest.raises(HTTPException) as error:
+        service.ingest(body.format(3000000000).encode(), "text/csv")
+    assert error.value.status_code == 422
+    assert error.value.detail["errors"] == [{"row": 0, "column": "duracion", "value": "3000000000"}]
+    assert service.ingest(body.format(2147483647).encode(), "text/csv") == {"ingested": 1, "row_count": 4}
+    calls = registry.get_list_calls("+5411111111111", datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 2, 1, tzinfo=timezone.utc))
+    assert [call.duracion for call in calls] == [462, 2147483647]
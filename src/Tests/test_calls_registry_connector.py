@@ -0,0 +1,320 @@
+import os
+import random
+import shutil
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from Connectors import CallsRegistryCSVConnector, CallsSegmentLog, CallsRegistryHashPartitionedConnector, CallsRegistryPartitionedConnector, CallsRegistrySharedConnector, CallsRegistrySnapshotConnector, CallsRegistrySQLiteConnector
+from Commands.compile_snapshot import compile_snapshot
+from Commands.import_sqlite import import_sqlite
+from Commands.ingest_partitions import ingest_partitions
+from Commands.publish_registry import publish_registry
+from Config.dependencies import get_price_calculator_strategies
+from Services import PhoneInvoiceService
+from Services.CallProcessor import VectorizedCallProcessor
+from .fixtures import user
+
+PHONE = "+5411111111111"
+
+def test_csv_connector_indexes_calls_by_origin():
+    """Test that every origin code points to its block of encoded rows, sorted by date."""
+    connector = CallsRegistryCSVConnector()
+
+    assert connector.client.phones[connector.client.index_origin].tolist() == [PHONE.encode(), b"+5491167980953"]
+    assert list(zip(connector.client.index_start.tolist(), connector.client.index_stop.tolist())) == [(0, 2), (2, 3)]
+    assert connector.client.timestamp[0] < connector.client.timestamp[1]
+    assert (connector.client.origin.dtype, connector.client.duration.dtype, connector.client.timestamp.dtype) == (np.int32, np.int32, np.int64)
+
+def test_csv_connector_returns_calls_in_range():
+    """Test that only the calls of the phone number inside the (inclusive) date range are returned."""
+    connector = CallsRegistryCSVConnector()
+
+    calls = connector.get_list_calls(PHONE, datetime(2025, 1, 1, 4, 2, 45, tzinfo=timezone.utc), datetime(2025, 2, 2, 4, 45, 25, tzinfo=timezone.utc))
+    assert [call.duracion for call in calls] == [462, 392]
+
+    calls = connector.get_list_calls(PHONE, datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 2, 1, tzinfo=timezone.utc))
+    assert [call.duracion for call in calls] == [462]
+    assert calls[0].numero_destino == "+191167980952"
+
+def test_csv_connector_raises_when_no_calls():
+    """Test that a 404 is raised for unknown numbers and for empty ranges."""
+    connector = CallsRegistryCSVConnector()
+
+    with pytest.raises(HTTPException) as error:
+        connector.get_list_calls("+5400000000000", datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 2, 1, tzinfo=timezone.utc))
+    assert error.value.status_code == 404
+
+    with pytest.raises(HTTPException):
+        connector.get_list_calls(PHONE, datetime(2020, 1, 1, tzinfo=timezone.utc), datetime(2020, 2, 1, tzinfo=timezone.utc))
+
+@pytest.mark.parametrize("content", [
+    "numero_origen,numero_destino,duracion,fecha\n+5411111111111,+191167980952,462,not a date\n",
+    "numero_origen,numero_destino,duracion\n+5411111111111,+191167980952,462\n",
+])
+def test_csv_connector_rejects_malformed_files(content, tmp_path):
+    """Test that a malformed CSV file fails the load instead of leaving an empty registry."""
+    csv_path = tmp_path / "calls.csv"
+    csv_path.write_text(content)
+    with pytest.raises(HTTPException) as error:
+        CallsRegistryCSVConnector(os.path.relpath(csv_path))
+    assert error.value.status_code == 500 and error.value.detail.startswith("Malformed CSV file")
+
+def test_snapshot_connector_matches_csv_connector(tmp_path):
+    """Test that a compiled and memory-mapped snapshot answers like the CSV connector."""
+    snapshot_path = os.path.relpath(tmp_path / "snapshot")
+    compile_snapshot(f"./{os.environ.get('CSV_FILE_PATH')}", snapshot_path)
+    csv_connector = CallsRegistryCSVConnector()
+    snapshot_connector = CallsRegistrySnapshotConnector(snapshot_path)
+    from_date, to_date = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+    assert isinstance(snapshot_connector.client.timestamp, np.memmap)
+    assert snapshot_connector.get_list_calls(PHONE, from_date, to_date) == csv_connector.get_list_calls(PHONE, from_date, to_date)
+    with pytest.raises(HTTPException) as error:
+        snapshot_connector.get_list_calls("+5400000000000", from_date, to_date)
+    assert error.value.status_code == 404
+
+def test_partitioned_connector_prunes_partitions(tmp_path):
+    """Test that only the partitions overlapping the date range are opened."""
+    header = "numero_origen,numero_destino,duracion,fecha\n"
+    (tmp_path / "2025-01.csv").write_text(header + f"{PHONE},+191167980952,462,2025-01-01T04:02:45Z\n{PHONE},+5491167930920,10,2025-01-20T10:00:00Z\n")
+    (tmp_path / "2025-02.csv").write_text(header + f"{PHONE},+191167980952,392,2025-02-02T04:45:25Z\n")
+    connector = CallsRegistryPartitionedConnector(os.path.relpath(tmp_path))
+
+    assert (tmp_path / CallsRegistryPartitionedConnector.MANIFEST_FILE_NAME).exists()
+    calls = connector.get_list_calls(PHONE, datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 1, 31, tzinfo=timezone.utc))
+    assert [call.duracion for call in calls] == [462, 10]
+    assert connector._open_partition.cache_info().currsize == 1
+
+    calls = connector.get_list_calls(PHONE, datetime(2025, 1, 15, tzinfo=timezone.utc), datetime(2025, 3, 1, tzinfo=timezone.utc))
+    assert [call.duracion for call in calls] == [10, 392]
+    assert connector._open_partition.cache_info().currsize == 2
+
+@pytest.mark.parametrize("friends_calls_limit", [0, 1, 3, 7, 1000])
+@pytest.mark.parametrize("from_date, to_date", [
+    (datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2026, 1, 1, tzinfo=timezone.utc)),
+    (datetime(2025, 2, 14, 9, 30, tzinfo=timezone.utc), datetime(2025, 11, 3, tzinfo=timezone.utc)),
+    (datetime(2025, 3, 1, tzinfo=timezone.utc), datetime(2025, 3, 31, 23, 59, 59, tzinfo=timezone.utc)),
+])
+def test_summary_from_monthly_rollups_matches_calls(user, friends_calls_limit, from_date, to_date, tmp_path, monkeypatch):
+    """Test that the summaries computed from the monthly rollups match the ones computed from the calls."""
+    monkeypatch.setenv("FRIENDS_CALLS", str(friends_calls_limit))
+    generator = random.Random(7)
+    destinations = user.friends + ["+54933333333", "+191167980952"]
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        f"{user.phone_number},{generator.choice(destinations)},{generator.randint(1, 3600)},{(start + timedelta(hours=61 * position)).isoformat()}"
+        for position in range(150)
+    ]
+    (tmp_path / "calls.csv").write_text("numero_origen,numero_destino,duracion,fecha\n" + "\n".join(rows) + "\n")
+    connector = CallsRegistryCSVConnector(os.path.relpath(tmp_path / "calls.csv"))
+    service = PhoneInvoiceService(connector, None, get_price_calculator_strategies(), VectorizedCallProcessor.from_env())
+
+    range_rollups = connector.get_range_rollups(user.phone_number, from_date, to_date)
+    assert range_rollups is not None
+    summary = service.summarize_range_rollups(range_rollups, user)
+    expected = service.summarize_calls(connector.get_calls_frame(user.phone_number, from_date, to_date), user)
+    for total in ("total_international_seconds", "total_national_seconds", "total_friends_seconds", "gross_total", "friends_discount", "total"):
+        assert getattr(summary, total) == pytest.approx(getattr(expected, total))
+
+def test_range_rollups_need_a_whole_month():
+    """Test that ranges leaving calls of every month out are left to the calls."""
+    connector = CallsRegistryCSVConnector()
+
+    assert connector.get_range_rollups(PHONE, datetime(2025, 1, 1, 5, tzinfo=timezone.utc), datetime(2025, 2, 2, 4, tzinfo=timezone.utc)) is None
+    assert connector.get_range_rollups(PHONE, datetime(2025, 1, 2, tzinfo=timezone.utc), datetime(2025, 2, 20, tzinfo=timezone.utc)).rollups["calls"].tolist() == [1]
+    with pytest.raises(HTTPException) as error:
+        connector.get_range_rollups(PHONE, datetime(2020, 1, 1, tzinfo=timezone.utc), datetime(2020, 3, 1, tzinfo=timezone.utc))
+    assert error.value.status_code == 404
+
+def test_sqlite_connector_matches_csv_connector(tmp_path):
+    """Test that an imported SQLite database answers like the CSV connector."""
+    database_path = os.path.relpath(tmp_path / "calls.sqlite")
+    assert import_sqlite(f"./{os.environ.get('CSV_FILE_PATH')}", database_path, batch_size=2) == 3
+    csv_connector = CallsRegistryCSVConnector()
+    sqlite_connector = CallsRegistrySQLiteConnector(database_path)
+    from_date, to_date = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+    assert sqlite_connector.get_list_calls(PHONE, from_date, to_date) == csv_connector.get_list_calls(PHONE, from_date, to_date)
+    assert list(sqlite_connector.iter_calls(PHONE, from_date, to_date)) == csv_connector.get_list_calls(PHONE, from_date, to_date)
+    assert sqlite_connector.get_calls_frame(PHONE, from_date, to_date).to_dict("list") == csv_connector.get_calls_frame(PHONE, from_date, to_date).to_dict("list")
+    assert sqlite_connector.get_origin_numbers(from_date, to_date) == csv_connector.get_origin_numbers(from_date, to_date)
+    with pytest.raises(HTTPException) as error:
+        sqlite_connector.iter_calls("+5400000000000", from_date, to_date)
+    assert error.value.status_code == 404
+
+def test_import_sqlite_keeps_the_index_of_a_database_with_calls(tmp_path, monkeypatch):
+    """Test that the index is only dropped while importing into an empty table, never under live readers."""
+    database_path = os.path.relpath(tmp_path / "calls.sqlite")
+    csv_path = f"./{os.environ.get('CSV_FILE_PATH')}"
+    read_csv = pd.read_csv
+    indexed = []
+
+    def read_chunks(*args, **kwargs):
+        for chunk in read_csv(*args, **kwargs):
+            with sqlite3.connect(database_path) as reader:
+                indexed.append(reader.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'calls_origin_fecha'").fetchone()[0] == 1)
+            yield chunk
+
+    monkeypatch.setattr("Commands.import_sqlite.pd.read_csv", read_chunks)
+    import_sqlite(csv_path, database_path, batch_size=2)
+    assert indexed == [False, False]
+
+    indexed.clear()
+    assert import_sqlite(csv_path, database_path, batch_size=2) == 3
+    assert indexed == [True, True]
+    assert len(CallsRegistrySQLiteConnector(database_path).get_list_calls(PHONE, datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 3, 1, tzinfo=timezone.utc))) == 4
+
+def test_sqlite_connector_opens_a_connection_per_thread(tmp_path):
+    """Test that every thread queries through its own connection."""
+    database_path = os.path.relpath(tmp_path / "calls.sqlite")
+    import_sqlite(f"./{os.environ.get('CSV_FILE_PATH')}", database_path)
+    connector = CallsRegistrySQLiteConnector(database_path)
+
+    # The threads wait for each other so they are alive at the same time, and the connections are kept referenced
+    barrier = threading.Barrier(2)
+    connections = [None, None]
+
+    def connect(position):
+        connections[position] = (connector._connection(), connector._connection())
+        barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=connect, args=(position,)) for position in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(first is second for first, second in connections)
+    assert connections[0][0] is not connections[1][0]
+    assert connector._connection() is connector._connection()
+    assert all(connector._connection() is not first for first, _ in connections)
+
+def test_shared_connector_swaps_generations(tmp_path):
+    """Test that workers attach to the published generation and move to a new one without breaking running readers."""
+    shared_path = str(tmp_path / "shared")
+    with pytest.raises(HTTPException):
+        CallsRegistrySharedConnector(shared_path)
+    csv_path = f"./{os.environ.get('CSV_FILE_PATH')}"
+    first = publish_registry(csv_path, shared_path, keep=1)
+    connector = CallsRegistrySharedConnector(shared_path, check_interval=0)
+    reader = connector._attach()
+    from_date, to_date = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+    assert connector.data_version == first
+    assert connector.get_list_calls(PHONE, from_date, to_date) == CallsRegistryCSVConnector().get_list_calls(PHONE, from_date, to_date)
+
+    second = publish_registry(csv_path, shared_path, keep=1)
+    assert connector.data_version == second
+    assert sorted(os.listdir(shared_path)) == ["current", second]
+    # A reader of the removed generation still sees its mapped pages
+    assert reader.get_list_calls(PHONE, from_date, to_date) == connector.get_list_calls(PHONE, from_date, to_date)
+
+def test_shared_connector_keeps_its_generation_when_the_current_one_is_gone(tmp_path):
+    """Test that a worker keeps serving its generation when the current one was removed, and attaches on a later check."""
+    shared_path = str(tmp_path / "shared")
+    csv_path = f"./{os.environ.get('CSV_FILE_PATH')}"
+    first = publish_registry(csv_path, shared_path, keep=2)
+    connector = CallsRegistrySharedConnector(shared_path, check_interval=0)
+    from_date, to_date = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+    second = publish_registry(csv_path, shared_path, keep=2)
+    shutil.rmtree(os.path.join(shared_path, second))
+    assert connector.data_version == first
+    assert len(connector.get_list_calls(PHONE, from_date, to_date)) == 2
+
+    third = publish_registry(csv_path, shared_path, keep=2)
+    assert connector.data_version == third
+    assert len(connector.get_list_calls(PHONE, from_date, to_date)) == 2
+
+def test_hash_partitioned_connector_matches_csv_connector(tmp_path):
+    """Test that a file ingested in small chunks into hash partitions answers like the CSV connector."""
+    partitions_path = os.path.relpath(tmp_path / "partitions")
+    assert ingest_partitions(f"./{os.environ.get('CSV_FILE_PATH')}", partitions_path, partitions=4, chunk_rows=1) == 3
+    csv_connector = CallsRegistryCSVConnector()
+    connector = CallsRegistryHashPartitionedConnector(partitions_path, cache_size=1)
+    from_date, to_date = datetime(2020, 1, 1, tzinfo=timezone.utc), datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    assert connector.row_count == 3
+    assert connector.get_list_calls(PHONE, from_date, to_date) == csv_connector.get_list_calls(PHONE, from_date, to_date)
+    assert connector.get_origin_numbers(from_date, to_date) == csv_connector.get_origin_numbers(from_date, to_date)
+    with pytest.raises(HTTPException) as error:
+        connector.get_list_calls("+5400000000000", from_date, to_date)
+    assert error.value.status_code == 404
+
+def test_csv_connector_ingests_calls_like_a_reload(user, tmp_path):
+    """Test that calls appended through the log (delta, replayed or compacted) answer like reloading the whole file."""
+    generator = random.Random(11)
+    destinations = user.friends + ["+54933333333", "+191167980952"]
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        (generator.choice([user.phone_number, "+5491100000001"]), generator.choice(destinations), generator.randint(1, 3600), start + timedelta(hours=37 * generator.randint(0, 200)))
+        for _ in range(300)
+    ]
+    header = "numero_origen,numero_destino,duracion,fecha\n"
+    lines = [f"{origin},{destination},{duration},{date.isoformat()}\n" for origin, destination, duration, date in rows]
+    (tmp_path / "base.csv").write_text(header + "".join(lines[:200]))
+    (tmp_path / "all.csv").write_text(header + "".join(lines))
+    batch = pd.DataFrame(rows[200:], columns=["numero_origen", "numero_destino", "duracion", "fecha"])
+
+    expected = CallsRegistryCSVConnector(os.path.relpath(tmp_path / "all.csv"))
+    log = CallsSegmentLog(str(tmp_path / "log"), segment_bytes=1024)
+    connector = CallsRegistryCSVConnector(os.path.relpath(tmp_path / "base.csv"), ingest_log=log)
+    version = connector.data_version
+    assert connector.append_calls(batch.iloc[:50]) == 250
+    assert connector.append_calls(batch.iloc[50:]) == 300
+    assert connector.data_version != version and len(log.segments()) > 1
+    replayed = CallsRegistryCSVConnector(os.path.relpath(tmp_path / "base.csv"), ingest_log=CallsSegmentLog(str(tmp_path / "log")))
+    compacted = CallsRegistryCSVConnector(os.path.relpath(tmp_path / "base.csv"), ingest_log=CallsSegmentLog(str(tmp_path / "log")), compact_rows=10)
+    assert compacted._live[2] is None
+
+    service = PhoneInvoiceService(expected, None, get_price_calculator_strategies(), VectorizedCallProcessor.from_env())
+    from_date, to_date = datetime(2025, 2, 14, tzinfo=timezone.utc), datetime(2025, 11, 1, tzinfo=timezone.utc)
+    expected_summary = service.summarize_range_rollups(expected.get_range_rollups(user.phone_number, from_date, to_date), user)
+    for candidate in (connector, replayed, compacted):
+        assert candidate.row_count == 300
+        assert candidate.get_list_calls(user.phone_number, from_date, to_date) == expected.get_list_calls(user.phone_number, from_date, to_date)
+        assert list(candidate.iter_calls(user.phone_number, from_date, to_date)) == expected.get_list_calls(user.phone_number, from_date, to_date)
+        assert candidate.get_origin_numbers(from_date, to_date) == expected.get_origin_numbers(from_date, to_date)
+        summary = service.summarize_range_rollups(candidate.get_range_rollups(user.phone_number, from_date, to_date), user)
+        assert (summary.total_friends_seconds, summary.total) == pytest.approx((expected_summary.total_friends_seconds, expected_summary.total))
+
+def test_csv_connector_with_corrupt_base_file_keeps_the_ingest_log(tmp_path):
+    """Test that a corrupt base file fails the load with a clear error before replaying the log, which is kept intact."""
+    header = "numero_origen,numero_destino,duracion,fecha\n"
+    base_path = tmp_path / "base.csv"
+    base_path.write_text(header + "+5411111111111,+191167980952,462,2025-01-01T04:02:45Z\n")
+    log = CallsSegmentLog(str(tmp_path / "log"))
+    connector = CallsRegistryCSVConnector(os.path.relpath(base_path), ingest_log=log)
+    connector.append_calls(pd.DataFrame({
+        "numero_origen": ["+5411111111111"], "numero_destino": ["+5491167930920"], "duracion": [60],
+        "fecha": [pd.Timestamp("2025-01-20T10:00:00Z")],
+    }))
+    segments = {path: open(path, "rb").read() for path in log.segments()}
+
+    base_path.write_text(header + "+5411111111111,+191167980952,462,corrupt\n")
+    with pytest.raises(HTTPException) as error:
+        CallsRegistryCSVConnector(os.path.relpath(base_path), ingest_log=CallsSegmentLog(str(tmp_path / "log")))
+    assert error.value.status_code == 500
+    assert {path: open(path, "rb").read() for path in log.segments()} == segments
+
+    base_path.write_text(header + "+5411111111111,+191167980952,462,2025-01-01T04:02:45Z\n")
+    assert CallsRegistryCSVConnector(os.path.relpath(base_path), ingest_log=CallsSegmentLog(str(tmp_path / "log"))).row_count == 2
+
+def test_segment_log_drops_torn_records(tmp_path):
+    """Test that a record cut by a crash is dropped and truncated on replay."""
+    log = CallsSegmentLog(str(tmp_path))
+    calls = pd.DataFrame({"numero_origen": [PHONE], "numero_destino": ["+191167980952"], "duracion": [10], "fecha": [pd.Timestamp("2025-01-01T00:00:00Z")]})
+    log.append(calls)
+    segment = log.segments()[0]
+    size = os.path.getsize(segment)
+    with open(segment, "ab") as file:
+        file.write(b"#1 40 0000")
+
+    replayed = list(CallsSegmentLog(str(tmp_path)).replay())
+    assert len(replayed) == 1 and replayed[0].to_dict("list") == calls.to_dict("list")
+    assert os.path.getsize(segment) == size
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from Benchmarks.generate_cdr import generate_cdr
+from Connectors import CallsRegistryCSVConnector
+
+def test_generate_cdr_is_seeded(tmp_path):
+    """Test that the generated CDR files are reproducible and readable by the CSV connector."""
+    friends = generate_cdr(tmp_path / "first.csv", rows=2500, subscribers=50, seed=7, friends_ratio=0.5, chunk_size=1000)
+    generate_cdr(tmp_path / "second.csv", rows=2500, subscribers=50, seed=7, friends_ratio=0.5, chunk_size=1000)
+
+    assert (tmp_path / "first.csv").read_text() == (tmp_path / "second.csv").read_text()
+    calls = pd.read_csv(tmp_path / "first.csv", dtype=CallsRegistryCSVConnector.column_types)
+    assert len(calls) == 2500 and len(friends) == 50
+    to_friends = [destination in friends[origin] for origin, destination in zip(calls["numero_origen"], calls["numero_destino"])]
+    assert 0.4 < sum(to_friends) / len(calls) < 0.6
+    # Skewed: the first subscriber makes more calls than the last one
+    counts = calls["numero_origen"].value_counts()
+    assert counts[min(friends)] > counts.get(max(friends), 0)
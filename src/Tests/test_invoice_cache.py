@@ -0,0 +1,148 @@
+import asyncio
+
+from Config.dependencies import get_price_calculator_strategies
+from Connectors import AsyncCallsRegistryAdapter, CallsRegistryCSVConnector, CallsSegmentLog
+from Dto.Models import PhoneInvoiceRequest, UserResponse
+from Services import AsyncPhoneInvoiceService, CallsIngestionService, PhoneInvoiceService
+from Services.Cache import InvoiceCache
+from Services.CallProcessor import PricingEngine, RatePlan, VectorizedCallProcessor
+from .fixtures import user, call
+
+def test_invoice_cache_reuses_invoices_until_the_data_changes(user, call):
+    """Test that repeated invoices come from the cache, only for the same friends and data version."""
+    class FakeUsers:
+        def get_user(self, phone):
+            return user
+
+    class FakeRegistry:
+        data_version = "v1"
+        queries = 0
+
+        def get_list_calls(self, phone_number, from_date, to_date):
+            self.queries += 1
+            return [call]
+
+    registry, cache = FakeRegistry(), InvoiceCache(maxsize=10, ttl=60)
+    service = PhoneInvoiceService(registry, FakeUsers(), get_price_calculator_strategies(), invoice_cache=cache)
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+
+    invoice = service.get_phone_invoice(request)
+    assert service.get_phone_invoice(request) is invoice
+    assert (registry.queries, cache.hits, cache.misses) == (1, 1, 1)
+
+    user.friends = user.friends + ["+5491100000000"]
+    assert service.get_phone_invoice(request) is not invoice
+    assert (registry.queries, cache.hits, cache.misses, len(cache)) == (2, 1, 2, 1)
+
+    registry.data_version = "v2"
+    service.get_phone_invoice(request)
+    assert (registry.queries, len(cache)) == (3, 1)
+
+def test_invoice_cache_serves_the_current_user_details(user, call):
+    """Test that a cached invoice is returned with the current user when only the address changed."""
+    invoice = PhoneInvoiceService(None, None, get_price_calculator_strategies()).process_calls([call], user)
+    cache = InvoiceCache(maxsize=10, ttl=60)
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+    key = cache.key(request, "v1")
+    cache.set(key, user, invoice)
+
+    moved = user.model_copy(update={"address": "742 Evergreen Terrace"})
+    cached = cache.get(key, moved)
+    assert cached.user.address == "742 Evergreen Terrace"
+    assert cached.calls is invoice.calls and cached.total == invoice.total
+    assert invoice.user.address == "123 Main St"
+    assert cache.get(key, user) is invoice
+    assert (cache.hits, cache.misses) == (2, 0)
+
+def test_invoice_cache_key_follows_the_tariffs_of_the_engine(user, monkeypatch):
+    """Test that the tariffs part of the key comes from the engine the cache is built with, not from the environment."""
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+    engine = PricingEngine(2.5, 0.75, 10)
+    key = InvoiceCache(10, 60, engine.fingerprint).key(request, "v1")
+
+    monkeypatch.setenv("NATIONAL_PRICE_PER_CALL", "3")
+    assert InvoiceCache(10, 60, engine.fingerprint).key(request, "v1") == key
+    assert InvoiceCache(10, 60, PricingEngine(3, 0.75, 10).fingerprint).key(request, "v1") != key
+    assert VectorizedCallProcessor(2.5, 0.75, 10).fingerprint == engine.fingerprint
+    rate_plan, other_rate_plan = RatePlan({"+1": 0.5}, 0.75), RatePlan({"+1": 0.6}, 0.75)
+    assert PricingEngine(2.5, 0.75, 10, rate_plan).fingerprint == PricingEngine(2.5, 0.75, 10, RatePlan({"+1": 0.5}, 0.75)).fingerprint
+    assert len({engine.fingerprint, PricingEngine(2.5, 0.75, 10, rate_plan).fingerprint, PricingEngine(2.5, 0.75, 10, other_rate_plan).fingerprint}) == 3
+
+def test_async_service_returns_cached_invoice(user, call):
+    """Test that the async service returns cached invoices without querying the registry."""
+    class FakeUsers:
+        async def get_user(self, phone):
+            return user
+
+    class FakeRegistry:
+        data_version = "v1"
+        queries = 0
+
+        async def get_list_calls(self, phone_number, from_date, to_date):
+            self.queries += 1
+            await asyncio.sleep(0.01)
+            return [call]
+
+    registry, cache = FakeRegistry(), InvoiceCache(maxsize=10, ttl=60)
+    service = AsyncPhoneInvoiceService(registry, FakeUsers(), get_price_calculator_strategies(), invoice_cache=cache)
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+
+    async def get_twice():
+        return await service.get_phone_invoice(request), await service.get_phone_invoice(request)
+
+    first, second = asyncio.run(get_twice())
+    assert second is first
+    assert (registry.queries, cache.hits, cache.misses) == (1, 1, 1)
+
+def test_async_cache_miss_fetches_user_and_calls_concurrently(user, call):
+    """Test that on a cache miss the calls query runs while the user is looked up, and a hit skips the query."""
+    calls_requested = asyncio.Event()
+
+    class FakeUsers:
+        async def get_user(self, phone):
+            # Only resolves once the calls query has started (or right away when it is not needed)
+            if registry.queries == 0:
+                await asyncio.wait_for(calls_requested.wait(), timeout=1)
+            return user
+
+    class FakeRegistry:
+        data_version = "v1"
+        queries = 0
+
+        async def get_list_calls(self, phone_number, from_date, to_date):
+            self.queries += 1
+            calls_requested.set()
+            return [call]
+
+    registry, cache = FakeRegistry(), InvoiceCache(maxsize=10, ttl=60)
+    service = AsyncPhoneInvoiceService(registry, FakeUsers(), get_price_calculator_strategies(), invoice_cache=cache)
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+
+    async def get_twice():
+        return await service.get_phone_invoice(request), await service.get_phone_invoice(request)
+
+    first, second = asyncio.run(get_twice())
+    assert second is first
+    assert (registry.queries, cache.hits, cache.misses) == (1, 1, 1)
+
+def test_async_invoice_cache_key_predates_calls_ingested_during_the_user_lookup(tmp_path):
+    """Test that an invoice computed while a batch is ingested is not cached under the new data version."""
+    user = UserResponse(address="7431 Berge Coves", name="Deshawn Goodwin", phone_number="+5411111111111", friends=[])
+    registry = CallsRegistryCSVConnector(ingest_log=CallsSegmentLog(str(tmp_path)))
+    ingestion = CallsIngestionService(registry)
+
+    class FakeUsers:
+        lookups = 0
+
+        async def get_user(self, phone):
+            self.lookups += 1
+            if self.lookups == 1:
+                await asyncio.sleep(0.05)
+                ingestion.ingest(b"numero_origen,numero_destino,duracion,fecha\n+5411111111111,+5491167930920,60,2025-01-20T10:00:00Z\n", "text/csv")
+            return user
+
+    service = AsyncPhoneInvoiceService(AsyncCallsRegistryAdapter(registry), FakeUsers(), get_price_calculator_strategies(), invoice_cache=InvoiceCache(maxsize=10, ttl=60))
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-01-01", date_to="2025-02-01")
+
+    asyncio.run(service.get_phone_invoice(request))
+    assert len(asyncio.run(service.get_phone_invoice(request)).calls) == 2
@@ -0,0 +1,52 @@
+import pytest
+import respx
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from main import app
+
+client = TestClient(app)
+
+@respx.mock
+def test_get_invoice_reports_metrics_and_server_timing():
+    """Test that an invoice reports its stages in Server-Timing and in the Prometheus metrics."""
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,
+        content='{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
+    )
+    response = client.post(
+        "/get-invoice/",
+        json={"phone_number": "+5411111111111", "date_from": "2025-01-01", "date_to": "2025-02-01"},
+    )
+    stages = [timing.split(";")[0] for timing in response.headers["Server-Timing"].split(", ")]
+    assert sorted(stages) == ["pricing", "registry_query", "serialization", "users_api"]
+
+    metrics = client.get("/metrics").text
+    assert 'invoice_stage_seconds_count{stage="pricing"}' in metrics
+    assert 'invoice_priced_calls_total{call_type="FRIENDS"}' in metrics
+    assert 'users_api_responses_total{status="200"}' in metrics
+
+@pytest.mark.parametrize("path", ["/get-invoice/", "/get-invoice/summary/", "/get-invoice/stream/"])
+@respx.mock
+def test_invoice_endpoints_report_the_same_metrics(path):
+    """Test that the invoice, summary and stream endpoints count the priced calls and time every stage alike."""
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,
+        content='{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
+    )
+    stages = ("users_api", "registry_query", "pricing", "serialization")
+
+    def samples():
+        return (
+            REGISTRY.get_sample_value("invoice_priced_calls_total", {"call_type": "FRIENDS"}) or 0,
+            [REGISTRY.get_sample_value("invoice_stage_seconds_count", {"stage": stage}) or 0 for stage in stages],
+        )
+
+    priced_before, stages_before = samples()
+    response = client.post(path, json={"phone_number": "+5411111111111", "date_from": "2025-01-01", "date_to": "2025-02-01"})
+    assert response.status_code == 200
+    priced_after, stages_after = samples()
+    assert priced_after - priced_before == 1
+    assert [after - before for before, after in zip(stages_before, stages_after)] == [1, 1, 1, 1]
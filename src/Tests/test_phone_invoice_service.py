@@ -1,8 +1,24 @@
-import httpretty
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+import respx
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
 
-from Dto.Models import UserResponse
+from Commands.import_sqlite import import_sqlite
+from Config.dependencies import get_async_call_registry, get_price_calculator_strategies, get_vectorized_call_processor
+from Dto.Models import CallDetail, PhoneInvoiceRequest, UserResponse
+from Dto.Records import CallLine, InvoiceRecord
+from Services import AsyncPhoneInvoiceService
+from Connectors import AsyncCallsRegistryAdapter, CallsRegistrySQLiteConnector
 from main import app
+from .fixtures import user, call
 
 client = TestClient(app)
 
@@ -26,15 +42,13 @@ EXPECTED_RESPONSE = {
     }
 }
 
-@httpretty.activate
+@respx.mock
 def test_get_invoice_given_correct_info():
     # Mocking the external API call
-    httpretty.register_uri(
-        httpretty.GET,
-        "https://fn-interview-api.azurewebsites.net/users/+5411111111111",
-        body='{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
-        content_type="application/json",
-        status=200  # Define the expected status code
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,  # Define the expected status code
+        content='{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
     )
     response = client.post(
         "/get-invoice/",
@@ -43,15 +57,13 @@ def test_get_invoice_given_correct_info():
     assert response.status_code == 200
     assert response.json() == EXPECTED_RESPONSE
 
-@httpretty.activate
+@respx.mock
 def test_return_error_when_user_not_exist():
     # Mocking the external API call
-    httpretty.register_uri(
-        httpretty.GET,
-        "https://fn-interview-api.azurewebsites.net/users/+5411111111111",
-        body='{}',
-        content_type="application/json",
-        status=404  # Define the expected status code
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=404,  # Define the expected status code
+        content='{}',
+        content_type="application/json"
     )
     response = client.post(
         "/get-invoice/",
@@ -60,19 +72,157 @@ def test_return_error_when_user_not_exist():
     assert response.status_code == 404
     assert response.json() == {"detail":"User not found"}
 
-
+@respx.mock
 def test_return_error_when_no_calls_in_range():
     # Mocking the external API call
-    httpretty.register_uri(
-        httpretty.GET,
-        "https://fn-interview-api.azurewebsites.net/users/+5411111111111",
-        body='{}',
-        content_type="application/json",
-        status=404  # Define the expected status code
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,  # Define the expected status code
+        content='{"address": "7431 Berge Coves","friends": [],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
     )
     response = client.post(
         "/get-invoice/",
         json={"phone_number": "+5411111111111", "date_from": "2020-01-01", "date_to": "2020-02-01"},
     )
     assert response.status_code == 404
-    assert response.json() == {"detail":"No calls found for the given phone number"}
\ No newline at end of file
+    assert response.json() == {"detail":"No calls found for the given phone number"}
+
+def test_async_service_fetches_user_and_calls_concurrently(user, call):
+    """Test that the async service queries the registry while the user lookup is still pending."""
+    calls_requested = asyncio.Event()
+
+    class FakeUsers:
+        async def get_user(self, phone):
+            # Only resolves once the calls query has started
+            await asyncio.wait_for(calls_requested.wait(), timeout=1)
+            return user
+
+    class FakeRegistry:
+        async def get_list_calls(self, phone_number, from_date, to_date):
+            calls_requested.set()
+            return [call]
+
+    service = AsyncPhoneInvoiceService(FakeRegistry(), FakeUsers(), get_price_calculator_strategies())
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+    invoice = asyncio.run(service.get_phone_invoice(request))
+
+    assert invoice.calls[0].phone_number == call.numero_destino
+    assert invoice.total_national_seconds == call.duracion
+
+def test_async_service_reports_unknown_user_first(user):
+    """Test that an unknown user is reported even when the registry has no calls either."""
+    class FakeUsers:
+        async def get_user(self, phone):
+            await asyncio.sleep(0.01)
+            raise HTTPException(status_code=404, detail="User not found")
+
+    class FakeRegistry:
+        async def get_list_calls(self, phone_number, from_date, to_date):
+            raise HTTPException(status_code=404, detail="No calls found for the given phone number")
+
+    service = AsyncPhoneInvoiceService(FakeRegistry(), FakeUsers(), get_price_calculator_strategies())
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(service.get_phone_invoice(request))
+    assert error.value.detail == "User not found"
+
+@respx.mock
+def test_get_invoice_stream_matches_invoice():
+    # Mocking the external API call
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,
+        content='{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
+    )
+    response = client.post(
+        "/get-invoice/stream/",
+        json={"phone_number": "+5411111111111", "date_from": "2025-01-01", "date_to": "2025-02-01"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"user": EXPECTED_RESPONSE["user"]}
+    assert [line["call"] for line in lines[1:-1]] == EXPECTED_RESPONSE["calls"]
+    assert lines[-1] == {"totals": {key: value for key, value in EXPECTED_RESPONSE.items() if key not in ("user", "calls")}}
+
+@respx.mock
+def test_get_invoice_stream_returns_error_when_no_calls_in_range():
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,
+        content='{"address": "7431 Berge Coves","friends": [],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
+    )
+    response = client.post(
+        "/get-invoice/stream/",
+        json={"phone_number": "+5411111111111", "date_from": "2020-01-01", "date_to": "2020-02-01"},
+    )
+    assert response.status_code == 404
+    assert response.json() == {"detail":"No calls found for the given phone number"}
+
+@respx.mock
+def test_get_invoice_stream_and_summary_with_sqlite_connector(tmp_path):
+    """Test that the SQLite calls iterator can be consumed outside the thread that queried (stream and strategies summary)."""
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,
+        content='{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
+    )
+    database_path = os.path.relpath(tmp_path / "calls.sqlite")
+    import_sqlite(f"./{os.environ.get('CSV_FILE_PATH')}", database_path)
+    registry = AsyncCallsRegistryAdapter(CallsRegistrySQLiteConnector(database_path, fetch_size=1))
+    app.dependency_overrides[get_async_call_registry] = lambda: registry
+    app.dependency_overrides[get_vectorized_call_processor] = lambda: None
+    try:
+        body = {"phone_number": "+5411111111111", "date_from": "2025-01-01", "date_to": "2025-02-01"}
+        response = client.post("/get-invoice/stream/", json=body)
+        summary = client.post("/get-invoice/summary/", json=body)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["call"] for line in lines[1:-1]] == EXPECTED_RESPONSE["calls"]
+    assert summary.json() == {key: value for key, value in EXPECTED_RESPONSE.items() if key != "calls"}
+
+@pytest.mark.parametrize("timestamp", [
+    datetime(2025, 1, 1, 4, 2, 45, tzinfo=timezone.utc),
+    datetime(2025, 1, 1, 4, 2, 45, 500000, tzinfo=timezone.utc),
+    datetime(2025, 1, 1, 4, 2, 45, tzinfo=timezone(timedelta(hours=-3))),
+    pd.Timestamp("2025-01-01T04:02:45Z"),
+])
+def test_call_line_serializes_like_call_detail(timestamp):
+    """Test that the internal call lines serialize exactly like the CallDetail API model."""
+    line = CallLine("+191167980952", 462, timestamp, 346.5)
+    assert line.to_json_dict() == CallDetail(**line.as_dict()).model_dump(mode="json")
+
+@pytest.mark.parametrize("timestamps, amounts", [
+    ([datetime(2025, 1, 1, 4, 2, 45, tzinfo=timezone.utc), pd.Timestamp("2025-01-02T04:02:45.250Z")], [346.5, 0.1 + 0.2]),
+    ([datetime(2025, 1, 1, 4, 2, 45, tzinfo=timezone.utc), datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=-3)))], [462.0, -0.0]),
+    ([pd.Timestamp("2025-01-01T04:02:45Z"), pd.Timestamp("2025-01-01T04:02:46Z")], [1e-05, 1e16]),
+])
+def test_invoice_json_matches_fastapi_encoding(timestamps, amounts):
+    """Test that invoices and summaries serialized from the records are byte for byte the FastAPI responses."""
+    user = UserResponse(address="Güemes 1234", name="Zoë", phone_number="+5411111111111", friends=[])
+    invoice = InvoiceRecord(
+        user=user, calls=[CallLine("+191167980952", 462, timestamp, amount) for timestamp, amount in zip(timestamps, amounts)],
+        total_international_seconds=924.0, total_national_seconds=0, total_friends_seconds=0.0,
+        gross_total=sum(amounts), friends_discount=0.0, total=sum(amounts),
+    )
+    assert invoice.to_json() == JSONResponse(jsonable_encoder(invoice.to_response())).body
+    invoice.calls = None
+    assert invoice.to_json() == JSONResponse(jsonable_encoder(invoice.to_summary_response())).body
+
+@respx.mock
+def test_get_invoice_summary():
+    # Mocking the external API call
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,
+        content='{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
+    )
+    response = client.post(
+        "/get-invoice/summary/",
+        json={"phone_number": "+5411111111111", "date_from": "2025-01-01", "date_to": "2025-02-01"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {key: value for key, value in EXPECTED_RESPONSE.items() if key != "calls"}
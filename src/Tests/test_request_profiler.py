@@ -0,0 +1,56 @@
+import pstats
+
+import httpretty
+import respx
+from fastapi.testclient import TestClient
+
+from Config.dependencies import get_request_profiler
+from Metrics import RequestProfiler
+from main import app
+
+client = TestClient(app)
+
+@respx.mock
+@httpretty.activate
+def test_get_invoice_profiles_requests_with_the_token(tmp_path):
+    """Test that a request with the profiling token writes a profile tagged with the phone number and call count."""
+    user = '{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}'
+    # Profiled requests go through the sync service (requests), the others through the async one (httpx)
+    httpretty.register_uri(httpretty.GET, "https://fn-interview-api.azurewebsites.net/users/+5411111111111", body=user, content_type="application/json", status=200)
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(status_code=200, content=user, content_type="application/json")
+    profiler = RequestProfiler(str(tmp_path), token="secret")
+    app.dependency_overrides[get_request_profiler] = lambda: profiler
+    try:
+        body = {"phone_number": "+5411111111111", "date_from": "2025-01-01", "date_to": "2025-02-01"}
+        expected = client.post("/get-invoice/", json=body).json()
+        assert list(tmp_path.iterdir()) == []
+
+        response = client.post("/get-invoice/", json=body, headers={"X-Profile": "secret"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.json() == expected and len(expected["calls"]) == 1
+    profiles = list(tmp_path.iterdir())
+    assert len(profiles) == 1 and profiles[0].name.endswith("-+5411111111111-1calls.prof")
+    assert pstats.Stats(str(profiles[0])).total_calls > 0
+
+@respx.mock
+def test_get_invoice_ignores_non_ascii_profile_headers(tmp_path):
+    """Test that a non-ASCII X-Profile header is not profiled, instead of failing the request."""
+    respx.get("https://fn-interview-api.azurewebsites.net/users/+5411111111111").respond(
+        status_code=200,
+        content='{"address": "7431 Berge Coves","friends": ["+191167980952","+5491167930920"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}',
+        content_type="application/json"
+    )
+    profiler = RequestProfiler(str(tmp_path), token="secret")
+    assert not profiler.should_profile("sécret")
+    app.dependency_overrides[get_request_profiler] = lambda: profiler
+    try:
+        body = {"phone_number": "+5411111111111", "date_from": "2025-01-01", "date_to": "2025-02-01"}
+        expected = client.post("/get-invoice/", json=body).json()
+        response = client.post("/get-invoice/", json=body, headers={"X-Profile": "sécret".encode()})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200 and response.json() == expected
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+from fastapi import HTTPException
+
+from Config.dependencies import get_price_calculator_strategies
+from Dto.Models import PhoneInvoiceRequest
+from Services import AsyncPhoneInvoiceService, PhoneInvoiceService
+from Services.Cache import AsyncSingleFlight, SingleFlight
+from .fixtures import user, call
+
+def test_single_flight_coalesces_concurrent_identical_invoices(user, call):
+    """Test that concurrent identical invoice requests share one computation, its result and its errors."""
+    release = threading.Event()
+
+    class FakeUsers:
+        def get_user(self, phone):
+            return user
+
+    class FakeRegistry:
+        data_version = "v1"
+        queries = 0
+        error = None
+
+        def get_list_calls(self, phone_number, from_date, to_date):
+            self.queries += 1
+            release.wait(timeout=5)
+            if self.error is not None:
+                raise self.error
+            return [call]
+
+    registry, in_flight = FakeRegistry(), SingleFlight("invoice")
+    service = PhoneInvoiceService(registry, FakeUsers(), get_price_calculator_strategies(), in_flight=in_flight)
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+
+    def request_concurrently(count):
+        results = [None] * count
+
+        def get(position):
+            try:
+                results[position] = service.get_phone_invoice(request)
+            except HTTPException as error:
+                results[position] = error
+
+        threads = [threading.Thread(target=get, args=(position,)) for position in range(count)]
+        shared = in_flight.shared
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while in_flight.shared - shared < count - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        release.clear()
+        return results
+
+    invoices = request_concurrently(4)
+    assert registry.queries == 1
+    assert all(invoice is invoices[0] for invoice in invoices)
+    assert invoices[0].calls[0].phone_number == call.numero_destino
+    assert len(in_flight) == 0
+
+    registry.error = HTTPException(status_code=404, detail="No calls found for the given phone number")
+    errors = request_concurrently(3)
+    assert registry.queries == 2
+    assert all(error is registry.error for error in errors)
+
+def test_async_single_flight_survives_cancelled_callers(user, call):
+    """Test that concurrent identical async invoice requests share one computation, even if one of them is cancelled."""
+    class FakeUsers:
+        async def get_user(self, phone):
+            return user
+
+    class FakeRegistry:
+        data_version = "v1"
+        queries = 0
+
+        async def get_list_calls(self, phone_number, from_date, to_date):
+            self.queries += 1
+            await asyncio.sleep(0.05)
+            return [call]
+
+    registry, in_flight = FakeRegistry(), AsyncSingleFlight("invoice")
+    service = AsyncPhoneInvoiceService(registry, FakeUsers(), get_price_calculator_strategies(), in_flight=in_flight)
+    request = PhoneInvoiceRequest(phone_number=user.phone_number, date_from="2025-03-01", date_to="2025-04-01")
+
+    async def get_concurrently():
+        first = asyncio.ensure_future(service.get_phone_invoice(request))
+        await asyncio.sleep(0)
+        first.cancel()
+        invoices = await asyncio.gather(*(service.get_phone_invoice(request) for _ in range(3)))
+        return first, invoices
+
+    first, invoices = asyncio.run(get_concurrently())
+    assert first.cancelled()
+    assert registry.queries == 1
+    assert all(invoice is invoices[0] for invoice in invoices)
+    assert (in_flight.shared, len(in_flight)) == (3, 0)
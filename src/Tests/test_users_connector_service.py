@@ -0,0 +1,217 @@
+import asyncio
+import threading
+import time
+
+import httpretty
+import httpx
+import pytest
+import respx
+from fastapi import HTTPException
+
+from Dto.Models import UserResponse
+from Services import AsyncUsersConnectorService, UsersConnectorService
+from Services.Cache import TTLCache
+
+USER_URL = "https://fn-interview-api.azurewebsites.net/users/+5411111111111"
+USER_BODY = '{"address": "7431 Berge Coves","friends": ["+191167980952"],"name": "Deshawn Goodwin","phone_number": "+5411111111111"}'
+
+def test_ttl_cache_expires_and_serves_stale(monkeypatch):
+    """Test that entries expire after their ttl and are served as stale during the stale window."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=2, ttl=10, stale_ttl=5)
+    cache.set("a", 1)
+
+    assert cache.get("a") == (True, 1, False)
+    now[0] += 12
+    assert cache.get("a") == (True, 1, True)
+    now[0] += 5
+    assert cache.get("a") == (False, None, False)
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test that the cache is bounded and evicts the least recently used entry."""
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b")[0] is False
+    assert cache.get("a")[1] == 1
+
+@httpretty.activate
+def test_get_user_is_cached(monkeypatch):
+    """Test that repeated lookups of the same user skip the Users API."""
+    monkeypatch.setenv("USERS_CACHE_TTL", "60")
+    httpretty.register_uri(httpretty.GET, USER_URL, body=USER_BODY, content_type="application/json", status=200)
+    service = UsersConnectorService()
+
+    assert service.get_user("+5411111111111").name == "Deshawn Goodwin"
+    assert service.get_user("+5411111111111").name == "Deshawn Goodwin"
+    assert len(httpretty.latest_requests()) == 1
+
+def test_get_user_coalesces_concurrent_lookups(monkeypatch):
+    """Test that concurrent lookups of the same uncached user share one Users API request."""
+    monkeypatch.setenv("USERS_CACHE_TTL", "0")
+    service = UsersConnectorService()
+    release = threading.Event()
+    requested = []
+
+    def fetch_user(phone):
+        requested.append(phone)
+        release.wait(timeout=5)
+        return UserResponse.model_validate_json(USER_BODY)
+
+    monkeypatch.setattr(service, "_fetch_user", fetch_user)
+    users = []
+    threads = [threading.Thread(target=lambda: users.append(service.get_user("+5411111111111"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while service._in_flight.shared < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert requested == ["+5411111111111"]
+    assert len(users) == 4 and all(found is users[0] for found in users)
+
+@respx.mock
+def test_async_get_user_keeps_the_stale_refresh_task(monkeypatch):
+    """Test that a stale user is served while a refresh task, referenced until it finishes, fetches it again."""
+    monkeypatch.setenv("USERS_CACHE_TTL", "10")
+    monkeypatch.setenv("USERS_CACHE_STALE_TTL", "60")
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    route = respx.get(USER_URL).respond(status_code=200, content=USER_BODY, content_type="application/json")
+    service = AsyncUsersConnectorService()
+
+    async def get_stale_user():
+        await service.get_user("+5411111111111")
+        now[0] += 15
+        user = await service.get_user("+5411111111111")
+        tasks = set(service._refresh_tasks)
+        await asyncio.gather(*tasks)
+        await service.close()
+        return user, tasks
+
+    user, tasks = asyncio.run(get_stale_user())
+    assert user.name == "Deshawn Goodwin"
+    assert len(tasks) == 1 and service._refresh_tasks == set()
+    assert route.call_count == 2
+
+@respx.mock
+def test_async_client_is_closed_with_its_event_loop(monkeypatch):
+    """Test that the pooled client of a finished event loop is closed, and a new one is used by the next loop."""
+    monkeypatch.setenv("USERS_CACHE_TTL", "0")
+    respx.get(USER_URL).respond(status_code=200, content=USER_BODY, content_type="application/json")
+    service = AsyncUsersConnectorService()
+
+    async def get_user():
+        await service.get_user("+5411111111111")
+        return service._client
+
+    first = asyncio.run(get_user())
+    assert first.is_closed
+    second = asyncio.run(get_user())
+    assert second is not first and second.is_closed
+
+    async def get_user_and_close():
+        client = await get_user()
+        await service.close()
+        return client
+
+    assert asyncio.run(get_user_and_close()).is_closed
+    assert service._client is None
+
+@respx.mock
+def test_async_get_user_retries_transient_failures(monkeypatch):
+    """Test that 429 and 5xx answers are requested again, and the last answer is used when they keep failing."""
+    monkeypatch.setenv("USERS_API_INTERACTIVE_RETRIES", "2")
+    route = respx.get(USER_URL).mock(side_effect=[
+        httpx.Response(503), httpx.Response(429), httpx.Response(200, content=USER_BODY, headers={"content-type": "application/json"}),
+    ])
+    failing_route = respx.get(USER_URL.replace("+5411111111111", "+5422222222222")).respond(status_code=500, content="{}")
+    service = AsyncUsersConnectorService()
+
+    async def get_users():
+        user = await service.get_user("+5411111111111")
+        with pytest.raises(ValueError):
+            await service.get_user("+5422222222222")
+        await service.close()
+        return user
+
+    assert asyncio.run(get_users()).name == "Deshawn Goodwin"
+    assert (route.call_count, failing_route.call_count) == (3, 3)
+
+@httpretty.activate
+def test_get_user_caches_not_found(monkeypatch):
+    """Test that unknown users are cached for USERS_CACHE_NOT_FOUND_TTL seconds."""
+    monkeypatch.setenv("USERS_CACHE_NOT_FOUND_TTL", "60")
+    httpretty.register_uri(httpretty.GET, USER_URL, body='{}', content_type="application/json", status=404)
+    service = UsersConnectorService()
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            service.get_user("+5411111111111")
+        assert error.value.status_code == 404
+    assert len(httpretty.latest_requests()) == 1
+
+@httpretty.activate
+def test_get_user_without_cache(monkeypatch):
+    """Test that every lookup reaches the Users API when the cache is disabled."""
+    monkeypatch.setenv("USERS_CACHE_TTL", "0")
+    httpretty.register_uri(httpretty.GET, USER_URL, body=USER_BODY, content_type="application/json", status=200)
+    service = UsersConnectorService()
+
+    service.get_user("+5411111111111")
+    service.get_user("+5411111111111")
+    assert len(httpretty.latest_requests()) == 2
+
+@httpretty.activate
+def test_get_users_dedupes_and_maps_unknown_users(monkeypatch):
+    """Test that the batch lookup requests every number once and maps unknown users to None."""
+    monkeypatch.setenv("USERS_API_CONCURRENCY", "4")
+    httpretty.register_uri(httpretty.GET, USER_URL, body=USER_BODY, content_type="application/json", status=200)
+    httpretty.register_uri(httpretty.GET, USER_URL.replace("+5411111111111", "+5422222222222"), body='{}', content_type="application/json", status=404)
+    service = UsersConnectorService()
+
+    users = service.get_users(["+5411111111111", "+5422222222222", "+5411111111111"])
+
+    assert users["+5411111111111"].name == "Deshawn Goodwin"
+    assert users["+5422222222222"] is None
+    assert len(httpretty.latest_requests()) == 2
+
+@httpretty.activate
+def test_get_user_retries_without_backoff(monkeypatch):
+    """Test that get_user retries right away, ignoring the backoff and the Retry-After of the batch lookups."""
+    monkeypatch.setenv("USERS_API_RETRY_BACKOFF", "30")
+    httpretty.register_uri(httpretty.GET, USER_URL, responses=[
+        httpretty.Response(body='{}', status=503, adding_headers={"Retry-After": "30"}),
+        httpretty.Response(body=USER_BODY, content_type="application/json", status=200),
+    ])
+    service = UsersConnectorService()
+
+    started = time.monotonic()
+    assert service.get_user("+5411111111111").name == "Deshawn Goodwin"
+    assert time.monotonic() - started < 5
+    assert len(httpretty.latest_requests()) == 2
+
+@httpretty.activate
+def test_get_users_retries_transient_failures(monkeypatch):
+    """Test that 5xx answers are retried and numbers that keep failing are left out of the mapping."""
+    monkeypatch.setenv("USERS_API_RETRY_BACKOFF", "0")
+    httpretty.register_uri(httpretty.GET, USER_URL, responses=[
+        httpretty.Response(body='{}', status=503),
+        httpretty.Response(body=USER_BODY, content_type="application/json", status=200),
+    ])
+    httpretty.register_uri(httpretty.GET, USER_URL.replace("+5411111111111", "+5422222222222"), body='{}', status=500)
+    service = UsersConnectorService()
+
+    users = service.get_users(["+5411111111111", "+5422222222222"])
+
+    assert users["+5411111111111"].name == "Deshawn Goodwin"
+    assert "+5422222222222" not in users
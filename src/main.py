@@ -1,10 +1,121 @@
-from fastapi import FastAPI, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from typing import Iterable, Iterator
+import asyncio
+import json
+import time
 
-from Config.dependencies import get_service
+from Config.dependencies import get_async_service, get_async_user_connector, get_call_registry, get_calls_ingestion_service, get_pricing_engine, get_request_profiler, get_user_connector, get_vectorized_call_processor
 from Dto.Models import PhoneInvoiceRequest
-from Services import PhoneInvoiceService
-app = FastAPI()
+from Dto.Records import InvoiceRecord
+from Metrics import CALL_REGISTRY_LOAD_SECONDS, CALL_REGISTRY_ROWS, RequestProfiler, observe_stage, server_timing, start_server_timing, time_stage
+from Services import AsyncPhoneInvoiceService, CallsIngestionService, PhoneInvoiceService
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and index the call registry before serving the first request
+    started = time.perf_counter()
+    registry = get_call_registry()
+    CALL_REGISTRY_LOAD_SECONDS.set(time.perf_counter() - started)
+    if registry.row_count is not None:
+        CALL_REGISTRY_ROWS.set(registry.row_count)
+    yield
+    await get_async_user_connector().close()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    """
+    Adds the duration of every stage of the request (users_api, registry_query, pricing, serialization)
+    as a Server-Timing header.
+    """
+    timings = start_server_timing()
+    response = await call_next(request)
+    if timings:
+        response.headers["Server-Timing"] = server_timing(timings)
+    return response
+
+@app.get("/metrics")
+def metrics():
+    """
+    Exposes the metrics in Prometheus text format.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def render_invoice(invoice: InvoiceRecord) -> Response:
+    """
+    Serializes the invoice straight from the record (InvoiceRecord.to_json), with the bytes FastAPI would
+    produce for PhoneInvoiceResponse but without building and encoding the models of every call.
+    """
+    with time_stage("serialization"):
+        return Response(invoice.to_json(), media_type="application/json")
 
 @app.post("/get-invoice/")
-def get_invoice(request: PhoneInvoiceRequest, service: PhoneInvoiceService = Depends(get_service)):
-    return service.get_phone_invoice(request)
\ No newline at end of file
+async def get_invoice(request: PhoneInvoiceRequest, http_request: Request, service: AsyncPhoneInvoiceService = Depends(get_async_service), profiler: RequestProfiler = Depends(get_request_profiler)):
+    if profiler is not None and profiler.should_profile(http_request.headers.get(RequestProfiler.PROFILE_HEADER)):
+        return await asyncio.to_thread(profiler.profile, request.phone_number, lambda: profiled_invoice(request))
+    invoice = await service.get_phone_invoice(request)
+    return render_invoice(invoice)
+
+def profiled_invoice(request: PhoneInvoiceRequest):
+    """
+    Computes and renders an invoice with the sync PhoneInvoiceService (without the invoice cache), so every stage
+    runs in the profiled thread. Returns the response and the number of calls.
+    """
+    service = PhoneInvoiceService(get_call_registry(), get_user_connector(), get_pricing_engine(), get_vectorized_call_processor())
+    invoice = service.get_phone_invoice(request)
+    return render_invoice(invoice), len(invoice.calls)
+
+@app.post("/get-invoice/summary/")
+async def get_invoice_summary(request: PhoneInvoiceRequest, service: AsyncPhoneInvoiceService = Depends(get_async_service)):
+    """
+    Returns only the totals of the invoice, computed from aggregates: the size and cost of the response
+    do not depend on the number of calls.
+    """
+    invoice = await service.get_phone_invoice_summary(request)
+    with time_stage("serialization"):
+        return Response(invoice.to_json(), media_type="application/json")
+
+def ndjson_chunks(items: Iterable[dict], lines_per_chunk: int = 500) -> Iterator[str]:
+    """
+    Serializes the items as NDJSON, grouping a bounded number of lines per chunk of the response. The time
+    spent serializing is recorded as the serialization stage once the stream ends (the Server-Timing header
+    is already sent by then, so it only reaches the metrics).
+    """
+    lines = []
+    elapsed = 0.0
+    try:
+        for item in items:
+            started = time.perf_counter()
+            lines.append(json.dumps(item, separators=(",", ":")) + "\n")
+            elapsed += time.perf_counter() - started
+            if len(lines) >= lines_per_chunk:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+    finally:
+        observe_stage("serialization", elapsed)
+
+@app.post("/get-invoice/stream/")
+async def get_invoice_stream(request: PhoneInvoiceRequest, service: AsyncPhoneInvoiceService = Depends(get_async_service)):
+    """
+    Streams the invoice as NDJSON: a {"user": ...} line, one {"call": ...} line per call and a final {"totals": ...} line.
+    Memory stays flat regardless of the number of calls.
+    """
+    items = await service.stream_phone_invoice(request)
+    return StreamingResponse(ndjson_chunks(items), media_type="application/x-ndjson")
+
+@app.post("/calls/ingest/")
+async def ingest_calls(http_request: Request, service: CallsIngestionService = Depends(get_calls_ingestion_service)):
+    """
+    Appends a batch of new calls (text/csv with a header line, or application/x-ndjson) to the call registry.
+    The batch is durable (fsynced to the ingestion log) and visible to the invoices when the response is sent.
+    """
+    body = await http_request.body()
+    result = await asyncio.to_thread(service.ingest, body, http_request.headers.get("content-type"))
+    CALL_REGISTRY_ROWS.set(result["row_count"])
+    return result